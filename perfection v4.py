@@ -1,35 +1,39 @@
-import json
 import os
 import sys
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QGridLayout, QTabWidget, QLabel, 
-                             QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
+                             QLineEdit, QPushButton, QTableWidget, QTableWidgetItem, QTableView,
                              QComboBox, QTextEdit, QGroupBox, QMessageBox, 
                              QFileDialog, QDialog, QScrollArea, QFormLayout,
                              QHeaderView, QFrame, QDateEdit, QSpinBox, QDoubleSpinBox,
-                             QCheckBox, QStackedWidget, QSizePolicy, QDialogButtonBox)
-from PyQt5.QtCore import Qt, QDate, pyqtSignal, QSize
-from PyQt5.QtGui import QFont, QIcon, QPalette, QColor, QTextCursor
+                             QCheckBox, QStackedWidget, QSizePolicy, QDialogButtonBox,
+                             QStyledItemDelegate, QStyle, QProgressDialog)
+from PyQt5.QtCore import (Qt, QDate, pyqtSignal, QSize, QAbstractTableModel, QModelIndex,
+                          QSortFilterProxyModel, QEvent, QPersistentModelIndex, QTimer, QThread)
+from PyQt5.QtGui import QFont, QIcon, QPalette, QColor, QTextCursor, QPainter
 import datetime
-import pandas as pd
-from tabulate import tabulate
+from bisect import bisect_left
 import hashlib
-from docx import Document
-from docx.shared import Pt, Inches, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.table import WD_TABLE_ALIGNMENT
-from docx.oxml.ns import nsdecls
-from docx.oxml import parse_xml
-import numpy as np
-from fpdf import FPDF
-import subprocess
 import tempfile
+from perfection_store import (GROUPS, BackgroundLoad, ChangeNotifier, TaskCancelled, date_ordinal,
+                               open_store, default_data_file)
+from perfection_payroll import (PayrollIndex, PayrollRun, SalaryCache, cached_salary, calculate_roster,
+                                 parse_report_period, payroll_snapshot, snapshot_index)
+from perfection_payslips import PdfSlips, write_pdf_payslips, write_word_payslips
+from perfection_dispatch import (FAILED, PENDING, STATUS_NAMES, TRANSPORTS, DispatchQueue, dispatch_path,
+                                 payslip_messages)
 
 # تحسين الخطوط وتكبيرها
 LARGE_FONT = QFont("Arial", 12)
 MEDIUM_FONT = QFont("Arial", 11)
 SMALL_FONT = QFont("Arial", 10)
 
+# مهلة تجهيز التبويب التالي بعد عرض تبويب (بالمللي ثانية)
+TAB_PREFETCH_DELAY = 200
+
+# وسيلة إرسال الكشوف من TRANSPORTS
+DISPATCH_TRANSPORT = 'whatsapp'
+
 class LoginDialog(QDialog):
     def __init__(self):
         super().__init__()
@@ -198,6 +202,8 @@ class ExcelImportDialog(QDialog):
             self.load_excel_data(file_path)
     
     def load_excel_data(self, file_path):
+        import pandas as pd
+        
         try:
             df = pd.read_excel(file_path)
             self.preview_table.setRowCount(len(df))
@@ -219,6 +225,255 @@ class ExcelImportDialog(QDialog):
             data.append(row_data)
         return data
 
+def update_sorted_row(model, rows, key, exists):
+    """إضافة أو تحديث أو حذف صف واحد في نموذج صفوفه مرتبة حسب المفتاح"""
+    i = bisect_left(rows, key)
+    found = i < len(rows) and rows[i] == key
+    if found and exists:
+        model.dataChanged.emit(model.index(i, 0), model.index(i, model.columnCount() - 1))
+    elif found:
+        model.beginRemoveRows(QModelIndex(), i, i)
+        del rows[i]
+        model.endRemoveRows()
+    elif exists:
+        model.beginInsertRows(QModelIndex(), i, i)
+        rows.insert(i, key)
+        model.endInsertRows()
+
+
+class EmployeeTableModel(QAbstractTableModel):
+    """جدول الموظفين مباشرة من قواميس البيانات بدون عناصر لكل خلية"""
+    
+    HEADERS = ["الاسم", "الهاتف", "النوع", "سعر الحصة/الراتب", "تعديل", "حذف"]
+    
+    def __init__(self, system):
+        super().__init__()
+        self.system = system
+        self.rows = []
+    
+    def refresh(self):
+        self.beginResetModel()
+        self.rows = sorted((group, name) for group in GROUPS for name in getattr(self.system, group))
+        self.endResetModel()
+    
+    def refresh_employee(self, group, name):
+        update_sorted_row(self, self.rows, (group, name), name in getattr(self.system, group))
+    
+    def employee_at(self, row):
+        """(المجموعة، الاسم) للصف"""
+        return self.rows[row]
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.UserRole):
+            return None
+        group, name = self.rows[index.row()]
+        data = getattr(self.system, group).get(name, {})
+        column = index.column()
+        if column == 0:
+            return name
+        if column == 1:
+            return data.get('phone', '')
+        if column == 2:
+            return "بحصص" if group == 'employees' else "راتب ثابت"
+        if column == 3:
+            amount = data.get('current_rate' if group == 'employees' else 'monthly_salary', 0)
+            # UserRole للترتيب حسب القيمة الرقمية
+            return amount if role == Qt.UserRole else f"{amount:.2f}"
+        return self.HEADERS[column]
+
+
+class AttendanceTableModel(QAbstractTableModel):
+    """جميع سجلات الحضور من فهرس التواريخ (الموظف، رقم اليوم، التاريخ) لكل صف"""
+    
+    HEADERS = ["الموظف", "التاريخ", "اليوم", "الحصص", "البونص اليومي", "الهاتف", "تعديل", "حذف"]
+    DAY_NAMES = ["الاثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت", "الأحد"]
+    
+    def __init__(self, system):
+        super().__init__()
+        self.system = system
+        self.rows = []
+    
+    def refresh(self):
+        self.beginResetModel()
+        self.rows = []
+        for name in sorted(self.system.employees):
+            series = self.system.payroll_index.series.get(('employees', name, 'attendance'))
+            if series:
+                self.rows.extend((name, ordinal, date) for ordinal, date in zip(series.ordinals, series.dates))
+        self.endResetModel()
+    
+    def refresh_record(self, name, ordinal, date):
+        records = self.system.employees.get(name, {}).get('attendance', {})
+        update_sorted_row(self, self.rows, (name, ordinal, date), date in records)
+    
+    def refresh_employee(self, name):
+        """مزامنة صفوف موظف واحد بعد إضافته أو حذفه أو تعديل بياناته"""
+        i = j = bisect_left(self.rows, (name,))
+        while j < len(self.rows) and self.rows[j][0] == name:
+            j += 1
+        keys = set(self.rows[i:j])
+        for ordinal, date in self.system.payroll_index.entries('employees', name, 'attendance'):
+            keys.add((name, ordinal, date))
+        for key in sorted(keys):
+            self.refresh_record(*key)
+    
+    def record_at(self, row):
+        """(الموظف، التاريخ) للصف"""
+        name, _, date = self.rows[row]
+        return name, date
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.UserRole):
+            return None
+        name, ordinal, date = self.rows[index.row()]
+        employee = self.system.employees.get(name, {})
+        record = employee.get('attendance', {}).get(date, {})
+        column = index.column()
+        if column == 0:
+            return name
+        if column == 1:
+            return ordinal if role == Qt.UserRole else date
+        if column == 2:
+            weekday = datetime.date.fromordinal(ordinal).weekday()
+            return weekday if role == Qt.UserRole else self.DAY_NAMES[weekday]
+        if column == 3:
+            sessions = record.get('sessions', 0)
+            return sessions if role == Qt.UserRole else str(sessions)
+        if column == 4:
+            bonus = record.get('daily_bonus', 0)
+            return bonus if role == Qt.UserRole else f"{bonus:.2f}"
+        if column == 5:
+            return employee.get('phone', '')
+        return self.HEADERS[column]
+
+
+class DateRangeProxyModel(QSortFilterProxyModel):
+    """تصفية سجلات الحضور حسب الفترة دون إعادة بناء النموذج"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.lo = None
+        self.hi = None
+        self.setSortRole(Qt.UserRole)
+    
+    def set_range(self, from_date=None, to_date=None):
+        self.lo = from_date.toordinal() if from_date else None
+        self.hi = to_date.toordinal() if to_date else None
+        self.invalidateFilter()
+    
+    def filterAcceptsRow(self, source_row, source_parent):
+        ordinal = self.sourceModel().rows[source_row][1]
+        if self.lo is not None and ordinal < self.lo:
+            return False
+        if self.hi is not None and ordinal > self.hi:
+            return False
+        return True
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """يرسم خلايا تعديل/حذف كأزرار ويستقبل النقر عليها بدون إنشاء أي عنصر لكل صف"""
+    
+    clicked = pyqtSignal(QModelIndex)
+    
+    def __init__(self, color, hover_color, parent=None):
+        super().__init__(parent)
+        self.color = QColor(color)
+        self.hover_color = QColor(hover_color)
+        self.pressed = None
+    
+    def button_rect(self, option):
+        return option.rect.adjusted(4, 4, -4, -4)
+    
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        hovered = option.state & QStyle.State_MouseOver
+        pressed = self.pressed is not None and self.pressed == QPersistentModelIndex(index)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.hover_color if hovered or pressed else self.color)
+        painter.drawRoundedRect(self.button_rect(option), 4, 4)
+        
+        font = QFont(option.font)
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(QColor("white"))
+        painter.drawText(self.button_rect(option), Qt.AlignCenter, str(index.data()))
+        painter.restore()
+    
+    def editorEvent(self, event, model, option, index):
+        if event.type() not in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease):
+            return False
+        if event.button() != Qt.LeftButton:
+            return False
+        
+        inside = self.button_rect(option).contains(event.pos())
+        if event.type() == QEvent.MouseButtonPress:
+            self.pressed = QPersistentModelIndex(index) if inside else None
+            return inside
+        
+        was_pressed = self.pressed is not None and self.pressed == QPersistentModelIndex(index)
+        self.pressed = None
+        if was_pressed and inside:
+            self.clicked.emit(index)
+            return True
+        return False
+
+
+class TaskThread(QThread):
+    """تشغيل تقرير أو تصدير طويل خارج خيط الواجهة مع تقدم وإمكانية الإلغاء
+    
+    work(task, *args) تستدعي task.step(done, total, text) بعد كل جزء، فتُطلق
+    step الخطأ TaskCancelled إذا طُلب الإلغاء (requestInterruption). لا يجوز
+    أن تستخدم work أي عنصر من الواجهة: النتائج تصل عبر الإشارات.
+    """
+    
+    progressed = pyqtSignal(int, int, str)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    
+    def __init__(self, work, *args, parent=None):
+        super().__init__(parent)
+        self.work = work
+        self.args = args
+    
+    def step(self, done, total, text=''):
+        if self.isInterruptionRequested():
+            raise TaskCancelled()
+        self.progressed.emit(done, total, text)
+    
+    def run(self):
+        try:
+            result = self.work(self, *self.args)
+        except TaskCancelled:
+            return
+        except Exception as e:
+            self.failed.emit(e)
+            return
+        self.succeeded.emit(result)
+
+
 class EnhancedEmployeeSystem(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -229,13 +484,19 @@ class EnhancedEmployeeSystem(QMainWindow):
         self.employees = {}
         self.other_employees = {}
         self.users = {"admin": self.hash_password("admin123")}
+        self.payroll_index = PayrollIndex(self.employees, self.other_employees)
+        self.salary_cache = SalaryCache()
+        self.changes = ChangeNotifier()
+        self.tasks = set()
+        self.dispatch = None
         self.current_user = None
         self.current_month = datetime.datetime.now().month
         self.current_year = datetime.datetime.now().year
-        self.data_file = "employee_data.json"
+        self.data_file = default_data_file()
+        self.store = open_store(self.data_file)
         
-        # Load saved data
-        self.load_data()
+        # تحميل البيانات في الخلفية بينما تظهر نافذة الدخول
+        self.loader = BackgroundLoad(self.store, self.prepare_data)
         
         # Apply styling
         self.apply_styles()
@@ -341,13 +602,13 @@ class EnhancedEmployeeSystem(QMainWindow):
             QPushButton.export-btn:hover {
                 background-color: #F57C00;
             }
-            QTableWidget {
+            QTableWidget, QTableView {
                 gridline-color: #e0e0e0;
                 background-color: white;
                 selection-background-color: #0078D7;
                 font-size: 12px;
             }
-            QTableWidget::item {
+            QTableWidget::item, QTableView::item {
                 padding: 8px;
                 border-bottom: 1px solid #e0e0e0;
             }
@@ -378,6 +639,8 @@ class EnhancedEmployeeSystem(QMainWindow):
         login_dialog = LoginDialog()
         if login_dialog.exec_() == QDialog.Accepted:
             username, password = login_dialog.get_credentials()
+            # حسابات المستخدمين جزء من ملف البيانات
+            self.wait_for_data()
             if username in self.users and self.users[username] == self.hash_password(password):
                 self.current_user = username
                 return True
@@ -386,32 +649,97 @@ class EnhancedEmployeeSystem(QMainWindow):
                 return False
         return False
     
-    def save_data(self):
-        """حفظ جميع البيانات في ملف JSON"""
-        data = {
+    def data_root(self):
+        return {
             'employees': self.employees,
             'other_employees': self.other_employees,
             'users': self.users
         }
+    
+    def save_data(self):
+        """حفظ جميع البيانات في ملف JSON"""
+        # الإغلاق قبل انتهاء التحميل يجب ألا يحفظ بيانات فارغة فوق الملف
+        self.wait_for_data()
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+            self.store.save(self.data_root())
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"فشل حفظ البيانات: {str(e)}")
+    
+    def commit_changes(self, *paths):
+        """حفظ التعديلات المحددة فقط في سجل التغييرات"""
+        for path in paths:
+            self.payroll_index.refresh(path)
+            self.salary_cache.refresh(path)
+        
+        try:
+            self.store.append(self.data_root(), paths)
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"فشل حفظ البيانات: {str(e)}")
+        
+        self.changes.publish(paths)
 
+    def prepare_data(self, data):
+        """فصل البيانات المحملة وبناء فهرسها (يعمل في خيط التحميل بدون أي واجهة)"""
+        data = data or {}
+        employees = data.get('employees', {})
+        other_employees = data.get('other_employees', {})
+        users = data.get('users', {"admin": self.hash_password("admin123")})
+        # تحويل التواريخ إلى أرقام أيام مرة واحدة بدلاً من strptime في كل تقرير
+        return employees, other_employees, users, PayrollIndex(employees, other_employees)
+    
     def load_data(self):
-        """تحميل البيانات من ملف JSON"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.employees = data.get('employees', {})
-                    self.other_employees = data.get('other_employees', {})
-                    self.users = data.get('users', {"admin": self.hash_password("admin123")})
-            except Exception as e:
-                QMessageBox.critical(self, "خطأ", f"فشل تحميل البيانات: {str(e)}")
+        """تحميل البيانات من ملف JSON وسجل التغييرات
+        
+        إذا بدأ التحميل في الخلفية تُنتظر نتيجته بدلاً من تحميل الملف مرة أخرى.
+        """
+        loader, self.loader = self.loader, None
+        try:
+            if loader is not None:
+                prepared = loader.result()
+            else:
+                prepared = self.prepare_data(self.store.load())
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"فشل تحميل البيانات: {str(e)}")
+            return
+        
+        self.employees, self.other_employees, self.users, self.payroll_index = prepared
+        
+        # إكمال دمج سابق لم ينتهِ (التحميل نفسه لا يكتب شيئاً)
+        try:
+            self.store.recover(self.data_root())
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"فشل حفظ البيانات: {str(e)}")
+        self.salary_cache.clear()
+    
+    def wait_for_data(self):
+        """تطبيق نتيجة التحميل في الخلفية، مع الانتظار إذا لم ينتهِ بعد"""
+        if self.loader is not None:
+            self.load_data()
+    
+    def calculate_salary_for_period(self, name, from_date=None, to_date=None):
+        return cached_salary(self.salary_cache, self.payroll_index, name, from_date, to_date)
+    
+    def calculate_salaries_for_period(self, from_date=None, to_date=None):
+        """رواتب جميع الموظفين في الفترة بحساب جماعي واحد"""
+        return calculate_roster(self.payroll_index, from_date, to_date)
+    
+    def closeEvent(self, event):
+        # إيقاف التقارير والتصدير الجارية وانتظارها: حذف QThread يعمل ينهي البرنامج
+        for thread in list(self.tasks):
+            thread.requestInterruption()
+        for thread in list(self.tasks):
+            thread.wait()
+        self.save_data()
+        if self.dispatch is not None:
+            self.dispatch.close()
+        event.accept()
     
     def setup_ui(self):
+        self.wait_for_data()
+        
+        # الكشوف التي لم تُرسل قبل إغلاق البرنامج: تُستأنف بعد سؤال المستخدم عند ظهور النافذة
+        QTimer.singleShot(0, self.resume_dispatch)
+        
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         
@@ -423,22 +751,50 @@ class EnhancedEmployeeSystem(QMainWindow):
         self.tab_widget.setFont(LARGE_FONT)
         layout.addWidget(self.tab_widget)
         
-        # Create tabs
-        self.create_employee_tab()
-        self.create_attendance_tab()
-        self.create_bonus_tab()
-        self.create_advance_tab()
-        self.create_reports_tab()
-        
-        # Load initial data
-        self.update_employee_lists()
+        # التبويبات تُضاف فارغة، ويُنشأ محتواها وتُربط بياناتها عند أول عرض لها
+        # (الاسم، العنوان، دالة الإنشاء، دالة ربط البيانات)
+        self.tab_specs = [
+            ('employee', "إدارة الموظفين", self.create_employee_tab, self.bind_employee_tab),
+            ('attendance', "تسجيل الحضور", self.create_attendance_tab, self.bind_attendance_tab),
+            ('bonus', "المكافآت والخصومات", self.create_bonus_tab, None),
+            ('advance', "السلف", self.create_advance_tab, None),
+            ('reports', "التقارير", self.create_reports_tab, None),
+        ]
+        self.built_tabs = set()
+        for _, title, _, _ in self.tab_specs:
+            self.tab_widget.addTab(QWidget(), title)
+        
+        self.changes.subscribe(self.apply_changes)
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
+        self.on_tab_changed(self.tab_widget.currentIndex())
         
         self.show()
     
-    def create_employee_tab(self):
-        tab = QWidget()
-        self.tab_widget.addTab(tab, "إدارة الموظفين")
-        
+    def on_tab_changed(self, index):
+        if index < 0:
+            return
+        self.build_tab(index)
+        # تجهيز التبويب التالي بعد ظهور الحالي لأنه الأرجح أن يُفتح بعده
+        if index + 1 < len(self.tab_specs):
+            QTimer.singleShot(TAB_PREFETCH_DELAY, lambda: self.build_tab(index + 1))
+    
+    def build_tab(self, index):
+        """إنشاء محتوى التبويب وربط بياناته مرة واحدة عند أول حاجة إليه"""
+        name, _, create, bind = self.tab_specs[index]
+        if name in self.built_tabs:
+            return
+        self.built_tabs.add(name)
+        create(self.tab_widget.widget(index))
+        if bind is not None:
+            bind()
+    
+    def bind_employee_tab(self):
+        self.employee_model.refresh()
+    
+    def bind_attendance_tab(self):
+        self.attendance_model.refresh()
+    
+    def create_employee_tab(self, tab):
         layout = QGridLayout()
         tab.setLayout(layout)
         
@@ -550,22 +906,32 @@ class EnhancedEmployeeSystem(QMainWindow):
         list_group = QGroupBox("سجل الموظفين")
         list_layout = QVBoxLayout()
         
-        self.employee_table = QTableWidget()
+        self.employee_model = EmployeeTableModel(self)
+        self.employee_proxy = QSortFilterProxyModel(self)
+        self.employee_proxy.setSourceModel(self.employee_model)
+        self.employee_proxy.setSortRole(Qt.UserRole)
+        
+        self.employee_table = QTableView()
         self.employee_table.setFont(MEDIUM_FONT)
-        self.employee_table.setColumnCount(6)
-        self.employee_table.setHorizontalHeaderLabels(["الاسم", "الهاتف", "النوع", "سعر الحصة/الراتب", "تعديل", "حذف"])
+        self.employee_table.setModel(self.employee_proxy)
+        self.employee_table.setSortingEnabled(True)
         self.employee_table.horizontalHeader().setStretchLastSection(False)
         self.employee_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.employee_table.cellClicked.connect(self.handle_employee_cell_click)
+        self.employee_table.setMouseTracking(True)
+        
+        # أزرار تعديل/حذف مرسومة من مفوض واحد لكل عمود
+        self.employee_edit_delegate = ButtonDelegate("#2196F3", "#1976D2", self.employee_table)
+        self.employee_delete_delegate = ButtonDelegate("#f44336", "#da190b", self.employee_table)
+        self.employee_table.setItemDelegateForColumn(4, self.employee_edit_delegate)
+        self.employee_table.setItemDelegateForColumn(5, self.employee_delete_delegate)
+        self.employee_edit_delegate.clicked.connect(self.handle_employee_cell_click)
+        self.employee_delete_delegate.clicked.connect(self.handle_employee_cell_click)
         
         list_layout.addWidget(self.employee_table)
         list_group.setLayout(list_layout)
         layout.addWidget(list_group, 1, 0, 1, 2)
     
-    def create_attendance_tab(self):
-        tab = QWidget()
-        self.tab_widget.addTab(tab, "تسجيل الحضور")
-        
+    def create_attendance_tab(self, tab):
         layout = QGridLayout()
         tab.setLayout(layout)
         
@@ -653,15 +1019,26 @@ class EnhancedEmployeeSystem(QMainWindow):
         list_group = QGroupBox("سجل الحضور")
         list_layout = QVBoxLayout()
         
-        self.attendance_table = QTableWidget()
+        self.attendance_model = AttendanceTableModel(self)
+        self.attendance_proxy = DateRangeProxyModel(self)
+        self.attendance_proxy.setSourceModel(self.attendance_model)
+        self.attendance_proxy.set_range(self.filter_from_date.date().toPyDate(),
+                                        self.filter_to_date.date().toPyDate())
+        
+        self.attendance_table = QTableView()
         self.attendance_table.setFont(MEDIUM_FONT)
-        self.attendance_table.setColumnCount(8)
-        self.attendance_table.setHorizontalHeaderLabels([
-            "الموظف", "التاريخ", "اليوم", "الحصص", "البونص اليومي", "الهاتف", "تعديل", "حذف"
-        ])
+        self.attendance_table.setModel(self.attendance_proxy)
+        self.attendance_table.setSortingEnabled(True)
         self.attendance_table.horizontalHeader().setStretchLastSection(False)
         self.attendance_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.attendance_table.cellClicked.connect(self.handle_attendance_cell_click)
+        self.attendance_table.setMouseTracking(True)
+        
+        self.attendance_edit_delegate = ButtonDelegate("#2196F3", "#1976D2", self.attendance_table)
+        self.attendance_delete_delegate = ButtonDelegate("#f44336", "#da190b", self.attendance_table)
+        self.attendance_table.setItemDelegateForColumn(6, self.attendance_edit_delegate)
+        self.attendance_table.setItemDelegateForColumn(7, self.attendance_delete_delegate)
+        self.attendance_edit_delegate.clicked.connect(self.handle_attendance_cell_click)
+        self.attendance_delete_delegate.clicked.connect(self.handle_attendance_cell_click)
         
         list_layout.addWidget(self.attendance_table)
         list_group.setLayout(list_layout)
@@ -695,8 +1072,7 @@ class EnhancedEmployeeSystem(QMainWindow):
             'monthly_rates': {}
         }
         
-        self.update_employee_lists()
-        self.save_data()
+        self.commit_changes(('employees', name))
         QMessageBox.information(self, "تم", f"تم حفظ بيانات الموظف {name}")
         self.clear_regular_employee_fields()
     
@@ -723,8 +1099,7 @@ class EnhancedEmployeeSystem(QMainWindow):
             'advance_due_dates': {}
         }
         
-        self.update_employee_lists()
-        self.save_data()
+        self.commit_changes(('other_employees', name))
         QMessageBox.information(self, "تم", f"تم حفظ بيانات الموظف {name}")
         self.clear_other_employee_fields()
     
@@ -732,6 +1107,7 @@ class EnhancedEmployeeSystem(QMainWindow):
         dialog = ExcelImportDialog("استيراد موظفين من Excel", ["الاسم", "الهاتف", "النوع", "سعر الحصة/الراتب"])
         if dialog.exec_() == QDialog.Accepted:
             employees_data = dialog.get_data()
+            changed = []
             
             for emp in employees_data:
                 name = emp.get("الاسم", "").strip()
@@ -754,6 +1130,7 @@ class EnhancedEmployeeSystem(QMainWindow):
                             'current_rate': value,
                             # ... other fields ...
                         }
+                        changed.append(('employees', name))
                 elif emp_type == "راتب ثابت":
                     if name not in self.other_employees:
                         self.other_employees[name] = {
@@ -761,9 +1138,9 @@ class EnhancedEmployeeSystem(QMainWindow):
                             'monthly_salary': value,
                             # ... other fields ...
                         }
+                        changed.append(('other_employees', name))
             
-            self.update_employee_lists()
-            self.save_data()
+            self.commit_changes(*changed)
             QMessageBox.information(self, "تم", f"تم استيراد {len(employees_data)} موظف")
     
     def import_attendance_from_excel(self):
@@ -771,6 +1148,7 @@ class EnhancedEmployeeSystem(QMainWindow):
         if dialog.exec_() == QDialog.Accepted:
             attendance_data = dialog.get_data()
             date_str = self.att_date.date().toString("yyyy-MM-dd")
+            changed = []
             
             for record in attendance_data:
                 name = record.get("الموظف", "").strip()
@@ -791,9 +1169,9 @@ class EnhancedEmployeeSystem(QMainWindow):
                         'sessions': sessions,
                         'daily_bonus': bonus
                     }
+                    changed.append(('employees', name, 'attendance', date_str))
             
-            self.update_employee_lists()
-            self.save_data()
+            self.commit_changes(*changed)
             QMessageBox.information(self, "تم", f"تم استيراد حضور لـ {len(attendance_data)} موظف لليوم {date_str}")
     
     def update_employee_lists(self):
@@ -803,323 +1181,238 @@ class EnhancedEmployeeSystem(QMainWindow):
         
         # ... (بقية التحديثات) ...
         
-        # Update employee table
-        self.employee_table.setRowCount(0)
-        
-        for name, data in self.employees.items():
-            row_position = self.employee_table.rowCount()
-            self.employee_table.insertRow(row_position)
-            
-            self.employee_table.setItem(row_position, 0, QTableWidgetItem(name))
-            self.employee_table.setItem(row_position, 1, QTableWidgetItem(data.get('phone', '')))
-            self.employee_table.setItem(row_position, 2, QTableWidgetItem("بحصص"))
-            self.employee_table.setItem(row_position, 3, QTableWidgetItem(f"{data.get('current_rate', 0):.2f}"))
-            
-            # Edit button
-            edit_btn = QPushButton("تعديل")
-            edit_btn.setProperty("row", row_position)
-            edit_btn.setProperty("class", "edit-btn")
-            edit_btn.clicked.connect(self.edit_employee)
-            self.employee_table.setCellWidget(row_position, 4, edit_btn)
-            
-            # Delete button
-            delete_btn = QPushButton("حذف")
-            delete_btn.setProperty("row", row_position)
-            delete_btn.setProperty("class", "delete-btn")
-            delete_btn.clicked.connect(self.delete_employee)
-            self.employee_table.setCellWidget(row_position, 5, delete_btn)
-        
-        for name, data in self.other_employees.items():
-            row_position = self.employee_table.rowCount()
-            self.employee_table.insertRow(row_position)
-            
-            self.employee_table.setItem(row_position, 0, QTableWidgetItem(name))
-            self.employee_table.setItem(row_position, 1, QTableWidgetItem(data.get('phone', '')))
-            self.employee_table.setItem(row_position, 2, QTableWidgetItem("راتب ثابت"))
-            self.employee_table.setItem(row_position, 3, QTableWidgetItem(f"{data.get('monthly_salary', 0):.2f}"))
-            
-            # Edit button
-            edit_btn = QPushButton("تعديل")
-            edit_btn.setProperty("row", row_position)
-            edit_btn.setProperty("class", "edit-btn")
-            edit_btn.clicked.connect(self.edit_employee)
-            self.employee_table.setCellWidget(row_position, 4, edit_btn)
-            
-            # Delete button
-            delete_btn = QPushButton("حذف")
-            delete_btn.setProperty("row", row_position)
-            delete_btn.setProperty("class", "delete-btn")
-            delete_btn.clicked.connect(self.delete_employee)
-            self.employee_table.setCellWidget(row_position, 5, delete_btn)
+        # Update tables (النماذج تقرأ القيم من البيانات عند العرض فقط)
+        # التبويبات التي لم تُنشأ بعد تُربط ببياناتها عند أول عرض لها
+        for name, _, _, bind in self.tab_specs:
+            if name in self.built_tabs and bind is not None:
+                bind()
         
         # ... (بقية التحديثات) ...
     
-    def edit_employee(self):
-        button = self.sender()
-        if button:
-            row = button.property("row")
-            name = self.employee_table.item(row, 0).text()
-            emp_type = self.employee_table.item(row, 2).text()
+    def apply_changes(self, paths):
+        """تحديث الصفوف المتأثرة فقط بمسارات البيانات المعدلة"""
+        for path in paths:
+            if path[0] not in GROUPS:
+                continue
+            if len(path) == 1:
+                self.update_employee_lists()
+                return
+            group, name = path[0], path[1]
+            if len(path) <= 3 and 'employee' in self.built_tabs:
+                self.employee_model.refresh_employee(group, name)
+            if group != 'employees' or 'attendance' not in self.built_tabs:
+                continue
+            if len(path) == 4:
+                ordinal = date_ordinal(path[3])
+                if path[2] == 'attendance' and ordinal is not None:
+                    self.attendance_model.refresh_record(name, ordinal, path[3])
+            elif len(path) == 2 or path[2] in ('attendance', 'phone'):
+                self.attendance_model.refresh_employee(name)
+    
+    def handle_employee_cell_click(self, index):
+        group, name = self.employee_model.employee_at(self.employee_proxy.mapToSource(index).row())
+        if index.column() == 4:
+            self.edit_employee(group, name)
+        elif index.column() == 5:
+            self.delete_employee(group, name)
+    
+    def edit_employee(self, group, name):
+        if group == 'employees' and name in self.employees:
+            dialog = EmployeeEditDialog({
+                'name': name,
+                'phone': self.employees[name].get('phone', ''),
+                'current_rate': self.employees[name].get('current_rate', 0)
+            }, 'session', self)
             
-            if emp_type == "بحصص" and name in self.employees:
-                dialog = EmployeeEditDialog({
-                    'name': name,
-                    'phone': self.employees[name].get('phone', ''),
-                    'current_rate': self.employees[name].get('current_rate', 0)
-                }, 'session', self)
+            if dialog.exec_() == QDialog.Accepted:
+                updated_data = dialog.get_updated_data()
+                # Preserve existing data
+                self.employees[name] = {
+                    **self.employees[name],
+                    **updated_data
+                }
                 
-                if dialog.exec_() == QDialog.Accepted:
-                    updated_data = dialog.get_updated_data()
-                    # Preserve existing data
-                    self.employees[name] = {
-                        **self.employees[name],
-                        **updated_data
-                    }
-                    
-                    # If name changed, update key
-                    if updated_data['name'] != name:
-                        self.employees[updated_data['name']] = self.employees.pop(name)
-                    
-                    self.update_employee_lists()
-                    self.save_data()
-                    QMessageBox.information(self, "تم", "تم تحديث بيانات الموظف")
-            
-            elif emp_type == "راتب ثابت" and name in self.other_employees:
-                dialog = EmployeeEditDialog({
-                    'name': name,
-                    'phone': self.other_employees[name].get('phone', ''),
-                    'monthly_salary': self.other_employees[name].get('monthly_salary', 0)
-                }, 'fixed', self)
+                # If name changed, update key
+                if updated_data['name'] != name:
+                    self.employees[updated_data['name']] = self.employees.pop(name)
                 
-                if dialog.exec_() == QDialog.Accepted:
-                    updated_data = dialog.get_updated_data()
-                    # Preserve existing data
-                    self.other_employees[name] = {
-                        **self.other_employees[name],
-                        **updated_data
-                    }
-                    
-                    # If name changed, update key
-                    if updated_data['name'] != name:
-                        self.other_employees[updated_data['name']] = self.other_employees.pop(name)
-                    
-                    self.update_employee_lists()
-                    self.save_data()
-                    QMessageBox.information(self, "تم", "تم تحديث بيانات الموظف")
-    
-    def delete_employee(self):
-        button = self.sender()
-        if button:
-            row = button.property("row")
-            name = self.employee_table.item(row, 0).text()
-            emp_type = self.employee_table.item(row, 2).text()
+                self.commit_changes(('employees', name), ('employees', updated_data['name']))
+                QMessageBox.information(self, "تم", "تم تحديث بيانات الموظف")
+        
+        elif group == 'other_employees' and name in self.other_employees:
+            dialog = EmployeeEditDialog({
+                'name': name,
+                'phone': self.other_employees[name].get('phone', ''),
+                'monthly_salary': self.other_employees[name].get('monthly_salary', 0)
+            }, 'fixed', self)
             
-            if emp_type == "بحصص" and name in self.employees:
-                reply = QMessageBox.question(self, "تأكيد", f"هل أنت متأكد من حذف الموظف {name}؟")
-                if reply == QMessageBox.Yes:
-                    del self.employees[name]
-                    self.update_employee_lists()
-                    self.save_data()
-                    QMessageBox.information(self, "تم", f"تم حذف الموظف {name}")
-            
-            elif emp_type == "راتب ثابت" and name in self.other_employees:
-                reply = QMessageBox.question(self, "تأكيد", f"هل أنت متأكد من حذف الموظف {name}؟")
-                if reply == QMessageBox.Yes:
-                    del self.other_employees[name]
-                    self.update_employee_lists()
-                    self.save_data()
-                    QMessageBox.information(self, "تم", f"تم حذف الموظف {name}")
+            if dialog.exec_() == QDialog.Accepted:
+                updated_data = dialog.get_updated_data()
+                # Preserve existing data
+                self.other_employees[name] = {
+                    **self.other_employees[name],
+                    **updated_data
+                }
+                
+                # If name changed, update key
+                if updated_data['name'] != name:
+                    self.other_employees[updated_data['name']] = self.other_employees.pop(name)
+                
+                self.commit_changes(('other_employees', name), ('other_employees', updated_data['name']))
+                QMessageBox.information(self, "تم", "تم تحديث بيانات الموظف")
+    
+    def delete_employee(self, group, name):
+        if group == 'employees' and name in self.employees:
+            reply = QMessageBox.question(self, "تأكيد", f"هل أنت متأكد من حذف الموظف {name}؟")
+            if reply == QMessageBox.Yes:
+                del self.employees[name]
+                self.commit_changes(('employees', name))
+                QMessageBox.information(self, "تم", f"تم حذف الموظف {name}")
+        
+        elif group == 'other_employees' and name in self.other_employees:
+            reply = QMessageBox.question(self, "تأكيد", f"هل أنت متأكد من حذف الموظف {name}؟")
+            if reply == QMessageBox.Yes:
+                del self.other_employees[name]
+                self.commit_changes(('other_employees', name))
+                QMessageBox.information(self, "تم", f"تم حذف الموظف {name}")
     
     def filter_attendance_by_date(self):
         from_date = self.filter_from_date.date().toPyDate()
         to_date = self.filter_to_date.date().toPyDate()
         
-        self.attendance_table.setRowCount(0)
+        # التصفية في النموذج الوسيط فقط، بدون إعادة بناء الصفوف
+        self.attendance_proxy.set_range(from_date, to_date)
+    
+    def reset_attendance_filter(self):
+        self.filter_from_date.setDate(QDate.currentDate().addDays(-7))
+        self.filter_to_date.setDate(QDate.currentDate())
+        self.filter_attendance_by_date()
+    
+    def handle_attendance_cell_click(self, index):
+        name, date = self.attendance_model.record_at(self.attendance_proxy.mapToSource(index).row())
+        if index.column() == 6:
+            self.edit_attendance_record(name, date)
+        elif index.column() == 7:
+            self.delete_attendance_record(name, date)
+    
+    def edit_attendance_record(self, name, date):
+        date_obj = QDate.fromString(date, "yyyy-MM-dd")
+        self.att_date.setDate(date_obj)
+        self.open_daily_attendance_window(edit_mode=True)
+    
+    def delete_attendance_record(self, name, date):
+        if name in self.employees and date in self.employees[name].get('attendance', {}):
+            reply = QMessageBox.question(self, "تأكيد", 
+                                       f"هل أنت متأكد من حذف تسجيل حضور {name} بتاريخ {date}؟")
+            if reply == QMessageBox.Yes:
+                del self.employees[name]['attendance'][date]
+                self.commit_changes(('employees', name, 'attendance', date))
+                QMessageBox.information(self, "تم", "تم حذف تسجيل الحضور")
+    
+    def report_period(self):
+        """أول وآخر يوم من الشهر المحدد في تبويب التقارير"""
+        return parse_report_period('', '', self.report_month.currentText(), self.report_year.currentText())
+    
+    def run_in_background(self, title, work, on_done, *args, error_text="فشلت العملية"):
+        """تشغيل work(task, *args) في TaskThread مع نافذة تقدم وزر إلغاء
+        
+        on_done(result) تُستدعى في خيط الواجهة بعد انتهاء العمل بنجاح.
+        """
+        thread = TaskThread(work, *args, parent=self)
+        dialog = QProgressDialog("جاري التحضير...", "إلغاء", 0, 0, self)
+        dialog.setWindowTitle(title)
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(0)
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+        
+        def progressed(done, total, text):
+            dialog.setMaximum(total)
+            dialog.setValue(done)
+            if text:
+                dialog.setLabelText(text)
+        
+        def failed(error):
+            QMessageBox.critical(self, "خطأ", f"{error_text}: {str(error)}")
+        
+        thread.progressed.connect(progressed)
+        thread.succeeded.connect(on_done)
+        thread.failed.connect(failed)
+        thread.finished.connect(dialog.close)
+        thread.finished.connect(thread.deleteLater)
+        dialog.canceled.connect(thread.requestInterruption)
+        
+        # يجب الاحتفاظ بمرجع للخيط حتى ينتهي
+        self.tasks.add(thread)
+        thread.finished.connect(lambda: self.tasks.discard(thread))
+        dialog.show()
+        thread.start()
+    
+    def run_payroll_task(self, title, work, on_done, *args, error_text="فشلت العملية"):
+        """work(task, run, *args) في TaskThread بعد حساب رواتب فترة التقارير
         
-        sorted_employees = sorted(self.employees.items(), key=lambda x: x[0])
+        الحساب يتم في الخيط نفسه من نسخة من سجلات الفترة فيمكن الاستمرار في
+        التعديل أثناء العمل.
+        """
+        period = self.report_period()
+        snapshot = payroll_snapshot(self.payroll_index, *period)
         
-        for name, data in sorted_employees:
-            sorted_attendance = sorted(data.get('attendance', {}).items(), key=lambda x: x[0])
-            
-            for date, record in sorted_attendance:
-                date_obj = datetime.datetime.strptime(date, "%Y-%m-%d").date()
-                
-                if date_obj < from_date or date_obj > to_date:
-                    continue
-                
-                day_name = ["الاثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت", "الأحد"][date_obj.weekday()]
-                phone = data.get('phone', '')
-                
-                row_position = self.attendance_table.rowCount()
-                self.attendance_table.insertRow(row_position)
-                
-                self.attendance_table.setItem(row_position, 0, QTableWidgetItem(name))
-                self.attendance_table.setItem(row_position, 1, QTableWidgetItem(date))
-                self.attendance_table.setItem(row_position, 2, QTableWidgetItem(day_name))
-                self.attendance_table.setItem(row_position, 3, QTableWidgetItem(str(record.get('sessions', 0))))
-                self.attendance_table.setItem(row_position, 4, QTableWidgetItem(f"{record.get('daily_bonus', 0):.2f}"))
-                self.attendance_table.setItem(row_position, 5, QTableWidgetItem(phone))
-                
-                # Edit button
-                edit_btn = QPushButton("تعديل")
-                edit_btn.setProperty("name", name)
-                edit_btn.setProperty("date", date)
-                edit_btn.setProperty("class", "edit-btn")
-                edit_btn.clicked.connect(self.edit_attendance_record)
-                self.attendance_table.setCellWidget(row_position, 6, edit_btn)
-                
-                # Delete button
-                delete_btn = QPushButton("حذف")
-                delete_btn.setProperty("name", name)
-                delete_btn.setProperty("date", date)
-                delete_btn.setProperty("class", "delete-btn")
-                delete_btn.clicked.connect(self.delete_attendance_record)
-                self.attendance_table.setCellWidget(row_position, 7, delete_btn)
-    
-    def edit_attendance_record(self):
-        button = self.sender()
-        if button:
-            name = button.property("name")
-            date = button.property("date")
-            
-            date_obj = QDate.fromString(date, "yyyy-MM-dd")
-            self.att_date.setDate(date_obj)
-            self.open_daily_attendance_window(edit_mode=True)
-    
-    def delete_attendance_record(self):
-        button = self.sender()
-        if button:
-            name = button.property("name")
-            date = button.property("date")
-            
-            if name in self.employees and date in self.employees[name].get('attendance', {}):
-                reply = QMessageBox.question(self, "تأكيد", 
-                                           f"هل أنت متأكد من حذف تسجيل حضور {name} بتاريخ {date}؟")
-                if reply == QMessageBox.Yes:
-                    del self.employees[name]['attendance'][date]
-                    self.update_employee_lists()
-                    self.save_data()
-                    QMessageBox.information(self, "تم", "تم حذف تسجيل الحضور")
+        def job(task):
+            task.step(0, 0, "جاري حساب الرواتب...")
+            run = PayrollRun(snapshot_index(snapshot), *period)
+            return work(task, run, *args)
+        
+        self.run_in_background(title, job, on_done, error_text=error_text)
     
     def export_to_word(self):
+        """كشوف رواتب الشهر لجميع الموظفين بنفس مستند الواجهة الأخرى (write_word_payslips)"""
         month = int(self.report_month.currentText())
         year = int(self.report_year.currentText())
         
-        # Create a new Word document
-        doc = Document()
-        
-        # Add title
-        title = doc.add_heading(f'تقرير رواتب الموظفين - {month}/{year}', level=0)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Add subtitle
-        subtitle = doc.add_paragraph(f"تاريخ التقرير: {datetime.date.today().strftime('%Y-%m-%d')}")
-        subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Add a table for each employee
-        for name, data in {**self.employees, **self.other_employees}.items():
-            # Add page break for each employee except the first one
-            if doc.paragraphs:
-                doc.add_page_break()
-            
-            # Employee header
-            emp_header = doc.add_heading(f"الموظف: {name}", level=1)
-            emp_header.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-            
-            # Add employee type and phone
-            emp_type = "بحصص" if name in self.employees else "راتب ثابت"
-            phone = data.get('phone', '')
-            emp_info = doc.add_paragraph(f"النوع: {emp_type} | الهاتف: {phone}")
-            emp_info.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-            
-            # Add a table for the report
-            table = doc.add_table(rows=1, cols=2)
-            table.style = 'Table Grid'
-            table.alignment = WD_TABLE_ALIGNMENT.CENTER
-            
-            # Set table width to 100% of page
-            table.autofit = False
-            table.allow_autofit = False
-            table.width = Inches(6)
-            
-            # Add header row
-            hdr_cells = table.rows[0].cells
-            hdr_cells[0].text = 'القيمة'
-            hdr_cells[1].text = 'البند'
-            
-            # Add shading to header
-            shading_elm = parse_xml(r'<w:shd {} w:fill="D9D9D9"/>'.format(nsdecls('w')))
-            hdr_cells[0]._tc.get_or_add_tcPr().append(shading_elm)
-            hdr_cells[1]._tc.get_or_add_tcPr().append(shading_elm)
-            
-            # Add employee details to the table
-            def add_row(label, value):
-                row_cells = table.add_row().cells
-                row_cells[0].text = str(value)
-                row_cells[1].text = label
-                # Set cell width
-                row_cells[0].width = Inches(4)
-                row_cells[1].width = Inches(2)
-            
-            # Calculate salary for the month
-            report = self.calculate_salary_for_period(
-                name, 
-                datetime.datetime(year, month, 1), 
-                datetime.datetime(year, month, 1) + datetime.timedelta(days=32)
-            )
-            
-            if report:
-                if report['type'] == 'بحصص':
-                    add_row('سعر الحصة الأساسي', f"{report['base_rate']:.2f}")
-                    add_row('سعر الحصة الحالي', f"{report['current_rate']:.2f}")
-                    add_row('عدد الحصص العادية', report['sessions'])
-                    add_row('راتب الحصص', f"{report['sessions_salary']:.2f}")
-                    add_row('عدد حصص الأداء', report['performance_sessions'])
-                    add_row('بونص الأداء', f"{report['performance_bonus']:.2f}")
-                    add_row('إجمالي البونص اليومي', f"{report['daily_bonus']:.2f}")
-                    add_row('البونص الشهري', f"{report['monthly_bonus']:.2f}")
-                else:
-                    add_row('الراتب الأساسي', f"{report['base_salary']:.2f}")
-                    add_row('الراتب الشهري', f"{report['monthly_salary']:.2f}")
-                    add_row('البونص الشهري', f"{report['monthly_bonus']:.2f}")
-                
-                add_row('الخصومات', f"{report['deduction']:.2f}")
-                add_row('السلف المستحقة', f"{report['advance']:.2f}")
-                
-                # Add total salary row with bold font and different background color
-                total_row = table.add_row().cells
-                total_row[0].text = f"{report['salary']:.2f}"
-                total_row[1].text = 'صافي الراتب'
-                
-                # Apply bold font
-                for cell in total_row:
-                    for paragraph in cell.paragraphs:
-                        for run in paragraph.runs:
-                            run.bold = True
-                
-                # Apply background color
-                shading_elm = parse_xml(r'<w:shd {} w:fill="B4C6E7"/>'.format(nsdecls('w')))
-                total_row[0]._tc.get_or_add_tcPr().append(shading_elm)
-                total_row[1]._tc.get_or_add_tcPr().append(shading_elm)
-            
-            # Add signature
-            doc.add_paragraph("\n")
-            doc.add_paragraph("توقيع الموظف: ________________")
-            doc.add_paragraph("توقيع المدير: ________________")
-            doc.add_paragraph(f"تاريخ: {datetime.date.today().strftime('%Y-%m-%d')}")
-        
-        # Save the document
         file_path, _ = QFileDialog.getSaveFileName(
             self, "حفظ التقرير كملف وورد", f"employee_reports_{month}_{year}.docx",
-            "Word files (*.docx);;All files (*.*)"
+            "Word files (*.docx);;Zip files (ملف لكل موظف) (*.zip);;All files (*.*)"
         )
         
-        if file_path:
-            try:
-                doc.save(file_path)
-                QMessageBox.information(self, "تم", f"تم تصدير التقرير إلى {file_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "خطأ", f"فشل التصدير: {str(e)}")
+        if not file_path:
+            return
+        
+        month_text = f"{month}/{year}"
+        self.run_payroll_task(
+            "تصدير لوورد",
+            lambda task, run: write_word_payslips(file_path, run.reports, month_text, task.step),
+            lambda _: QMessageBox.information(self, "تم", f"تم تصدير التقرير إلى {file_path}"),
+            error_text="فشل التصدير")
+    
+    def dispatch_queue(self, start=True):
+        """طابور إرسال الكشوف (يُنشأ عند أول استخدام، ويبدأ الإرسال إذا كان start)"""
+        if self.dispatch is None:
+            self.dispatch = DispatchQueue(dispatch_path(self.data_file), TRANSPORTS[DISPATCH_TRANSPORT]())
+        if start:
+            self.dispatch.start()
+        return self.dispatch
+    
+    def resume_dispatch(self):
+        """سؤال المستخدم قبل إرسال الكشوف التي بقيت في الطابور من تشغيل سابق"""
+        if not os.path.exists(dispatch_path(self.data_file)):
+            return
+        pending = self.dispatch_queue(start=False).counts()[PENDING]
+        if not pending:
+            return
+        answer = QMessageBox.question(
+            self, "طابور الإرسال",
+            f"يوجد {pending} كشف لم يُرسل من تشغيل سابق.\n"
+            "هل تريد متابعة إرسالها الآن؟ (لا = تبقى في الطابور حتى الإرسال التالي)",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if answer == QMessageBox.Yes:
+            self.dispatch.start()
+    
+    def enqueue_payslips(self, reports, month, year):
+        """إضافة كشوف reports إلى طابور الإرسال، وتعيد عدد المضافين وأسماء من ليس له هاتف"""
+        messages, missing = payslip_messages(reports, self.employee_phones(), f"{month}/{year}")
+        if messages:
+            self.dispatch_queue().enqueue(messages)
+        return len(messages), missing
     
     def send_via_whatsapp(self):
         name = self.report_employee.currentText()
@@ -1127,126 +1420,110 @@ class EnhancedEmployeeSystem(QMainWindow):
             QMessageBox.warning(self, "خطأ", "الرجاء تحديد الموظف")
             return
         
-        # Generate PDF report
-        pdf_path = self.generate_pdf_report(name)
-        if not pdf_path:
+        month = int(self.report_month.currentText())
+        year = int(self.report_year.currentText())
+        report = self.calculate_salary_for_period(name, *self.report_period())
+        if not report:
+            QMessageBox.warning(self, "خطأ", "لا يوجد بيانات لهذا الموظف")
             return
         
-        try:
-            # This is platform-dependent and may need adjustment
-            if sys.platform.startswith('win'):
-                # For Windows
-                subprocess.Popen(f'start whatsapp://send?text=تقرير الراتب&document={pdf_path}', shell=True)
-            elif sys.platform.startswith('darwin'):
-                # For macOS
-                subprocess.Popen(['open', f'whatsapp://send?text=تقرير الراتب&document={pdf_path}'])
-            else:
-                # For Linux
-                subprocess.Popen(['xdg-open', f'whatsapp://send?text=تقرير الراتب&document={pdf_path}'])
-            
-            QMessageBox.information(self, "تم", "تم فتح واتساب مع التقرير المرفق")
-        except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"فشل فتح واتساب: {str(e)}")
+        # الإنشاء والإرسال في الخلفية بدلاً من انتظارهما هنا
+        count, _ = self.enqueue_payslips([report], month, year)
+        if not count:
+            QMessageBox.warning(self, "خطأ", "لا يوجد رقم هاتف لهذا الموظف")
+            return
+        QMessageBox.information(self, "تم", "تمت إضافة التقرير إلى طابور الإرسال")
+    
+    def send_payslips_to_all(self):
+        """إضافة كشوف الشهر لجميع الموظفين إلى طابور الإرسال دفعة واحدة
+        
+        الرواتب تُحسب في TaskThread، ثم تُضاف الرسائل كلها في عملية حفظ واحدة.
+        """
+        month = int(self.report_month.currentText())
+        year = int(self.report_year.currentText())
+        
+        def enqueue(reports):
+            count, missing = self.enqueue_payslips(reports, month, year)
+            message = f"تمت إضافة {count} كشف إلى طابور الإرسال"
+            if missing:
+                message += f"\nبدون رقم هاتف ({len(missing)}): {', '.join(missing[:10])}"
+            QMessageBox.information(self, "تم", message)
+        
+        self.run_payroll_task("إرسال الكشوف", lambda task, run: run.reports, enqueue,
+                              error_text="فشل حساب الرواتب")
+    
+    def show_dispatch_status(self):
+        dispatch = self.dispatch_queue(start=False)
+        counts = dispatch.counts()
+        lines = [f"{STATUS_NAMES[status]}: {count}" for status, count in counts.items()]
+        if dispatch.last_error is not None:
+            lines.append(f"خطأ في الطابور: {dispatch.last_error}")
+        failed = dispatch.messages(FAILED, limit=10)
+        if failed:
+            lines.append("")
+            lines += [f"{message['name']}: {message['last_error']}" for message in failed]
+        QMessageBox.information(self, "طابور الإرسال", "\n".join(lines))
     
     def generate_pdf_report(self, name):
         month = int(self.report_month.currentText())
         year = int(self.report_year.currentText())
         
         # Calculate salary for the month
-        report = self.calculate_salary_for_period(
-            name, 
-            datetime.datetime(year, month, 1), 
-            datetime.datetime(year, month, 1) + datetime.timedelta(days=32)
-        )
+        report = self.calculate_salary_for_period(name, *self.report_period())
         
         if not report:
             QMessageBox.warning(self, "خطأ", "لا يوجد بيانات لهذا الموظف")
             return None
         
-        # Create PDF
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.add_font('DejaVu', '', 'DejaVuSans.ttf', uni=True)
-        pdf.set_font('DejaVu', '', 14)
-        
-        # Title
-        pdf.cell(0, 10, f"تقرير راتب الموظف - {name}", 0, 1, 'C')
-        pdf.ln(5)
+        # Save to temp file (يُغلق الملف قبل الكتابة فيه حتى يعمل على ويندوز أيضاً)
+        fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        PdfSlips().write(pdf_path, report, f"{month}/{year}", self.employee_phone(name))
         
-        # Employee info
-        emp_type = "بحصص" if report['type'] == 'بحصص' else "راتب ثابت"
-        phone = ""
+        return pdf_path
+    
+    def employee_phone(self, name):
         if name in self.employees:
-            phone = self.employees[name].get('phone', '')
-        elif name in self.other_employees:
-            phone = self.other_employees[name].get('phone', '')
-        
-        pdf.cell(0, 10, f"النوع: {emp_type} | الهاتف: {phone}", 0, 1, 'R')
-        pdf.cell(0, 10, f"الشهر: {month}/{year}", 0, 1, 'R')
-        pdf.cell(0, 10, f"تاريخ التقرير: {datetime.date.today().strftime('%Y-%m-%d')}", 0, 1, 'R')
-        pdf.ln(10)
-        
-        # Report details
-        pdf.set_font('DejaVu', '', 12)
+            return self.employees[name].get('phone', '')
+        if name in self.other_employees:
+            return self.other_employees[name].get('phone', '')
+        return ''
+    
+    def employee_phones(self):
+        return {name: self.employee_phone(name)
+                for name in list(self.employees) + list(self.other_employees)}
+    
+    def export_pdf_payslips(self):
+        """كشوف PDF لجميع الموظفين للشهر: ملف واحد متعدد الصفحات أو مجلد بملف لكل موظف"""
+        month = int(self.report_month.currentText())
+        year = int(self.report_year.currentText())
         
-        if report['type'] == 'بحصص':
-            pdf.cell(100, 10, "سعر الحصة الأساسي:", 0, 0, 'R')
-            pdf.cell(50, 10, f"{report['base_rate']:.2f}", 0, 1, 'L')
-            
-            pdf.cell(100, 10, "سعر الحصة الحالي:", 0, 0, 'R')
-            pdf.cell(50, 10, f"{report['current_rate']:.2f}", 0, 1, 'L')
-            
-            pdf.cell(100, 10, "عدد الحصص العادية:", 0, 0, 'R')
-            pdf.cell(50, 10, str(report['sessions']), 0, 1, 'L')
-            
-            pdf.cell(100, 10, "راتب الحصص:", 0, 0, 'R')
-            pdf.cell(50, 10, f"{report['sessions_salary']:.2f}", 0, 1, 'L')
-            
-            pdf.cell(100, 10, "عدد حصص الأداء:", 0, 0, 'R')
-            pdf.cell(50, 10, str(report['performance_sessions']), 0, 1, 'L')
-            
-            pdf.cell(100, 10, "بونص الأداء:", 0, 0, 'R')
-            pdf.cell(50, 10, f"{report['performance_bonus']:.2f}", 0, 1, 'L')
-            
-            pdf.cell(100, 10, "إجمالي البونص اليومي:", 0, 0, 'R')
-            pdf.cell(50, 10, f"{report['daily_bonus']:.2f}", 0, 1, 'L')
-            
-            pdf.cell(100, 10, "البونص الشهري:", 0, 0, 'R')
-            pdf.cell(50, 10, f"{report['monthly_bonus']:.2f}", 0, 1, 'L')
+        answer = QMessageBox.question(
+            self, "كشوف الرواتب", "حفظ جميع الكشوف في ملف PDF واحد؟\n(لا = ملف لكل موظف في مجلد تُنشأ بالتوازي)",
+            QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
+        if answer == QMessageBox.Cancel:
+            return
+        if answer == QMessageBox.Yes:
+            output, _ = QFileDialog.getSaveFileName(
+                self, "حفظ كشوف الرواتب", f"payslips_{month}_{year}.pdf", "PDF files (*.pdf)")
         else:
-            pdf.cell(100, 10, "الراتب الأساسي:", 0, 0, 'R')
-            pdf.cell(50, 10, f"{report['base_salary']:.2f}", 0, 1, 'L')
-            
-            pdf.cell(100, 10, "الراتب الشهري:", 0, 0, 'R')
-            pdf.cell(50, 10, f"{report['monthly_salary']:.2f}", 0, 1, 'L')
-            
-            pdf.cell(100, 10, "البونص الشهري:", 0, 0, 'R')
-            pdf.cell(50, 10, f"{report['monthly_bonus']:.2f}", 0, 1, 'L')
-        
-        pdf.cell(100, 10, "الخصومات:", 0, 0, 'R')
-        pdf.cell(50, 10, f"{report['deduction']:.2f}", 0, 1, 'L')
-        
-        pdf.cell(100, 10, "السلف المستحقة:", 0, 0, 'R')
-        pdf.cell(50, 10, f"{report['advance']:.2f}", 0, 1, 'L')
-        
-        pdf.ln(10)
-        pdf.set_font('DejaVu', 'B', 14)
-        pdf.cell(100, 10, "صافي الراتب:", 0, 0, 'R')
-        pdf.cell(50, 10, f"{report['salary']:.2f}", 0, 1, 'L')
+            output = QFileDialog.getExistingDirectory(self, "اختيار مجلد كشوف الرواتب")
+        if not output:
+            return
         
-        pdf.ln(20)
-        pdf.set_font('DejaVu', '', 12)
-        pdf.cell(0, 10, "توقيع الموظف: ________________", 0, 1, 'R')
-        pdf.cell(0, 10, "توقيع المدير: ________________", 0, 1, 'R')
-        pdf.cell(0, 10, f"التاريخ: {datetime.date.today().strftime('%Y-%m-%d')}", 0, 1, 'R')
+        phones = self.employee_phones()
         
-        # Save to temp file
-        temp_file = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
-        pdf_path = temp_file.name
-        pdf.output(pdf_path)
-        temp_file.close()
+        def done(result):
+            count, seconds = result
+            rate = count / seconds if seconds else 0
+            QMessageBox.information(
+                self, "تم", f"تم إنشاء {count} كشف في {seconds:.1f} ثانية ({rate:.1f} كشف/ثانية)\n{output}")
         
-        return pdf_path
+        month_text = f"{month}/{year}"
+        self.run_payroll_task(
+            "كشوف الرواتب",
+            lambda task, run: write_pdf_payslips(output, run.reports, month_text, phones, step=task.step),
+            done, error_text="فشل إنشاء الكشوف")
 
 # ... (بقية الأكواد) ...
 
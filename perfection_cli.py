@@ -0,0 +1,193 @@
+"""تشغيل الرواتب من سطر الأوامر بدون واجهة رسومية
+
+أمثلة:
+    python perfection_cli.py --month 3 --year 2024 -o payroll.xlsx
+    python perfection_cli.py --from 2024-03-01 --to 2024-03-15 -o payroll.csv
+    python perfection_cli.py --data employee_data.db --format json
+    python perfection_cli.py --data branches.db --workers 8 -o payroll.csv
+    python perfection_cli.py --month 3 --year 2024 -o payroll.csv --payslips payslips/
+    python perfection_cli.py --month 3 --year 2024 -o payroll.csv --dispatch --send
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+
+from perfection_store import open_store, default_data_file
+from perfection_payroll import PayrollIndex, PayrollRun, parse_report_period
+from perfection_export import REPORT_COLUMNS, write_payroll_xlsx
+from perfection_payslips import write_pdf_payslips
+from perfection_dispatch import (FAILED, STATUS_NAMES, TRANSPORTS, DispatchQueue, dispatch_path,
+                                 payslip_messages)
+
+FORMATS = ('xlsx', 'csv', 'json')
+
+
+def load_data(data_file):
+    """تحميل البيانات للقراءة فقط
+    
+    القراءة لا تكتب في ملف البيانات، فيمكن التشغيل أثناء عمل الواجهة عليه.
+    """
+    if not any(os.path.exists(data_file + suffix) for suffix in ('', '.journal', '.compacting')):
+        raise FileNotFoundError(data_file)
+    store = open_store(data_file, read_only=True)
+    try:
+        data = store.load()
+    finally:
+        store.close()
+    if data is None:
+        raise FileNotFoundError(data_file)
+    return data
+
+
+def load_run(data, from_date, to_date, workers=None):
+    """حساب رواتب الفترة من البيانات المحملة"""
+    index = PayrollIndex(data.get('employees', {}), data.get('other_employees', {}))
+    return PayrollRun(index, from_date, to_date, workers)
+
+
+def employee_phones(data):
+    """هاتف كل موظف، والموظف بحصص أولاً إذا تكرر الاسم كما في الواجهة"""
+    return {name: employee.get('phone', '')
+            for group in ('other_employees', 'employees')
+            for name, employee in data.get(group, {}).items()}
+
+
+def period_text(run):
+    """عنوان فترة الكشوف: الشهر/السنة لشهر كامل، وإلا تاريخا البداية والنهاية"""
+    start, end = run.from_date, run.to_date
+    if (start and end and start.day == 1 and (start.year, start.month) == (end.year, end.month)
+            and (end + datetime.timedelta(days=1)).day == 1):
+        return f"{start.month}/{start.year}"
+    return " - ".join(date.strftime('%Y-%m-%d') if date else '...' for date in (start, end))
+
+
+def report_rows(run):
+    """صفوف التقرير بالعناوين العربية مع صف الإجمالي"""
+    rows = []
+    for report in run.reports:
+        rows.append({header: report.get(key, '') for key, header in REPORT_COLUMNS})
+    total = {header: '' for _, header in REPORT_COLUMNS}
+    total['الاسم'] = 'الإجمالي'
+    total['صافي الراتب'] = run.total_salaries
+    rows.append(total)
+    return rows
+
+
+def write_csv(run, out):
+    writer = csv.DictWriter(out, fieldnames=[header for _, header in REPORT_COLUMNS])
+    writer.writeheader()
+    writer.writerows(report_rows(run))
+
+
+def write_json(run, out):
+    json.dump({
+        'from_date': run.from_date.strftime('%Y-%m-%d') if run.from_date else '',
+        'to_date': run.to_date.strftime('%Y-%m-%d') if run.to_date else '',
+        'total_salaries': run.total_salaries,
+        'reports': run.reports
+    }, out, ensure_ascii=False, indent=2)
+    out.write('\n')
+
+
+def write_xlsx(run, path):
+    write_payroll_xlsx(path, run)
+
+
+def dispatch(args, data_file, data, run):
+    """إضافة الكشوف إلى طابور الإرسال و/أو إرسال ما فيه"""
+    queue = DispatchQueue(dispatch_path(data_file), TRANSPORTS[args.transport](), args.fonts)
+    try:
+        if args.dispatch:
+            messages, missing = payslip_messages(run.reports, employee_phones(data), period_text(run))
+            queue.enqueue(messages)
+            print(f"تمت إضافة {len(messages)} كشف إلى طابور الإرسال", file=sys.stderr)
+            if missing:
+                print(f"بدون رقم هاتف ({len(missing)}): {', '.join(missing)}", file=sys.stderr)
+        if not args.send:
+            return 0
+        queue.start()
+        counts = queue.join()
+    finally:
+        queue.close()
+    print("، ".join(f"{STATUS_NAMES[status]}: {count}" for status, count in counts.items()), file=sys.stderr)
+    return 1 if counts[FAILED] else 0
+
+
+def main(argv=None):
+    now = datetime.datetime.now()
+    parser = argparse.ArgumentParser(description="حساب رواتب الموظفين بدون واجهة رسومية")
+    parser.add_argument('--data', default=None,
+                        help="ملف البيانات (employee_data.json أو employee_data.db)")
+    parser.add_argument('--month', type=int, default=now.month, help="الشهر (افتراضياً الشهر الحالي)")
+    parser.add_argument('--year', type=int, default=now.year, help="السنة (افتراضياً السنة الحالية)")
+    parser.add_argument('--from', dest='from_date', default='', help="تاريخ البداية YYYY-MM-DD")
+    parser.add_argument('--to', dest='to_date', default='', help="تاريخ النهاية YYYY-MM-DD")
+    parser.add_argument('-o', '--output', default=None,
+                        help="ملف الناتج؛ الصيغة من الامتداد إذا لم تُحدد --format")
+    parser.add_argument('--format', choices=FORMATS, default=None)
+    parser.add_argument('--workers', type=int, default=0,
+                        help="عدد العمليات المتوازية للقوائم الكبيرة جداً (0 = بدون)")
+    parser.add_argument('--payslips', default=None,
+                        help="كتابة كشوف PDF أيضاً: ملف .pdf واحد أو مجلد بملف لكل موظف تُنشأ بالتوازي")
+    parser.add_argument('--fonts', default='.', help="مجلد خطوط DejaVu للكشوف")
+    parser.add_argument('--dispatch', action='store_true',
+                        help="إضافة كشوف الفترة إلى طابور الإرسال (dispatch_queue.db بجانب ملف البيانات)")
+    parser.add_argument('--send', action='store_true',
+                        help="إرسال رسائل الطابور حتى تُرسل كلها أو تفشل (يعيد 1 إذا فشل بعضها)")
+    parser.add_argument('--transport', choices=sorted(TRANSPORTS), default='whatsapp',
+                        help="وسيلة الإرسال (outbox تنسخ الكشوف إلى مجلد outbox للتجربة)")
+    args = parser.parse_args(argv)
+
+    try:
+        from_date, to_date = parse_report_period(args.from_date, args.to_date, args.month, args.year)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output_format = args.format
+    if output_format is None and args.output:
+        output_format = os.path.splitext(args.output)[1].lstrip('.').lower()
+    output_format = output_format or 'csv'
+    if output_format not in FORMATS:
+        parser.error(f"صيغة غير مدعومة: {output_format}")
+    if output_format == 'xlsx' and not args.output:
+        parser.error("ملف الإكسل يحتاج --output")
+
+    data_file = args.data or default_data_file()
+    try:
+        data = load_data(data_file)
+    except FileNotFoundError:
+        print(f"ملف البيانات غير موجود: {data_file}", file=sys.stderr)
+        return 1
+    run = load_run(data, from_date, to_date, args.workers)
+
+    if output_format == 'xlsx':
+        write_xlsx(run, args.output)
+    elif args.output:
+        # utf-8-sig حتى يعرض إكسل الأسماء العربية في ملف CSV بشكل صحيح
+        encoding = 'utf-8-sig' if output_format == 'csv' else 'utf-8'
+        with open(args.output, 'w', encoding=encoding, newline='') as f:
+            (write_csv if output_format == 'csv' else write_json)(run, f)
+    else:
+        (write_csv if output_format == 'csv' else write_json)(run, sys.stdout)
+
+    if args.output:
+        print(f"تم حساب رواتب {len(run.reports)} موظف، الإجمالي {run.total_salaries:.2f} -> {args.output}")
+
+    if args.payslips:
+        count, seconds = write_pdf_payslips(args.payslips, run.reports, period_text(run), employee_phones(data),
+                                            args.fonts, args.workers or None)
+        rate = count / seconds if seconds else 0
+        # إلى stderr حتى لا تختلط بالتقرير المكتوب إلى stdout
+        print(f"تم إنشاء {count} كشف في {seconds:.1f} ثانية ({rate:.1f} كشف/ثانية) -> {args.payslips}",
+              file=sys.stderr)
+
+    if args.dispatch or args.send:
+        return dispatch(args, data_file, data, run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""طابور إرسال كشوف الرواتب في الخلفية
+
+كل رسالة (الموظف، الهاتف، الشهر، بيانات الراتب) تُحفظ في قاعدة SQLite صغيرة
+فلا تضيع الرسائل غير المرسلة عند إغلاق البرنامج، وتُستأنف عند فتحه. عمال في
+الخلفية يأخذون الرسائل المستحقة، ينشئون كشف PDF لكل منها ويرسلونه عبر وسيلة
+إرسال قابلة للاستبدال، مع حد لمعدل الإرسال وإعادة المحاولة بعد فترة متزايدة.
+
+وسائل الإرسال كائنات فيها send(message, attachment) تطلق خطأ عند الفشل
+(انظر TRANSPORTS). OutboxTransport تنسخ الكشوف إلى مجلد فقط للتجربة.
+"""
+import datetime
+import json
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+from perfection_payslips import PdfSlips, slip_filename
+
+# حالات الرسالة
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+STATUS_NAMES = {
+    PENDING: 'في الانتظار',
+    SENDING: 'جاري الإرسال',
+    SENT: 'تم الإرسال',
+    FAILED: 'فشل',
+}
+
+# عدد العمال وحد الإرسال في الدقيقة لكل الطابور
+DISPATCH_WORKERS = 2
+RATE_PER_MINUTE = 20
+
+# عدد المحاولات قبل اعتبار الرسالة فاشلة، والانتظار قبل الإعادة (يتضاعف كل مرة)
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 30
+
+# أقصى انتظار للعامل قبل البحث عن رسائل مستحقة من جديد (بالثواني)
+POLL_INTERVAL = 1.0
+
+# أقصى انتظار لبرنامج فتح رابط واتساب قبل اعتبار الإرسال فاشلاً (بالثواني)
+LAUNCH_TIMEOUT = 30
+
+# قاعدة الطابور بجانب ملف البيانات
+DISPATCH_FILE = 'dispatch_queue.db'
+
+
+def dispatch_path(data_file):
+    return os.path.join(os.path.dirname(os.path.abspath(data_file)), DISPATCH_FILE)
+
+
+def payslip_messages(reports, phones, period):
+    """رسائل الطابور [(الاسم، الهاتف، الفترة، التقرير)] بكشف واحد لكل موظف
+
+    تعيد (الرسائل، أسماء من ليس له هاتف).
+    """
+    messages = []
+    missing = []
+    seen = set()
+    for report in reports:
+        name = report['name']
+        if name in seen:
+            continue
+        seen.add(name)
+        phone = phones.get(name, '')
+        if not phone:
+            missing.append(name)
+            continue
+        messages.append((name, phone, period, report))
+    return messages, missing
+
+
+class OutboxTransport:
+    """وسيلة إرسال للتجربة: تنسخ الكشف مع ملف JSON بالرسالة إلى مجلد"""
+
+    def __init__(self, directory='outbox'):
+        self.directory = directory
+
+    def send(self, message, attachment):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"{message['id']}_{slip_filename(message['name'])}")
+        shutil.copyfile(attachment, base + '.pdf')
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump({key: message[key] for key in ('id', 'name', 'phone', 'period')},
+                      f, ensure_ascii=False, indent=2)
+
+
+def whatsapp_url(phone, attachment):
+    """رابط whatsapp:// لرقم الهاتف مع الكشف، أو ValueError إذا لم يكن الرقم صالحاً
+
+    الرقم أرقام فقط (مع + في أوله اختيارياً)، وباقي القيم تُرمّز بالكامل
+    فلا يمكن أن يغيّر أي منها الرابط أو أمر تشغيله.
+    """
+    digits = phone.strip().replace(' ', '').replace('-', '')
+    if not re.fullmatch(r'\+?[0-9]+', digits):
+        raise ValueError(f"رقم هاتف غير صالح: {phone!r}")
+    return (f"whatsapp://send?phone={quote(digits, safe='')}&text={quote('تقرير الراتب', safe='')}"
+            f"&document={quote(os.path.abspath(attachment), safe='')}")
+
+
+class WhatsAppTransport:
+    """فتح واتساب برسالة لرقم الموظف مع الكشف المرفق
+
+    الرابط يُفتح بدون shell، ويُعتبر الإرسال فاشلاً (فيُعاد لاحقاً) إذا أنهى
+    برنامج الفتح عمله بخطأ أو لم ينتهِ خلال LAUNCH_TIMEOUT.
+    """
+
+    def send(self, message, attachment):
+        if not message['phone']:
+            raise ValueError("لا يوجد رقم هاتف للموظف")
+        url = whatsapp_url(message['phone'], attachment)
+        if sys.platform.startswith('win'):
+            # يطلق OSError إذا لم يوجد برنامج مسجل لروابط whatsapp://
+            os.startfile(url)
+            return
+        command = ['open', url] if sys.platform.startswith('darwin') else ['xdg-open', url]
+        result = subprocess.run(command, capture_output=True, text=True, timeout=LAUNCH_TIMEOUT)
+        if result.returncode != 0:
+            raise OSError(f"فشل فتح واتساب ({result.returncode}): {result.stderr.strip()}")
+
+
+TRANSPORTS = {
+    'outbox': OutboxTransport,
+    'whatsapp': WhatsAppTransport,
+}
+
+
+class RateLimiter:
+    """توزيع الإرسال على فترات متساوية بين كل العمال"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self, stop):
+        """الانتظار حتى الموعد التالي، أو أقل إذا طُلب الإيقاف (stop من نوع Event)"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        stop.wait(slot - now)
+
+
+class DispatchQueue:
+    """طابور رسائل كشوف الرواتب محفوظ في SQLite مع عمال إرسال في الخلفية
+
+    enqueue تضيف رسائل الشهر كلها في عملية حفظ واحدة وتعود فوراً. الكشوف
+    تُنشأ في مجلد payslips بجانب قاعدة الطابور وتبقى بعد الإرسال. آخر خطأ
+    في قراءة الطابور نفسه (وليس في إرسال رسالة) يُحفظ في last_error.
+    """
+
+    def __init__(self, path, transport, font_dir='.', workers=DISPATCH_WORKERS,
+                 rate_per_minute=RATE_PER_MINUTE, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+        self.path = path
+        self.transport = transport
+        self.font_dir = font_dir
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.attachments = os.path.join(os.path.dirname(os.path.abspath(path)), 'payslips')
+        self.limiter = RateLimiter(rate_per_minute)
+        self.last_error = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, phone TEXT, "
+                "period TEXT, report TEXT NOT NULL, status TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL DEFAULT 0, "
+                "last_error TEXT, attachment TEXT, created TEXT, updated TEXT)")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS messages_due ON messages (status, next_attempt)")
+            # رسائل كانت تُرسل عند إغلاق البرنامج تعود إلى الانتظار
+            self.conn.execute("UPDATE messages SET status = ? WHERE status = ?", (PENDING, SENDING))
+
+    def enqueue(self, messages):
+        """إضافة [(الاسم، الهاتف، الشهر، تقرير الراتب)] وإعادة أرقام الرسائل"""
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        ids = []
+        with self._lock, self.conn:
+            for name, phone, period, report in messages:
+                cursor = self.conn.execute(
+                    "INSERT INTO messages (name, phone, period, report, status, created, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (name, phone, period, json.dumps(report, ensure_ascii=False), PENDING, now, now))
+                ids.append(cursor.lastrowid)
+        self._wake.set()
+        return ids
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        """إيقاف العمال؛ الرسالة التي لم يكتمل إرسالها تُعاد عند التشغيل التالي
+
+        تعيد True إذا توقف كل العمال خلال timeout.
+        """
+        self._stop.set()
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        return not self._threads
+
+    def close(self, timeout=5):
+        """إيقاف العمال ثم إغلاق القاعدة
+
+        العامل الذي لم ينتهِ خلال timeout (داخل إنشاء الكشف أو إرساله) لا يكتب
+        نتيجته بعد الإغلاق: تبقى رسالته "جاري الإرسال" فتعود إلى الانتظار عند
+        فتح الطابور التالي.
+        """
+        self.stop(timeout)
+        with self._lock:
+            self._closed = True
+            self.conn.close()
+
+    def join(self, timeout=None):
+        """انتظار إرسال كل الرسائل أو فشلها نهائياً (مع إعاداتها المؤجلة)
+
+        تعيد عدد الرسائل في كل حالة عند الانتهاء أو بعد timeout ثانية.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            counts = self.counts()
+            if not counts[PENDING] and not counts[SENDING]:
+                return counts
+            if deadline is not None and time.monotonic() >= deadline:
+                return counts
+            time.sleep(POLL_INTERVAL)
+
+    def counts(self):
+        """عدد الرسائل في كل حالة"""
+        with self._lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM messages GROUP BY status").fetchall()
+        counts = dict.fromkeys(STATUS_NAMES, 0)
+        counts.update(rows)
+        return counts
+
+    def messages(self, status=None, limit=200):
+        """آخر الرسائل (الأحدث أولاً) كقواميس بدون بيانات الراتب"""
+        query = ("SELECT id, name, phone, period, status, attempts, last_error, attachment, updated "
+                 "FROM messages")
+        params = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            cursor = self.conn.execute(query, params + (limit,))
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def retry_failed(self):
+        """إعادة الرسائل الفاشلة إلى الانتظار بعدد محاولات جديد"""
+        with self._lock, self.conn:
+            count = self.conn.execute(
+                "UPDATE messages SET status = ?, attempts = 0, next_attempt = 0 WHERE status = ?",
+                (PENDING, FAILED)).rowcount
+        self._wake.set()
+        return count
+
+    def claim(self):
+        """أخذ أقدم رسالة مستحقة وتحويلها إلى جاري الإرسال، أو None"""
+        with self._lock:
+            if self._closed:
+                return None
+            with self.conn:
+                row = self.conn.execute(
+                    "SELECT id, name, phone, period, report, attempts FROM messages "
+                    "WHERE status = ? AND next_attempt <= ? ORDER BY id LIMIT 1",
+                    (PENDING, time.time())).fetchone()
+                if row is None:
+                    return None
+                self.conn.execute(
+                    "UPDATE messages SET status = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                    (SENDING, datetime.datetime.now().isoformat(timespec='seconds'), row[0]))
+        return {
+            'id': row[0],
+            'name': row[1],
+            'phone': row[2] or '',
+            'period': row[3] or '',
+            'report': json.loads(row[4]),
+            'attempts': row[5] + 1,
+        }
+
+    def finish(self, message, attachment=None, error=None):
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        if error is None:
+            status, next_attempt = SENT, 0
+        elif message['attempts'] >= self.max_attempts:
+            status, next_attempt = FAILED, 0
+        else:
+            status = PENDING
+            next_attempt = time.time() + self.retry_delay * 2 ** (message['attempts'] - 1)
+        with self._lock:
+            if self._closed:
+                return
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE messages SET status = ?, next_attempt = ?, last_error = ?, "
+                    "attachment = COALESCE(?, attachment), updated = ? WHERE id = ?",
+                    (status, next_attempt, None if error is None else str(error), attachment, now,
+                     message['id']))
+
+    def release(self, message):
+        """إعادة رسالة لم تُرسل بعد إلى الانتظار بدون احتساب المحاولة"""
+        with self._lock:
+            if self._closed:
+                return
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE messages SET status = ?, attempts = attempts - 1 WHERE id = ?",
+                    (PENDING, message['id']))
+
+    def render(self, slips, message):
+        os.makedirs(self.attachments, exist_ok=True)
+        path = os.path.join(self.attachments,
+                            f"{message['id']}_{slip_filename(message['name'])}.pdf")
+        slips.write(path, message['report'], message['period'], message['phone'])
+        return path
+
+    def _work(self):
+        # كائن كشوف واحد لكل عامل يُنشأ عند أول رسالة
+        slips = None
+        while not self._stop.is_set():
+            try:
+                message = self.claim()
+            except Exception as e:
+                # خطأ في القاعدة نفسها: يبقى العامل ويحاول من جديد بعد قليل
+                self.last_error = e
+                self._stop.wait(POLL_INTERVAL)
+                continue
+            if message is None:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+                continue
+
+            attachment = None
+            try:
+                if slips is None:
+                    slips = PdfSlips(self.font_dir)
+                attachment = self.render(slips, message)
+                self.limiter.wait(self._stop)
+                if self._stop.is_set():
+                    # لم تُرسل بعد: تعود إلى الانتظار بدون احتساب المحاولة
+                    self.release(message)
+                    break
+                self.transport.send(message, attachment)
+            except Exception as e:
+                error = e
+            else:
+                error = None
+            try:
+                self.finish(message, attachment, error)
+            except Exception as e:
+                self.last_error = e
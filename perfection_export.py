@@ -0,0 +1,267 @@
+"""كتابة تقارير الرواتب والحضور في ملفات إكسل صفاً صفاً
+
+xlsxwriter في وضع constant_memory يكتب كل صف إلى الملف عند الانتقال إلى
+الصف التالي، فتبقى الذاكرة ثابتة مهما كان عدد الصفوف. القيم تُكتب أرقاماً
+وتواريخ حقيقية بتنسيق عرض بدلاً من نصوص منسقة مسبقاً، فتعمل عليها معادلات
+إكسل مباشرة.
+"""
+import contextlib
+import datetime
+import os
+
+from perfection_store import GROUPS
+from perfection_payroll import period_bounds
+
+# أعمدة تقرير الرواتب (نفسها في الواجهة وسطر الأوامر)
+REPORT_COLUMNS = [
+    ('name', 'الاسم'),
+    ('type', 'النوع'),
+    ('base_rate', 'سعر الحصة الأساسي'),
+    ('current_rate', 'سعر الحصة الحالي'),
+    ('sessions', 'الحصص العادية'),
+    ('sessions_salary', 'راتب الحصص'),
+    ('performance_sessions', 'حصص الأداء'),
+    ('performance_bonus', 'بونص الأداء'),
+    ('daily_bonus', 'البونص اليومي'),
+    ('base_salary', 'الراتب الأساسي'),
+    ('monthly_salary', 'الراتب الشهري'),
+    ('monthly_bonus', 'البونص الشهري'),
+    ('deduction', 'الخصومات'),
+    ('advance', 'السلف'),
+    ('salary', 'صافي الراتب'),
+]
+
+ATTENDANCE_COLUMNS = [
+    ('date', 'التاريخ'),
+    ('day', 'اليوم'),
+    ('sessions', 'الحصص'),
+    ('daily_bonus', 'البونص اليومي'),
+]
+
+# أوراق ملف السجل الكامل: السجلات المؤرخة لجميع الموظفين
+LEDGER_ATTENDANCE_COLUMNS = [
+    ('name', 'الموظف'),
+    ('date', 'التاريخ'),
+    ('day', 'اليوم'),
+    ('sessions', 'الحصص'),
+    ('daily_bonus', 'البونص اليومي'),
+]
+
+BONUS_COLUMNS = [
+    ('name', 'الموظف'),
+    ('type', 'النوع'),
+    ('date', 'التاريخ'),
+    ('kind', 'نوع المكافأة'),
+    ('sessions', 'حصص الأداء'),
+    ('rate', 'سعر الحصة'),
+    ('amount', 'المبلغ'),
+]
+
+DEDUCTION_COLUMNS = [
+    ('name', 'الموظف'),
+    ('type', 'النوع'),
+    ('date', 'التاريخ'),
+    ('amount', 'المبلغ'),
+    ('reason', 'السبب'),
+]
+
+ADVANCE_COLUMNS = [
+    ('name', 'الموظف'),
+    ('type', 'النوع'),
+    ('date', 'التاريخ'),
+    ('amount', 'المبلغ'),
+    ('due', 'شهر الاستحقاق'),
+]
+
+DAY_NAMES = ["الاثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت", "الأحد"]
+
+MONEY_FORMAT = '#,##0.00'
+COUNT_FORMAT = '0'
+DATE_FORMAT = 'yyyy-mm-dd'
+
+# تنسيق عرض الأعمدة الرقمية (الأعمدة غير المذكورة نصوص)
+COLUMN_FORMATS = {
+    'date': DATE_FORMAT,
+    'base_rate': MONEY_FORMAT,
+    'current_rate': MONEY_FORMAT,
+    'sessions': COUNT_FORMAT,
+    'sessions_salary': MONEY_FORMAT,
+    'performance_sessions': COUNT_FORMAT,
+    'performance_bonus': MONEY_FORMAT,
+    'daily_bonus': MONEY_FORMAT,
+    'base_salary': MONEY_FORMAT,
+    'monthly_salary': MONEY_FORMAT,
+    'monthly_bonus': MONEY_FORMAT,
+    'deduction': MONEY_FORMAT,
+    'advance': MONEY_FORMAT,
+    'salary': MONEY_FORMAT,
+    'rate': MONEY_FORMAT,
+    'amount': MONEY_FORMAT,
+}
+
+# عدد الصفوف بين تحديثات التقدم
+STEP_ROWS = 200
+
+
+@contextlib.contextmanager
+def streaming_workbook(path):
+    """ملف إكسل يُكتب صفاً صفاً، ولا يُترك ملف ناقص إذا توقفت الكتابة بخطأ أو إلغاء"""
+    # xlsxwriter تُستورد عند التصدير فقط حتى لا تبطئ فتح الواجهة
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        yield workbook
+    except BaseException:
+        workbook.close()
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    workbook.close()
+
+
+class SheetWriter:
+    """ورقة بصف عناوين ثم صف لكل قاموس يُمرر إلى write
+
+    في وضع constant_memory تُكتب الصفوف بالترتيب فقط، لذلك لا يُعاد إلى صف
+    سابق. القيمة الفارغة أو غير الموجودة تترك الخلية فارغة.
+    """
+
+    def __init__(self, workbook, title, columns, formats=COLUMN_FORMATS):
+        self.sheet = workbook.add_worksheet(title)
+        self.sheet.right_to_left()
+        self.keys = [key for key, _ in columns]
+        self.formats = []
+        self.bold_formats = []
+        for key in self.keys:
+            number_format = formats.get(key)
+            self.formats.append(workbook.add_format({'num_format': number_format})
+                                if number_format else None)
+            self.bold_formats.append(workbook.add_format({'bold': True, 'num_format': number_format})
+                                     if number_format else workbook.add_format({'bold': True}))
+
+        header = workbook.add_format({'bold': True, 'bg_color': '#D9D9D9', 'border': 1})
+        for c, (_, text) in enumerate(columns):
+            self.sheet.set_column(c, c, max(12, len(text) + 4))
+            self.sheet.write_string(0, c, text, header)
+        self.sheet.freeze_panes(1, 0)
+        self.row = 1
+
+    def write(self, values, bold=False):
+        formats = self.bold_formats if bold else self.formats
+        for c, key in enumerate(self.keys):
+            value = values.get(key)
+            if value is None or value == '':
+                continue
+            if isinstance(value, datetime.date):
+                self.sheet.write_datetime(self.row, c, value, formats[c])
+            elif isinstance(value, (int, float)):
+                self.sheet.write_number(self.row, c, value, formats[c])
+            else:
+                self.sheet.write_string(self.row, c, str(value), formats[c])
+        self.row += 1
+
+
+def write_rows(sheet, rows, total, step=None, text=''):
+    """كتابة صفوف من أي مصدر (قائمة أو مولد) مع تحديث التقدم كل STEP_ROWS صف"""
+    count = 0
+    for count, row in enumerate(rows, 1):
+        if step is not None and count % STEP_ROWS == 1:
+            step(count - 1, total, text)
+        sheet.write(row)
+    return count
+
+
+def write_payroll_xlsx(path, run, step=None):
+    """تقرير رواتب PayrollRun مع صف الإجمالي
+
+    step(done, total, text) اختيارية لعرض التقدم (وإلغاء الكتابة من خلالها).
+    """
+    with streaming_workbook(path) as workbook:
+        sheet = SheetWriter(workbook, 'الرواتب', REPORT_COLUMNS)
+        write_rows(sheet, run.reports, len(run.reports), step, "جاري كتابة صفوف التقرير...")
+        sheet.write({'name': 'الإجمالي', 'salary': run.total_salaries}, bold=True)
+
+
+def write_attendance_xlsx(path, records, step=None):
+    """سجل حضور بأعمدة ATTENDANCE_COLUMNS (التاريخ كقيمة datetime.date)"""
+    with streaming_workbook(path) as workbook:
+        sheet = SheetWriter(workbook, 'الحضور', ATTENDANCE_COLUMNS)
+        write_rows(sheet, records, len(records), step, "جاري كتابة سجل الحضور...")
+
+
+def ledger_records(index, group, name, ledger, lo=None, hi=None):
+    """(اليوم كـ datetime.date، التاريخ كما هو محفوظ، السجل) بين lo و hi مرتبة حسب التاريخ"""
+    records = index.source(group)[name].get(ledger, {})
+    for ordinal, date in index.entries(group, name, ledger, lo, hi):
+        yield datetime.date.fromordinal(ordinal), date, records[date]
+
+
+def write_ledger_workbook(path, index, run, step=None):
+    """ملف واحد لفترة run: ملخص الرواتب وسجلات الحضور والمكافآت والخصومات والسلف
+
+    تُكتب الأوراق كلها في مرور واحد على الموظفين عبر فهرس التواريخ، فلا تُقرأ
+    إلا سجلات الفترة. index يجب أن يكون نفس الفهرس (أو نسخة منه) الذي حُسب
+    منه run.
+    """
+    lo, hi = period_bounds(run.from_date, run.to_date)
+    roster = [(group, name) for group in GROUPS for name in index.source(group)]
+
+    with streaming_workbook(path) as workbook:
+        summary = SheetWriter(workbook, 'الرواتب', REPORT_COLUMNS)
+        attendance = SheetWriter(workbook, 'الحضور', LEDGER_ATTENDANCE_COLUMNS)
+        bonuses = SheetWriter(workbook, 'المكافآت', BONUS_COLUMNS)
+        deductions = SheetWriter(workbook, 'الخصومات', DEDUCTION_COLUMNS)
+        advances = SheetWriter(workbook, 'السلف', ADVANCE_COLUMNS)
+
+        for report in run.reports:
+            summary.write(report)
+        summary.write({'name': 'الإجمالي', 'salary': run.total_salaries}, bold=True)
+
+        for i, (group, name) in enumerate(roster):
+            if step is not None:
+                step(i, len(roster), "جاري كتابة سجلات الموظفين...")
+            emp_type = 'بحصص' if group == 'employees' else 'راتب ثابت'
+
+            for day, _, record in ledger_records(index, group, name, 'attendance', lo, hi):
+                attendance.write({
+                    'name': name,
+                    'date': day,
+                    'day': DAY_NAMES[day.weekday()],
+                    'sessions': record.get('sessions', 0),
+                    'daily_bonus': record.get('daily_bonus', 0)
+                })
+
+            for day, _, record in ledger_records(index, group, name, 'performance_bonus', lo, hi):
+                bonuses.write({
+                    'name': name,
+                    'type': emp_type,
+                    'date': day,
+                    'kind': 'بونص الأداء',
+                    'sessions': record.get('sessions', 0),
+                    'rate': record.get('rate', 0),
+                    'amount': record.get('amount', 0)
+                })
+            for day, _, amount in ledger_records(index, group, name, 'monthly_bonuses', lo, hi):
+                bonuses.write({'name': name, 'type': emp_type, 'date': day,
+                               'kind': 'البونص الشهري', 'amount': amount})
+
+            for day, _, record in ledger_records(index, group, name, 'deductions', lo, hi):
+                deductions.write({
+                    'name': name,
+                    'type': emp_type,
+                    'date': day,
+                    'amount': record.get('amount', 0),
+                    'reason': record.get('reason', '')
+                })
+
+            due_dates = index.source(group)[name].get('advance_due_dates', {})
+            for day, date, amount in ledger_records(index, group, name, 'advances', lo, hi):
+                due = due_dates.get(date) or {}
+                advances.write({
+                    'name': name,
+                    'type': emp_type,
+                    'date': day,
+                    'amount': amount,
+                    'due': f"{due['month']}/{due['year']}" if due.get('month') and due.get('year') else ''
+                })
@@ -0,0 +1,925 @@
+import datetime
+import os
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from perfection_store import GROUPS, date_ordinal
+
+# السجلات المؤرخة التي تدخل في حساب الراتب
+DATED_LEDGERS = ('attendance', 'performance_bonus', 'monthly_bonuses',
+                 'deductions', 'advances', 'monthly_rates')
+
+# بيانات الموظف التي يحتاجها حساب الراتب (تُرسل وحدها إلى العمليات المتوازية)
+PAYROLL_FIELDS = DATED_LEDGERS + ('advance_due_dates', 'monthly_salaries',
+                                  'current_rate', 'monthly_salary')
+
+# عدد نتائج الرواتب المحفوظة قبل حذف الأقدم استخداماً
+SALARY_CACHE_SIZE = 2048
+
+# الحقول التي تُجمع شهرياً لكل سجل (None تعني أن القيمة رقم مباشر)
+TOTAL_FIELDS = {
+    'attendance': ('sessions', 'daily_bonus'),
+    'performance_bonus': ('sessions', 'amount'),
+    'monthly_bonuses': None,
+    'deductions': ('amount',),
+}
+
+
+def month_key(ordinal):
+    """رقم الشهر المتسلسل (السنة × 12 + الشهر - 1) ليوم معين"""
+    date = datetime.date.fromordinal(ordinal)
+    return date.year * 12 + date.month - 1
+
+
+def month_start(key):
+    return datetime.date(key // 12, key % 12 + 1, 1).toordinal()
+
+
+def month_end(key):
+    return month_start(key + 1) - 1
+
+
+class DateSeries:
+    """تواريخ سجل واحد مرتبة حسب رقم اليوم للبحث الثنائي"""
+
+    def __init__(self, dates=()):
+        pairs = []
+        for date in dates:
+            ordinal = date_ordinal(date)
+            if ordinal is not None:
+                pairs.append((ordinal, date))
+        pairs.sort()
+        self.ordinals = [ordinal for ordinal, _ in pairs]
+        self.dates = [date for _, date in pairs]
+        self.totals = None
+
+    def __len__(self):
+        return len(self.dates)
+
+    def position(self, ordinal, date):
+        # قد يتكرر رقم اليوم لتواريخ مكتوبة بصيغ مختلفة (2024-1-5 و 2024-01-05)
+        i = bisect_left(self.ordinals, ordinal)
+        j = bisect_right(self.ordinals, ordinal, i)
+        return bisect_left(self.dates, date, i, j)
+
+    def add(self, date):
+        ordinal = date_ordinal(date)
+        if ordinal is None:
+            return
+        i = self.position(ordinal, date)
+        if i < len(self.dates) and self.dates[i] == date:
+            return
+        self.ordinals.insert(i, ordinal)
+        self.dates.insert(i, date)
+
+    def remove(self, date):
+        ordinal = date_ordinal(date)
+        if ordinal is None:
+            return
+        i = self.position(ordinal, date)
+        if i < len(self.dates) and self.dates[i] == date:
+            del self.ordinals[i]
+            del self.dates[i]
+
+    def bounds(self, lo=None, hi=None):
+        """موقع أول وآخر سجل (غير شامل) بين lo و hi"""
+        i = 0 if lo is None else bisect_left(self.ordinals, lo)
+        j = len(self.ordinals) if hi is None else bisect_right(self.ordinals, hi, i)
+        return i, j
+
+
+class MonthTotals:
+    """مجاميع شهرية تراكمية لسجل واحد
+    
+    الأشهر الكاملة في الفترة تُقرأ من المجاميع التراكمية، وأطراف الفترة
+    (الأشهر الجزئية) تُجمع من السجلات مباشرة. الشهر المعدّل يُعاد حسابه
+    من سجلاته عند أول استعلام بعد التعديل.
+    """
+
+    def __init__(self, series, fields):
+        self.series = series
+        self.fields = fields
+        self.buckets = None
+        self.dirty = set()
+        self.months = []
+        self.prefix = None
+
+    def invalidate(self, ordinal):
+        if self.buckets is not None:
+            self.dirty.add(month_key(ordinal))
+        self.prefix = None
+
+    def zero(self):
+        return (0,) * (1 if self.fields is None else len(self.fields))
+
+    def sum_records(self, records, i, j):
+        if i >= j:
+            return self.zero()
+        dates = self.series.dates
+        if self.fields is None:
+            total = 0
+            for k in range(i, j):
+                total += records[dates[k]]
+            return (total,)
+        totals = [0] * len(self.fields)
+        for k in range(i, j):
+            record = records[dates[k]]
+            for f, field in enumerate(self.fields):
+                totals[f] += record.get(field, 0)
+        return tuple(totals)
+
+    def prepare(self, records):
+        if self.buckets is None:
+            self.buckets = {}
+            ordinals = self.series.ordinals
+            i = 0
+            while i < len(ordinals):
+                key = month_key(ordinals[i])
+                j = bisect_right(ordinals, month_end(key), i)
+                self.buckets[key] = self.sum_records(records, i, j)
+                i = j
+            self.dirty.clear()
+        elif self.dirty:
+            for key in self.dirty:
+                i, j = self.series.bounds(month_start(key), month_end(key))
+                if i < j:
+                    self.buckets[key] = self.sum_records(records, i, j)
+                else:
+                    self.buckets.pop(key, None)
+            self.dirty.clear()
+
+        if self.prefix is None:
+            self.months = sorted(self.buckets)
+            running = self.zero()
+            self.prefix = [running]
+            for key in self.months:
+                running = tuple(a + b for a, b in zip(running, self.buckets[key]))
+                self.prefix.append(running)
+
+    def total(self, records, lo=None, hi=None):
+        """مجموع الحقول للسجلات بين lo و hi"""
+        if lo is not None and hi is not None and month_key(lo) == month_key(hi):
+            return self.sum_records(records, *self.series.bounds(lo, hi))
+
+        self.prepare(records)
+        first = None if lo is None else month_key(lo)
+        if first is not None and lo != month_start(first):
+            first += 1
+        last = None if hi is None else month_key(hi)
+        if last is not None and hi != month_end(last):
+            last -= 1
+
+        a = 0 if first is None else bisect_left(self.months, first)
+        b = len(self.months) if last is None else bisect_right(self.months, last)
+        totals = self.zero()
+        if a < b:
+            totals = tuple(y - x for x, y in zip(self.prefix[a], self.prefix[b]))
+
+        # الأطراف الجزئية من السجلات مباشرة
+        if first is not None and lo < month_start(first):
+            edge = self.sum_records(records, *self.series.bounds(lo, month_start(first) - 1))
+            totals = tuple(x + y for x, y in zip(totals, edge))
+        if last is not None and hi > month_end(last):
+            edge = self.sum_records(records, *self.series.bounds(month_end(last) + 1, hi))
+            totals = tuple(x + y for x, y in zip(totals, edge))
+        return totals
+
+
+class PayrollIndex:
+    """فهرس تواريخ مرتب لكل موظف ونوع سجل، يُبنى عند التحميل ويُحدّث عند كل تعديل"""
+
+    def __init__(self, employees, other_employees):
+        self.employees = employees
+        self.other_employees = other_employees
+        self.series = {}
+        self.version = 0
+        self._columns = None
+        self.rebuild()
+
+    def source(self, group):
+        return self.employees if group == 'employees' else self.other_employees
+
+    def rebuild(self):
+        self.series = {}
+        self.version += 1
+        for group in GROUPS:
+            for name in self.source(group):
+                self.index_employee(group, name)
+
+    def index_employee(self, group, name):
+        employee = self.source(group).get(name)
+        for ledger in DATED_LEDGERS:
+            self.index_ledger(group, name, ledger, employee)
+
+    def index_ledger(self, group, name, ledger, employee=None):
+        if employee is None:
+            employee = self.source(group).get(name)
+        records = employee.get(ledger) if employee else None
+        if not isinstance(records, dict):
+            self.series.pop((group, name, ledger), None)
+            return
+        series = DateSeries(records)
+        if ledger in TOTAL_FIELDS:
+            series.totals = MonthTotals(series, TOTAL_FIELDS[ledger])
+        self.series[(group, name, ledger)] = series
+
+    def refresh(self, path):
+        """تحديث الفهرس بعد تعديل مسار في البيانات (نفس مسارات commit_changes)"""
+        group = path[0]
+        if group not in GROUPS:
+            return
+        self.version += 1
+        if len(path) == 1:
+            for key in [k for k in self.series if k[0] == group]:
+                del self.series[key]
+            for name in self.source(group):
+                self.index_employee(group, name)
+            return
+
+        name = path[1]
+        if len(path) == 2 or name not in self.source(group):
+            for ledger in DATED_LEDGERS:
+                self.series.pop((group, name, ledger), None)
+            self.index_employee(group, name)
+            return
+
+        ledger = path[2]
+        if ledger not in DATED_LEDGERS:
+            return
+        if len(path) == 3:
+            self.index_ledger(group, name, ledger)
+            return
+
+        date = path[3]
+        series = self.series.get((group, name, ledger))
+        if series is None:
+            self.index_ledger(group, name, ledger)
+            return
+        if date in self.source(group)[name].get(ledger, {}):
+            series.add(date)
+        else:
+            series.remove(date)
+        ordinal = date_ordinal(date)
+        if series.totals is not None and ordinal is not None:
+            series.totals.invalidate(ordinal)
+
+    def entries(self, group, name, ledger, lo=None, hi=None):
+        """(رقم اليوم، التاريخ) للسجلات بين lo و hi مرتبة حسب التاريخ"""
+        series = self.series.get((group, name, ledger))
+        if not series:
+            return []
+        i, j = series.bounds(lo, hi)
+        return list(zip(series.ordinals[i:j], series.dates[i:j]))
+
+    def totals(self, group, name, ledger, lo=None, hi=None):
+        """مجاميع حقول السجل بين lo و hi (انظر TOTAL_FIELDS)"""
+        series = self.series.get((group, name, ledger))
+        fields = TOTAL_FIELDS[ledger]
+        if not series:
+            return (0,) * (1 if fields is None else len(fields))
+        return series.totals.total(self.source(group)[name][ledger], lo, hi)
+
+    def columns(self, lo=None, hi=None):
+        """سجلات الفترة في مصفوفات عمودية، تُبنى مرة واحدة لكل فترة وإصدار من البيانات"""
+        columns = self._columns
+        if columns is None or (columns.version, columns.lo, columns.hi) != (self.version, lo, hi):
+            self._columns = columns = RosterColumns(self, lo, hi)
+        return columns
+
+    def latest(self, group, name, ledger, lo=None, hi=None):
+        """تاريخ آخر سجل بين lo و hi أو None"""
+        series = self.series.get((group, name, ledger))
+        if not series:
+            return None
+        i, j = series.bounds(lo, hi)
+        return series.dates[j - 1] if i < j else None
+
+    def ledger_keys(self, groups, ledgers, after=None, limit=None, lo=None, hi=None, names=None):
+        """مفاتيح السجلات مرتبة حسب (المجموعة، الموظف، السجل، رقم اليوم، التاريخ)
+
+        تبدأ بعد المفتاح after وتتوقف عند limit مفتاح، فتُجلب الصفحة التالية
+        من حيث انتهت السابقة. المجموعة والسجل في المفتاح هما موقعهما في
+        GROUPS و ledgers. names يحصر المفاتيح في موظفين محددين.
+        """
+        keys = []
+        for g, group in enumerate(GROUPS):
+            if group not in groups or (after is not None and g < after[0]):
+                continue
+            source = self.source(group)
+            shown = sorted(source if names is None else (name for name in names if name in source))
+            start = 0
+            if after is not None and g == after[0]:
+                start = bisect_left(shown, after[1])
+            for name in shown[start:]:
+                for l, ledger in enumerate(ledgers):
+                    if after is not None and (g, name, l) < after[:3]:
+                        continue
+                    series = self.series.get((group, name, ledger))
+                    if not series:
+                        continue
+                    i, j = series.bounds(lo, hi)
+                    if after is not None and (g, name, l) == after[:3]:
+                        k = series.position(after[3], after[4])
+                        if k < len(series.dates) and series.dates[k] == after[4]:
+                            k += 1
+                        i = max(i, k)
+                    for k in range(i, j):
+                        keys.append((g, name, l, series.ordinals[k], series.dates[k]))
+                        if limit is not None and len(keys) >= limit:
+                            return keys
+        return keys
+
+
+class SalaryCache:
+    """نتائج حساب الرواتب المحفوظة حسب (الموظف، بداية الفترة، نهايتها)
+    
+    عند تعديل سجل بتاريخ معين تُحذف فقط نتائج هذا الموظف للفترات التي
+    تحتوي هذا التاريخ. عند امتلاء الذاكرة تُحذف أقدم نتيجة استخداماً.
+    """
+
+    def __init__(self, max_size=SALARY_CACHE_SIZE):
+        self.max_size = max_size
+        self.results = OrderedDict()
+        self.keys_by_name = {}
+
+    def get(self, name, lo, hi):
+        key = (name, lo, hi)
+        report = self.results.get(key)
+        if report is None:
+            return None
+        self.results.move_to_end(key)
+        return dict(report)
+
+    def put(self, name, lo, hi, report):
+        key = (name, lo, hi)
+        self.results[key] = dict(report)
+        self.results.move_to_end(key)
+        self.keys_by_name.setdefault(name, set()).add(key)
+        while len(self.results) > self.max_size:
+            old_key, _ = self.results.popitem(last=False)
+            self.discard_key(old_key)
+
+    def discard_key(self, key):
+        keys = self.keys_by_name.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_name[key[0]]
+
+    def clear(self):
+        self.results.clear()
+        self.keys_by_name.clear()
+
+    def invalidate(self, name, start=None, end=None):
+        """حذف نتائج الموظف للفترات التي تتقاطع مع [start, end] (أو كلها)"""
+        for key in list(self.keys_by_name.get(name, ())):
+            _, lo, hi = key
+            if start is not None and hi is not None and hi < start:
+                continue
+            if end is not None and lo is not None and lo > end:
+                continue
+            del self.results[key]
+            self.discard_key(key)
+
+    def refresh(self, path):
+        """حذف النتائج المتأثرة بتعديل مسار في البيانات (نفس مسارات commit_changes)"""
+        group = path[0]
+        if group not in GROUPS:
+            return
+        if len(path) == 1:
+            self.clear()
+            return
+        name = path[1]
+        if len(path) < 4:
+            # تعديل بيانات الموظف نفسه (مثل سعر الحصة) يؤثر على كل الفترات
+            self.invalidate(name)
+            return
+
+        ledger, key = path[2], path[3]
+        if ledger == 'monthly_salaries':
+            try:
+                month, year = map(int, key.split('_'))
+                start, end = month_ordinals(year, month)
+            except ValueError:
+                start = end = None
+        else:
+            start = end = date_ordinal(key)
+        if start is None:
+            self.invalidate(name)
+        else:
+            self.invalidate(name, start, end)
+
+
+def cached_salary(cache, index, name, from_date=None, to_date=None):
+    """calculate_salary مع حفظ النتيجة في cache"""
+    lo, hi = period_bounds(from_date, to_date)
+    report = cache.get(name, lo, hi)
+    if report is None:
+        report = calculate_salary(index, name, from_date, to_date)
+        if report is None:
+            return None
+        cache.put(name, lo, hi, report)
+    return report
+
+
+def parse_report_period(from_text, to_text, month, year):
+    """فترة التقرير من حقول الإدخال: التاريخان إن وُجدا وإلا الشهر المحدد
+    
+    تعيد (from_date, to_date) وتطلق ValueError برسالة الخطأ المناسبة.
+    """
+    from_date = None
+    to_date = None
+
+    if not from_text and not to_text:
+        # إذا لم يتم تحديد تاريخ، نستخدم الشهر المحدد فقط
+        month = int(month)
+        year = int(year)
+        from_date = datetime.datetime(year, month, 1)
+        to_date = datetime.datetime(year, month, 1) + datetime.timedelta(days=32)
+        to_date = to_date.replace(day=1) - datetime.timedelta(days=1)
+    else:
+        if from_text:
+            try:
+                from_date = datetime.datetime.strptime(from_text, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError("صيغة تاريخ البداية غير صحيحة")
+
+        if to_text:
+            try:
+                to_date = datetime.datetime.strptime(to_text, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError("صيغة تاريخ النهاية غير صحيحة")
+
+    if from_date and to_date and from_date > to_date:
+        raise ValueError("تاريخ البداية يجب أن يكون قبل تاريخ النهاية")
+
+    return from_date, to_date
+
+
+class PayrollRun:
+    """رواتب جميع الموظفين لفترة واحدة، تُحسب مرة وتُستخدم في العرض والتصدير
+    
+    إذا حُدد workers تُوزع الحسابات على عمليات متوازية (انظر
+    calculate_roster_parallel).
+    """
+
+    def __init__(self, index, from_date=None, to_date=None, workers=None):
+        self.from_date = from_date
+        self.to_date = to_date
+        self.version = index.version
+        if workers:
+            self.reports = calculate_roster_parallel(index, from_date, to_date, workers)
+        else:
+            self.reports = calculate_roster(index, from_date, to_date)
+        self.total_salaries = sum(report['salary'] for report in self.reports)
+        self.by_name = {}
+        for report in self.reports:
+            self.by_name.setdefault(report['name'], report)
+
+    def matches(self, index, from_date, to_date):
+        """هل ما زالت النتيجة صالحة لهذه الفترة ولهذه البيانات"""
+        return (self.version == index.version and self.from_date == from_date
+                and self.to_date == to_date)
+
+    def report(self, name):
+        return self.by_name.get(name)
+
+
+def period_bounds(from_date=None, to_date=None):
+    """حدود الفترة كأرقام أيام (None تعني بدون حد)"""
+    return (from_date.toordinal() if from_date else None,
+            to_date.toordinal() if to_date else None)
+
+
+def month_ordinals(year, month):
+    """رقم اليوم الأول والأخير من الشهر"""
+    start = datetime.date(year, month, 1)
+    end = (start + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+    return start.toordinal(), end.toordinal()
+
+
+def month_overlaps(month_year, lo=None, hi=None):
+    """هل يتقاطع الشهر "الشهر_السنة" مع الفترة بين lo و hi"""
+    month, year = map(int, month_year.split('_'))
+    start, end = month_ordinals(year, month)
+    return (lo is None or end >= lo) and (hi is None or start <= hi)
+
+
+def sum_advances(index, group, name, employee, lo, hi):
+    """مجموع السلف المسجلة في الفترة والمستحقة خلالها"""
+    advances = employee.get('advances', {})
+    due_dates = employee.get('advance_due_dates', {})
+    advance_amount = 0
+    for _, date in index.entries(group, name, 'advances', lo, hi):
+        due_date = due_dates.get(date, {})
+        due_month = due_date.get('month', 0)
+        due_year = due_date.get('year', 0)
+
+        if due_month and due_year:
+            due_ordinal = datetime.date(due_year, due_month, 1).toordinal()
+            if lo is not None and due_ordinal < lo:
+                continue
+            if hi is not None and due_ordinal > hi:
+                continue
+
+        advance_amount += advances[date]
+    return advance_amount
+
+
+def calculate_salary(index, name, from_date=None, to_date=None):
+    """حساب راتب موظف في الفترة المحددة، أو None إذا لم يكن موجوداً"""
+    lo, hi = period_bounds(from_date, to_date)
+
+    if name in index.employees:
+        employee = index.employees[name]
+        base_rate = employee.get('current_rate', 0)
+
+        # حساب الحضور وبونص الأداء في الفترة المحددة
+        total_sessions, total_daily_bonus = index.totals('employees', name, 'attendance', lo, hi)
+        performance_sessions, performance_bonus = index.totals('employees', name, 'performance_bonus', lo, hi)
+        monthly_bonus, = index.totals('employees', name, 'monthly_bonuses', lo, hi)
+        deduction, = index.totals('employees', name, 'deductions', lo, hi)
+
+        # السلف تعتمد على تاريخ الاستحقاق أيضاً فتُجمع من سجلاتها مباشرة
+        advance_amount = sum_advances(index, 'employees', name, employee, lo, hi)
+
+        # حساب سعر الحصة (آخر سعر تم تحديده في الفترة)
+        current_rate = base_rate
+        rate_date = index.latest('employees', name, 'monthly_rates', lo, hi)
+        if rate_date is not None:
+            current_rate = employee['monthly_rates'][rate_date]
+
+        # حساب راتب الحصص (عدد الحصص × سعر الحصة)
+        sessions_salary = total_sessions * current_rate
+
+        salary = sessions_salary + performance_bonus + total_daily_bonus + monthly_bonus - deduction - advance_amount
+
+        return {
+            'name': name,
+            'type': 'بحصص',
+            'base_rate': base_rate,
+            'current_rate': current_rate,
+            'sessions': total_sessions,
+            'sessions_salary': sessions_salary,
+            'performance_sessions': performance_sessions,
+            'performance_bonus': performance_bonus,
+            'daily_bonus': total_daily_bonus,
+            'monthly_bonus': monthly_bonus,
+            'deduction': deduction,
+            'advance': advance_amount,
+            'salary': salary,
+            'from_date': from_date.strftime('%Y-%m-%d') if from_date else '',
+            'to_date': to_date.strftime('%Y-%m-%d') if to_date else ''
+        }
+    elif name in index.other_employees:
+        employee = index.other_employees[name]
+        base_salary = employee.get('monthly_salary', 0)
+
+        # حساب الرواتب الشهرية في الفترة المحددة
+        monthly_salary = 0
+        for month_year, salary in employee.get('monthly_salaries', {}).items():
+            month, year = map(int, month_year.split('_'))
+            month_start, month_end = month_ordinals(year, month)
+            if lo is not None and month_end < lo:
+                continue
+            if hi is not None and month_start > hi:
+                continue
+            monthly_salary += salary
+
+        # إذا لم يكن هناك رواتب محددة، نستخدم الراتب الأساسي
+        if monthly_salary == 0 and base_salary > 0:
+            # حساب عدد الأشهر في الفترة
+            if from_date and to_date:
+                months = (to_date.year - from_date.year) * 12 + (to_date.month - from_date.month) + 1
+                monthly_salary = base_salary * months
+
+        monthly_bonus, = index.totals('other_employees', name, 'monthly_bonuses', lo, hi)
+        deduction, = index.totals('other_employees', name, 'deductions', lo, hi)
+
+        advance_amount = sum_advances(index, 'other_employees', name, employee, lo, hi)
+
+        salary = monthly_salary + monthly_bonus - deduction - advance_amount
+
+        return {
+            'name': name,
+            'type': 'راتب ثابت',
+            'base_salary': base_salary,
+            'monthly_salary': monthly_salary,
+            'monthly_bonus': monthly_bonus,
+            'deduction': deduction,
+            'advance': advance_amount,
+            'salary': salary,
+            'from_date': from_date.strftime('%Y-%m-%d') if from_date else '',
+            'to_date': to_date.strftime('%Y-%m-%d') if to_date else ''
+        }
+    return None
+
+
+class RosterColumns:
+    """السجلات المؤرخة لكل الموظفين بين lo و hi في مصفوفات NumPy عمودية
+    
+    لكل نوع سجل مصفوفة برقم الموظف ورقم اليوم وأعمدة القيم، مرتبة حسب
+    الموظف ثم التاريخ. رقم الموظف هو موقعه في roster. تُقرأ سجلات الفترة
+    فقط عبر فهرس التواريخ، فلا يتناسب البناء مع طول السجل كله.
+    """
+
+    def __init__(self, index, lo=None, hi=None):
+        import numpy as np
+
+        self.version = index.version
+        self.lo = lo
+        self.hi = hi
+        self.roster = roster_names(index)
+        self.rate_values = []
+
+        rows = {kind: [] for kind in ('attendance', 'performance_bonus', 'monthly_bonuses',
+                                      'deductions', 'advances', 'monthly_rates',
+                                      'monthly_salaries')}
+        for emp_id, (group, name) in enumerate(self.roster):
+            employee = index.source(group)[name]
+            for ledger in DATED_LEDGERS:
+                if group == 'other_employees' and ledger in ('attendance', 'performance_bonus',
+                                                             'monthly_rates'):
+                    continue
+                series = index.series.get((group, name, ledger))
+                if not series:
+                    continue
+                records = employee[ledger]
+                out = rows[ledger]
+                i, j = series.bounds(lo, hi)
+                for ordinal, date in zip(series.ordinals[i:j], series.dates[i:j]):
+                    value = records[date]
+                    if ledger == 'attendance':
+                        out.append((emp_id, ordinal, value.get('sessions', 0), value.get('daily_bonus', 0)))
+                    elif ledger == 'performance_bonus':
+                        out.append((emp_id, ordinal, value.get('sessions', 0), value.get('amount', 0)))
+                    elif ledger == 'deductions':
+                        out.append((emp_id, ordinal, value.get('amount', 0)))
+                    elif ledger == 'advances':
+                        due_date = employee.get('advance_due_dates', {}).get(date, {})
+                        due_month = due_date.get('month', 0)
+                        due_year = due_date.get('year', 0)
+                        due = (datetime.date(due_year, due_month, 1).toordinal()
+                               if due_month and due_year else -1)
+                        out.append((emp_id, ordinal, value, due))
+                    elif ledger == 'monthly_rates':
+                        out.append((emp_id, ordinal, len(self.rate_values)))
+                        self.rate_values.append(value)
+                    else:
+                        out.append((emp_id, ordinal, value))
+
+            if group == 'other_employees':
+                for month_year, salary in employee.get('monthly_salaries', {}).items():
+                    month, year = map(int, month_year.split('_'))
+                    start, end = month_ordinals(year, month)
+                    if (lo is None or end >= lo) and (hi is None or start <= hi):
+                        rows['monthly_salaries'].append((emp_id, start, end, salary))
+
+        self.arrays = {}
+        for kind, kind_rows in rows.items():
+            width = {'attendance': 4, 'performance_bonus': 4, 'advances': 4,
+                     'monthly_salaries': 4}.get(kind, 3)
+            columns = list(zip(*kind_rows)) or [()] * width
+            # الأعمدة الصحيحة تبقى int64 حتى تطابق النتائج الحساب العادي
+            self.arrays[kind] = [np.array(column) if column else np.zeros(0, dtype=np.int64)
+                                 for column in columns]
+
+
+def calculate_roster(index, from_date=None, to_date=None):
+    """حساب رواتب جميع الموظفين في الفترة دفعة واحدة
+    
+    تعيد نفس قواميس calculate_salary بترتيب الموظفين بحصص ثم الموظفين براتب
+    ثابت. إذا لم تكن NumPy متوفرة يُستخدم الحساب العادي لكل موظف.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        names = list(index.employees) + list(index.other_employees)
+        return [calculate_salary(index, name, from_date, to_date) for name in names]
+
+    lo, hi = period_bounds(from_date, to_date)
+    # المصفوفات تحتوي سجلات الفترة فقط، فلا حاجة لتصفيتها بالتاريخ هنا
+    columns = index.columns(lo, hi)
+    arrays = columns.arrays
+    count = len(columns.roster)
+
+    def in_range(ordinals):
+        mask = np.ones(len(ordinals), dtype=bool)
+        if lo is not None:
+            mask &= ordinals >= lo
+        if hi is not None:
+            mask &= ordinals <= hi
+        return mask
+
+    def total(emp, values, mask=None):
+        if mask is not None:
+            emp = emp[mask]
+            values = values[mask]
+        sums = np.bincount(emp, weights=values, minlength=count)
+        if values.dtype.kind in 'iub':
+            return sums.astype(np.int64).tolist()
+        # الموظف بدون سجلات يأخذ 0 كما في الحساب العادي وليس 0.0
+        counts = np.bincount(emp, minlength=count)
+        return [value if n else 0 for value, n in zip(sums.tolist(), counts.tolist())]
+
+    emp, _, sessions, daily_bonus = arrays['attendance']
+    total_sessions = total(emp, sessions)
+    total_daily_bonus = total(emp, daily_bonus)
+
+    emp, _, sessions, amount = arrays['performance_bonus']
+    performance_sessions = total(emp, sessions)
+    performance_bonus = total(emp, amount)
+
+    emp, _, amount = arrays['monthly_bonuses']
+    monthly_bonus = total(emp, amount)
+
+    emp, _, amount = arrays['deductions']
+    deduction = total(emp, amount)
+
+    # السلفة تُحسب إذا كان تاريخ استحقاقها (إن وجد) داخل الفترة أيضاً
+    emp, _, amount, due = arrays['advances']
+    advance = total(emp, amount, (due < 0) | in_range(due))
+
+    # آخر سعر في الفترة لكل موظف: السجلات مرتبة حسب الموظف ثم التاريخ
+    emp, _, positions = arrays['monthly_rates']
+    last = np.append(emp[1:] != emp[:-1], True) if len(emp) else emp.astype(bool)
+    latest_rate = dict(zip(emp[last].tolist(), positions[last].tolist()))
+
+    emp, _, _, amount = arrays['monthly_salaries']
+    monthly_salaries = total(emp, amount)
+
+    from_text = from_date.strftime('%Y-%m-%d') if from_date else ''
+    to_text = to_date.strftime('%Y-%m-%d') if to_date else ''
+    months = None
+    if from_date and to_date:
+        months = (to_date.year - from_date.year) * 12 + (to_date.month - from_date.month) + 1
+
+    reports = {}
+    for emp_id, (group, name) in enumerate(columns.roster):
+        employee = index.source(group)[name]
+        if group == 'employees':
+            base_rate = employee.get('current_rate', 0)
+            current_rate = base_rate
+            if emp_id in latest_rate:
+                current_rate = columns.rate_values[latest_rate[emp_id]]
+            sessions_salary = total_sessions[emp_id] * current_rate
+            salary = (sessions_salary + performance_bonus[emp_id] + total_daily_bonus[emp_id]
+                      + monthly_bonus[emp_id] - deduction[emp_id] - advance[emp_id])
+            reports[name] = {
+                'name': name,
+                'type': 'بحصص',
+                'base_rate': base_rate,
+                'current_rate': current_rate,
+                'sessions': total_sessions[emp_id],
+                'sessions_salary': sessions_salary,
+                'performance_sessions': performance_sessions[emp_id],
+                'performance_bonus': performance_bonus[emp_id],
+                'daily_bonus': total_daily_bonus[emp_id],
+                'monthly_bonus': monthly_bonus[emp_id],
+                'deduction': deduction[emp_id],
+                'advance': advance[emp_id],
+                'salary': salary,
+                'from_date': from_text,
+                'to_date': to_text
+            }
+        else:
+            base_salary = employee.get('monthly_salary', 0)
+            monthly_salary = monthly_salaries[emp_id]
+            if monthly_salary == 0 and base_salary > 0 and months is not None:
+                monthly_salary = base_salary * months
+            salary = monthly_salary + monthly_bonus[emp_id] - deduction[emp_id] - advance[emp_id]
+            reports[name] = {
+                'name': name,
+                'type': 'راتب ثابت',
+                'base_salary': base_salary,
+                'monthly_salary': monthly_salary,
+                'monthly_bonus': monthly_bonus[emp_id],
+                'deduction': deduction[emp_id],
+                'advance': advance[emp_id],
+                'salary': salary,
+                'from_date': from_text,
+                'to_date': to_text
+            }
+
+    # نفس ترتيب التقارير: الموظفون بحصص ثم الموظفون براتب ثابت
+    return [reports[name] for name in list(index.employees) + list(index.other_employees)]
+
+
+def roster_names(index):
+    """الموظفون بحصص ثم الموظفون براتب ثابت (بدون تكرار الاسم)"""
+    roster = [('employees', name) for name in index.employees]
+    roster += [('other_employees', name) for name in index.other_employees
+               if name not in index.employees]
+    return roster
+
+
+def payroll_slice(index, group, name, lo=None, hi=None):
+    """نسخة مختصرة من بيانات الموظف تكفي لحساب راتبه بين اليومين lo و hi
+    
+    كل السجلات المؤرخة تُصفى بالفترة عند الحساب (والسلفة بتاريخ استحقاقها
+    أيضاً)، فالسجلات خارجها لا تؤثر على النتيجة ولا تُرسل.
+    """
+    employee = index.source(group)[name]
+    compact = {}
+    for field in PAYROLL_FIELDS:
+        if field not in employee:
+            continue
+        value = employee[field]
+        series = index.series.get((group, name, field))
+        if (lo is not None or hi is not None) and series is not None:
+            i, j = series.bounds(lo, hi)
+            value = {date: value[date] for date in series.dates[i:j]}
+        compact[field] = value
+
+    if lo is not None or hi is not None:
+        # تواريخ الاستحقاق للسلف المرسلة فقط
+        if isinstance(compact.get('advance_due_dates'), dict):
+            advances = compact.get('advances', {})
+            compact['advance_due_dates'] = {date: due for date, due in compact['advance_due_dates'].items()
+                                            if date in advances}
+        if isinstance(compact.get('monthly_salaries'), dict):
+            compact['monthly_salaries'] = {
+                month_year: salary for month_year, salary in compact['monthly_salaries'].items()
+                if month_overlaps(month_year, lo, hi)}
+    return compact
+
+
+def payroll_snapshot(index, from_date=None, to_date=None):
+    """نسخة من بيانات رواتب الفترة لا تتأثر بالتعديلات اللاحقة، لحسابها في خيط آخر
+
+    تُنسخ سجلات الفترة فقط عبر payroll_slice، فيتناسب وقت النسخ في خيط
+    الواجهة مع حجم الفترة وليس مع السجل كله. تُنسخ قواميس السجلات نفسها
+    (التعديل يستبدل السجل ولا يغيّره في مكانه)، ويُبنى منها الفهرس في الخيط
+    الآخر عبر snapshot_index. النسخة تصلح لحساب هذه الفترة فقط.
+    """
+    lo, hi = period_bounds(from_date, to_date)
+    groups = []
+    for group in GROUPS:
+        groups.append({
+            name: {field: dict(value) if isinstance(value, dict) else value
+                   for field, value in payroll_slice(index, group, name, lo, hi).items()}
+            for name in index.source(group)
+        })
+    return groups[0], groups[1], index.version
+
+
+def snapshot_index(snapshot):
+    """فهرس نسخة payroll_snapshot بنفس رقم إصدار الفهرس الأصلي
+
+    فنتيجة PayrollRun المحسوبة منه تبقى صالحة (matches) للفهرس الأصلي طالما
+    لم تتغير بياناته بعد أخذ النسخة.
+    """
+    employees, other_employees, version = snapshot
+    index = PayrollIndex(employees, other_employees)
+    index.version = version
+    return index
+
+
+def _payroll_chunk(employees, other_employees, names, from_date, to_date):
+    # تعمل داخل العملية الفرعية: فهرس مستقل لهذه المجموعة من الموظفين فقط
+    index = PayrollIndex(employees, other_employees)
+    return [calculate_salary(index, name, from_date, to_date) for name in names]
+
+
+def calculate_roster_parallel(index, from_date=None, to_date=None, workers=None,
+                              chunk_size=None):
+    """calculate_salary لجميع الموظفين موزعة على عمليات متوازية
+    
+    كل عملية تستلم مجموعة من الموظفين مع payroll_slice لكل منهم فقط، وتعيد
+    النتائج بنفس ترتيب الإرسال، فالناتج مطابق للحساب العادي موظفاً بموظف
+    وبنفس ترتيب calculate_roster.
+    """
+    workers = workers or os.cpu_count() or 1
+    roster = roster_names(index)
+    if not chunk_size:
+        # عدة مجموعات لكل عملية لتوزيع الحمل بشكل متوازن
+        chunk_size = max(1, -(-len(roster) // (workers * 4)))
+
+    lo, hi = period_bounds(from_date, to_date)
+    chunks = []
+    for start in range(0, len(roster), chunk_size):
+        employees = {}
+        other_employees = {}
+        names = []
+        for group, name in roster[start:start + chunk_size]:
+            target = employees if group == 'employees' else other_employees
+            target[name] = payroll_slice(index, group, name, lo, hi)
+            names.append(name)
+        chunks.append((employees, other_employees, names))
+
+    if workers == 1 or len(chunks) <= 1:
+        results = [_payroll_chunk(*chunk, from_date, to_date) for chunk in chunks]
+    else:
+        # multiprocessing يُستورد عند الحاجة فقط حتى لا يبطئ فتح الواجهة
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_payroll_chunk, *chunk, from_date, to_date)
+                       for chunk in chunks]
+            results = [future.result() for future in futures]
+
+    reports = {}
+    for chunk, chunk_reports in zip(chunks, results):
+        for name, report in zip(chunk[2], chunk_reports):
+            reports[name] = report
+    return [reports[name] for name in list(index.employees) + list(index.other_employees)]
@@ -0,0 +1,399 @@
+"""كشوف رواتب جميع الموظفين لفترة واحدة (وورد و PDF)
+
+وورد: كشف الراتب المنسق (العناوين والجدول بتظليله وعرض أعمدته) يُبنى مرة
+واحدة لكل نوع موظف بقيم مؤقتة مثل {0} و {salary}، ثم يُنسخ عنصر XML الخاص
+به لكل موظف وتُستبدل القيم المؤقتة بنصوصه، بدلاً من إضافة الصفوف وتظليل
+الخلايا من جديد في كل كشف.
+
+PDF: ملف لكل موظف أو ملف واحد بصفحة لكل موظف. في وضع المجلد توزع الكشوف
+على عمليات فرعية يُجهز كل منها كائن PdfSlips واحداً عند بدئه ويكتب به كل
+ملفات مجموعاته.
+"""
+import copy
+import datetime
+import io
+import os
+import time
+import zipfile
+
+SLIP_TITLE = 'تقرير الموظف'
+
+# أحرف لا تصلح في أسماء الملفات داخل الملف المضغوط
+UNSAFE_FILENAME_CHARS = '<>:"/\\|?*'
+
+
+def slip_rows(report):
+    """(البند، القيمة) لكل صف في كشف الراتب بترتيب العرض، بدون صافي الراتب"""
+    rows = [('الاسم', report['name']), ('النوع', report['type'])]
+    if report['type'] == 'بحصص':
+        rows += [
+            ('سعر الحصة الأساسي', f"{report['base_rate']:.2f}"),
+            ('سعر الحصة الحالي', f"{report['current_rate']:.2f}"),
+            ('عدد الحصص العادية', report['sessions']),
+            ('راتب الحصص', f"{report['sessions_salary']:.2f}"),
+            ('عدد حصص الأداء', report['performance_sessions']),
+            ('بونص الأداء', f"{report['performance_bonus']:.2f}"),
+            ('إجمالي البونص اليومي', f"{report['daily_bonus']:.2f}"),
+            ('البونص الشهري', f"{report['monthly_bonus']:.2f}"),
+        ]
+    else:
+        rows += [
+            ('الراتب الأساسي', f"{report['base_salary']:.2f}"),
+            ('الراتب الشهري', f"{report['monthly_salary']:.2f}"),
+            ('البونص الشهري', f"{report['monthly_bonus']:.2f}"),
+        ]
+    rows += [
+        ('الخصومات', f"{report['deduction']:.2f}"),
+        ('السلف المستحقة', f"{report['advance']:.2f}"),
+    ]
+    return rows
+
+
+def slip_subtitle(report, month_text):
+    """اسم الموظف مع الفترة، أو مع الشهر إذا لم تُحدد الفترة بتواريخ"""
+    subtitle = f"الموظف: {report['name']}"
+    if report.get('from_date') and report.get('to_date'):
+        return subtitle + f" - الفترة من {report['from_date']} إلى {report['to_date']}"
+    return subtitle + f" - لشهر {month_text}"
+
+
+def slip_filename(name):
+    return ''.join('_' if ch in UNSAFE_FILENAME_CHARS else ch for ch in name).strip() or 'employee'
+
+
+def slip_filenames(reports):
+    """اسم ملف لكل كشف، مع رقم الكشف بعد الأسماء المكررة"""
+    names = []
+    used = set()
+    for i, report in enumerate(reports):
+        filename = slip_filename(report['name'])
+        if filename in used:
+            filename = f"{filename}_{i + 1}"
+        used.add(filename)
+        names.append(filename)
+    return names
+
+
+class WordSlips:
+    """قوالب كشوف الراتب ونسخها لكل موظف
+
+    تُبنى القوالب عند أول كشف من كل نوع (بحصص / راتب ثابت) في مستند مؤقت،
+    و render(report) تعيد عناصر الكشف جاهزة للإضافة قبل نهاية أي مستند.
+    """
+
+    def __init__(self, month_text, today=None):
+        # python-docx تُستورد عند التصدير فقط حتى لا تبطئ فتح الواجهة
+        from docx import Document
+        from docx.oxml.ns import qn
+
+        self.Document = Document
+        self.text_tag = qn('w:t')
+        self.month_text = month_text
+        self.today = (today or datetime.date.today()).strftime('%Y-%m-%d')
+        self.templates = {}
+        self.page_break = None
+
+    def template(self, labels):
+        if labels not in self.templates:
+            self.templates[labels] = self.build(labels)
+        return self.templates[labels]
+
+    def build(self, labels):
+        from docx.shared import Inches
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        from docx.enum.table import WD_TABLE_ALIGNMENT
+        from docx.oxml.ns import nsdecls
+        from docx.oxml import parse_xml
+
+        doc = self.Document()
+
+        title = doc.add_heading(SLIP_TITLE, level=1)
+        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        subtitle = doc.add_heading('{subtitle}', level=2)
+        subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+        table = doc.add_table(rows=len(labels) + 2, cols=2)
+        table.style = 'Table Grid'
+        table.alignment = WD_TABLE_ALIGNMENT.CENTER
+        table.autofit = False
+        table.allow_autofit = False
+        table.width = Inches(6)
+
+        def shade(cells, color):
+            for cell in cells:
+                cell._tc.get_or_add_tcPr().append(
+                    parse_xml(r'<w:shd {} w:fill="{}"/>'.format(nsdecls('w'), color)))
+
+        header = table.rows[0].cells
+        header[0].text = 'القيمة'
+        header[1].text = 'البند'
+        shade(header, 'D9D9D9')
+
+        for i, label in enumerate(labels):
+            cells = table.rows[i + 1].cells
+            cells[0].text = f'{{{i}}}'
+            cells[1].text = label
+            cells[0].width = Inches(4)
+            cells[1].width = Inches(2)
+
+        total = table.rows[-1].cells
+        total[0].text = '{salary}'
+        total[1].text = 'صافي الراتب'
+        for cell in total:
+            for paragraph in cell.paragraphs:
+                for run in paragraph.runs:
+                    run.bold = True
+        shade(total, 'B4C6E7')
+
+        doc.add_paragraph("\n")
+        doc.add_paragraph('{date}')
+        doc.add_paragraph("توقيع المدير: ________________")
+
+        # كل عناصر المستند المؤقت ما عدا إعدادات الصفحة في آخره
+        elements = list(doc.element.body)[:-1]
+        if self.page_break is None:
+            self.page_break = doc.add_page_break()._p
+        return elements
+
+    def render(self, report):
+        rows = slip_rows(report)
+        values = {
+            '{subtitle}': slip_subtitle(report, self.month_text),
+            '{salary}': f"{report['salary']:.2f}",
+            '{date}': f"تاريخ التقرير: {self.today}",
+        }
+        for i, (_, value) in enumerate(rows):
+            values[f'{{{i}}}'] = str(value)
+
+        elements = [copy.deepcopy(element)
+                    for element in self.template(tuple(label for label, _ in rows))]
+        for element in elements:
+            for text in element.iter(self.text_tag):
+                if text.text in values:
+                    text.text = values[text.text]
+        return elements
+
+    def append(self, doc, elements):
+        """إضافة عناصر قبل إعدادات الصفحة في نهاية المستند"""
+        section = doc.element.body[-1]
+        for element in elements:
+            section.addprevious(element)
+
+
+def write_word_payslips(path, reports, month_text, step=None):
+    """كشوف رواتب reports في مستند واحد (كل كشف في صفحة)، أو في ملف مضغوط
+    بمستند لكل موظف إذا كان امتداد path هو .zip
+
+    step(done, total, text) اختيارية لعرض التقدم (وإلغاء الكتابة من خلالها).
+    """
+    slips = WordSlips(month_text)
+    doc = slips.Document()
+    total = len(reports)
+
+    if os.path.splitext(path)[1].lower() != '.zip':
+        for i, report in enumerate(reports):
+            if step is not None:
+                step(i, total, f"جاري إضافة كشف {report['name']}...")
+            if i:
+                slips.append(doc, [copy.deepcopy(slips.page_break)])
+            slips.append(doc, slips.render(report))
+        if step is not None:
+            step(total, total, "جاري حفظ الملف...")
+        doc.save(path)
+        return
+
+    # أجزاء المستند الثابتة (الأنماط والإعدادات) تُحفظ مرة واحدة، ولكل موظف
+    # يُكتب document.xml فقط مع نسخ باقي الأجزاء كما هي
+    from docx.opc.oxml import serialize_part_xml
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    with zipfile.ZipFile(buffer) as package:
+        parts = [(info.filename, package.read(info)) for info in package.infolist()]
+    document_part = doc.part.partname.lstrip('/')
+
+    filenames = slip_filenames(reports)
+    try:
+        # ملفات وورد مضغوطة أصلاً فلا فائدة من ضغطها مرة أخرى
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as archive:
+            for i, (report, filename) in enumerate(zip(reports, filenames)):
+                if step is not None:
+                    step(i, total, f"جاري إضافة كشف {report['name']}...")
+                body = doc.element.body
+                for element in list(body)[:-1]:
+                    body.remove(element)
+                slips.append(doc, slips.render(report))
+
+                # أدنى مستوى ضغط: أسرع بكثير والفرق في الحجم صغير لهذه الأجزاء
+                buffer = io.BytesIO()
+                with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as slip:
+                    for name, data in parts:
+                        slip.writestr(name, serialize_part_xml(doc.element)
+                                      if name == document_part else data)
+                archive.writestr(f"{filename}.docx", buffer.getvalue())
+    except BaseException:
+        # لا يُترك ملف مضغوط ناقص بعد خطأ أو إلغاء
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+# ملفات خطوط كشوف PDF لكل نمط (الخط الغامق اختياري)
+PDF_FONT = 'DejaVu'
+PDF_FONT_FILES = {'': 'DejaVuSans.ttf', 'B': 'DejaVuSans-Bold.ttf'}
+
+# عدد الكشوف في كل مهمة ترسل إلى عملية فرعية
+PDF_CHUNK_SIZE = 50
+
+
+class PdfSlips:
+    """كشوف راتب PDF بواجهة fpdf2
+
+    تحليل ملفات TTF عند add_font هو أغلى جزء في إنشاء المستند، لكن fpdf2
+    تقلّص الخط المحلل نفسه إلى الأحرف المستخدمة عند output، فلا يصلح الخط
+    المحلل لمستند ثانٍ (ولا لنسخة من المستند). لذلك يُحلل الخط مرة لكل
+    مستند، والكشوف الكثيرة في ملف واحد تُكتب صفحات في مستند واحد
+    (write_many). إذا لم يوجد ملف الخط الغامق يُستخدم الخط العادي مكانه.
+    """
+
+    def __init__(self, font_dir='.', today=None):
+        self.fonts = {}
+        for style, filename in PDF_FONT_FILES.items():
+            path = os.path.join(font_dir, filename)
+            if style and not os.path.exists(path):
+                continue
+            self.fonts[style] = path
+        self.today = (today or datetime.date.today()).strftime('%Y-%m-%d')
+
+    def document(self):
+        """مستند جديد مع الخطوط"""
+        # fpdf تُستورد عند التصدير فقط حتى لا تبطئ فتح الواجهة
+        from fpdf import FPDF
+
+        pdf = FPDF()
+        for style, path in self.fonts.items():
+            pdf.add_font(PDF_FONT, style, path)
+        return pdf
+
+    def set_font(self, pdf, size, style=''):
+        pdf.set_font(PDF_FONT, style if style in self.fonts else '', size)
+
+    def add_slip(self, pdf, report, month_text, phone=''):
+        """صفحة كشف راتب موظف واحد في المستند pdf"""
+        from fpdf.enums import XPos, YPos
+
+        def line(text, align='R'):
+            pdf.cell(0, 10, text, align=align, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+        def row(label, value):
+            pdf.cell(100, 10, label, align='R')
+            pdf.cell(50, 10, value, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+        pdf.add_page()
+        self.set_font(pdf, 14)
+
+        # Title
+        line(f"تقرير راتب الموظف - {report['name']}", 'C')
+        pdf.ln(5)
+
+        # Employee info
+        line(f"النوع: {report['type']} | الهاتف: {phone}")
+        line(f"الشهر: {month_text}")
+        line(f"تاريخ التقرير: {self.today}")
+        pdf.ln(10)
+
+        # Report details (بدون الاسم والنوع المعروضين في الأعلى)
+        self.set_font(pdf, 12)
+        for label, value in slip_rows(report)[2:]:
+            row(f"{label}:", str(value))
+
+        pdf.ln(10)
+        self.set_font(pdf, 14, 'B')
+        row("صافي الراتب:", f"{report['salary']:.2f}")
+
+        pdf.ln(20)
+        self.set_font(pdf, 12)
+        line("توقيع الموظف: ________________")
+        line("توقيع المدير: ________________")
+        line(f"التاريخ: {self.today}")
+
+    def write(self, path, report, month_text, phone=''):
+        """كشف موظف واحد في ملف PDF مستقل"""
+        self.write_many(path, [(report, phone)], month_text)
+
+    def write_many(self, path, slips, month_text, step=None):
+        """[(التقرير، الهاتف)] في ملف PDF واحد بصفحة لكل كشف"""
+        pdf = self.document()
+        for i, (report, phone) in enumerate(slips):
+            if step is not None:
+                step(i, len(slips), f"جاري إنشاء كشف {report['name']}...")
+            self.add_slip(pdf, report, month_text, phone)
+        pdf.output(path)
+
+
+# كشوف العملية الفرعية: تُنشأ مرة واحدة عند بدء العملية وتُستخدم لكل مجموعاتها
+_worker_slips = None
+
+
+def _init_pdf_worker(font_dir):
+    global _worker_slips
+    _worker_slips = PdfSlips(font_dir)
+
+
+def _render_pdf_files(files, month_text):
+    # تعمل داخل العملية الفرعية: [(المسار، التقرير، الهاتف)] ملف لكل كشف
+    for path, report, phone in files:
+        _worker_slips.write(path, report, month_text, phone)
+    return len(files)
+
+
+def write_pdf_payslips(output, reports, month_text, phones=None, font_dir='.',
+                       workers=None, step=None):
+    """كشوف رواتب reports في ملف PDF واحد متعدد الصفحات أو في مجلد ملفات
+
+    إذا كان امتداد output هو .pdf يُكتب ملف واحد (في هذه العملية، فالمستند
+    الواحد لا يُقسم). وإلا يُعتبر output مجلداً فيه ملف لكل موظف باسمه
+    (slip_filenames)، وتوزع الكشوف على عمليات متوازية في مجموعات من
+    PDF_CHUNK_SIZE كشف. تعيد (عدد الكشوف، الزمن بالثواني).
+    """
+    phones = phones or {}
+    total = len(reports)
+    start = time.perf_counter()
+
+    if os.path.splitext(output)[1].lower() == '.pdf':
+        slips = [(report, phones.get(report['name'], '')) for report in reports]
+        PdfSlips(font_dir).write_many(output, slips, month_text, step)
+        return total, time.perf_counter() - start
+
+    os.makedirs(output, exist_ok=True)
+    files = [(os.path.join(output, f"{filename}.pdf"), report, phones.get(report['name'], ''))
+             for report, filename in zip(reports, slip_filenames(reports))]
+    chunks = [files[i:i + PDF_CHUNK_SIZE] for i in range(0, total, PDF_CHUNK_SIZE)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) <= 1:
+        slips = PdfSlips(font_dir)
+        for i, (path, report, phone) in enumerate(files):
+            if step is not None:
+                step(i, total, f"جاري إنشاء كشف {report['name']}...")
+            slips.write(path, report, month_text, phone)
+        return total, time.perf_counter() - start
+
+    # multiprocessing يُستورد عند الحاجة فقط حتى لا يبطئ فتح الواجهة
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_pdf_worker,
+                             initargs=(font_dir,)) as executor:
+        futures = [executor.submit(_render_pdf_files, chunk, month_text) for chunk in chunks]
+        try:
+            for future in as_completed(futures):
+                done += future.result()
+                if step is not None:
+                    step(done, total, f"تم إنشاء {done} من {total} كشف...")
+        except BaseException:
+            # عند الإلغاء أو الخطأ لا تبدأ المجموعات التي لم تُرسل بعد
+            for future in futures:
+                future.cancel()
+            raise
+    return done, time.perf_counter() - start
@@ -0,0 +1,90 @@
+"""قياس زمن فتح الواجهة حتى نافذة الدخول ومراقبة المكتبات المستوردة
+
+يستورد كل واجهة في عملية جديدة كما يحدث عند فتح البرنامج، ويتأكد أن
+مكتبات التقارير والتصدير لم تُستورد بعد وأن زمن الاستيراد ضمن الحد
+المسموح. يعيد رمز الخروج 1 إذا تجاوزت أي واجهة أحد الشرطين.
+
+أمثلة:
+    python perfection_startup_bench.py
+    python perfection_startup_bench.py --runs 10 --budget 0.3
+    python perfection_startup_bench.py "perfection v4.py"
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# مكتبات التقارير والتصدير التي تُستورد داخل دوال التصدير فقط
+DEFERRED_MODULES = ('pandas', 'numpy', 'tabulate', 'docx', 'fpdf', 'xlsxwriter', 'openpyxl')
+
+# الحد المسموح لزمن استيراد كل واجهة بالثواني (PyQt5 وحدها أثقل من tkinter)
+IMPORT_BUDGETS = {
+    'perfection_v3.py': 0.5,
+    'perfection v4.py': 1.0,
+}
+
+# يعمل في العملية الجديدة: استيراد الملف دون تشغيل الواجهة
+PROBE = r'''
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location('perfection_app', sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'loaded': [m for m in sys.argv[2:] if m in sys.modules]}))
+'''
+
+
+def probe(script, runs):
+    """أزمنة الاستيراد والمكتبات المؤجلة التي استوردت، أو None مع سبب الفشل"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    loaded = set()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE, os.path.join(here, script), *DEFERRED_MODULES],
+            cwd=here, capture_output=True, text=True)
+        if result.returncode != 0:
+            lines = result.stderr.strip().splitlines()
+            return None, lines[-1] if lines else f"رمز الخروج {result.returncode}"
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        times.append(report['seconds'])
+        loaded.update(report['loaded'])
+    return times, sorted(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس زمن فتح الواجهة حتى نافذة الدخول")
+    parser.add_argument('scripts', nargs='*', default=list(IMPORT_BUDGETS),
+                        help="ملفات الواجهة (افتراضياً كل الواجهات)")
+    parser.add_argument('--runs', type=int, default=5, help="عدد مرات القياس لكل واجهة")
+    parser.add_argument('--budget', type=float, default=None,
+                        help="الحد المسموح بالثواني بدلاً من الحد الافتراضي لكل واجهة")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for script in args.scripts:
+        budget = args.budget if args.budget is not None else IMPORT_BUDGETS.get(script, 1.0)
+        times, loaded = probe(script, max(1, args.runs))
+        if times is None:
+            # مكتبة الواجهة نفسها غير مثبتة (مثل PyQt5)، لا يعتبر فشلاً
+            print(f"{script}: تم التخطي ({loaded})")
+            continue
+
+        median = statistics.median(times)
+        status = "ناجح"
+        if loaded:
+            status = f"فشل: استوردت {', '.join(loaded)}"
+            failed = True
+        elif median > budget:
+            status = f"فشل: تجاوز الحد {budget:.2f}s"
+            failed = True
+        print(f"{script}: الوسيط {median:.3f}s، الأدنى {min(times):.3f}s -> {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
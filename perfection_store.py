@@ -0,0 +1,592 @@
+"""حفظ بيانات الموظفين: ملف JSON مع سجل تغييرات، أو قاعدة SQLite
+
+SqliteStore تحفظ كل نوع من السجلات المؤرخة (الحضور، السلف، ...) في جدول
+مفتاحه (المجموعة، الموظف، التاريخ)، فيُكتب السجل المعدل وحده بدلاً من الملف
+كله. عند الفتح تُقرأ البيانات كلها مرة واحدة إلى نفس بنية JSON، ثم تمر
+استعلامات الفترات (من تاريخ إلى تاريخ) على فهرس التواريخ المرتب في الذاكرة
+(PayrollIndex في perfection_payroll) وليس على SQLite، لذلك لا توجد فهارس على
+عمود day. العمود نفسه باقٍ حتى لا تحتاج القواعد الموجودة إلى ترحيل.
+"""
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import threading
+from urllib.request import pathname2url
+
+# عدد التعديلات المتراكمة في سجل التغييرات قبل دمجها في الملف الأساسي
+COMPACT_THRESHOLD = 500
+
+GROUPS = ('employees', 'other_employees')
+
+# أعمدة كل سجل مؤرخ، None تعني أن السجل قيمة رقمية واحدة
+LEDGER_COLUMNS = {
+    'attendance': ('sessions', 'daily_bonus'),
+    'performance_bonus': ('sessions', 'amount', 'rate'),
+    'monthly_bonuses': None,
+    'deductions': ('amount', 'reason'),
+    'advances': None,
+    'advance_due_dates': ('month', 'year'),
+    'monthly_rates': None,
+    'monthly_salaries': None,
+}
+
+# سجلات مفاتيحها ليست تواريخ (مثل رواتب الأشهر "5_2024")
+UNDATED_LEDGERS = ('monthly_salaries',)
+
+
+def resolve_changes(root, paths):
+    """تحويل مسارات البيانات المعدلة إلى سجلات تغيير"""
+    changes = []
+    for path in paths:
+        node = root
+        found = True
+        for key in path:
+            if isinstance(node, dict) and key in node:
+                node = node[key]
+            else:
+                found = False
+                break
+        if found:
+            changes.append({'op': 'set', 'path': list(path), 'value': node})
+        else:
+            changes.append({'op': 'del', 'path': list(path)})
+    return changes
+
+
+def apply_change(root, change):
+    """تطبيق سجل تغيير واحد على البيانات"""
+    path = change['path']
+    node = root
+    for key in path[:-1]:
+        if change['op'] == 'del' and key not in node:
+            return
+        node = node.setdefault(key, {})
+    if change['op'] == 'set':
+        node[path[-1]] = change['value']
+    else:
+        node.pop(path[-1], None)
+
+
+class ChangeNotifier:
+    """إبلاغ الواجهات بمسارات البيانات المعدلة بعد كل حفظ
+    
+    المسارات بنفس شكل مسارات السجل: (المجموعة،) أو (المجموعة، الموظف) أو
+    (المجموعة، الموظف، الحقل) أو (المجموعة، الموظف، السجل، التاريخ).
+    """
+    
+    def __init__(self):
+        self.listeners = []
+    
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+    
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+    
+    def publish(self, paths):
+        for listener in list(self.listeners):
+            listener(paths)
+
+
+class JournalStore:
+    """ملف JSON أساسي مع سجل تغييرات يُضاف إليه فقط"""
+
+    def __init__(self, path, compact_threshold=COMPACT_THRESHOLD):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.compacting_path = path + '.compacting'
+        self.compact_threshold = compact_threshold
+        self.pending = 0
+        self.last_error = None
+        self._journal = None
+        self._compactor = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """تحميل الملف الأساسي ثم إعادة تطبيق سجل التغييرات في الذاكرة
+
+        لا يكتب شيئاً على القرص، فيمكن القراءة أثناء عمل الواجهة على نفس الملف.
+        """
+        data = None
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+        self.pending = 0
+        for journal in (self.compacting_path, self.journal_path):
+            for change in self._read_journal(journal):
+                if data is None:
+                    data = {}
+                apply_change(data, change)
+                self.pending += 1
+        return data
+
+    def recover(self, data):
+        """إكمال دمج توقف البرنامج أثناءه (يُستدعى من الواجهة بعد التحميل)
+
+        ملف دمج متبقٍ يعني أن البرنامج توقف أثناء الدمج السابق، فتُكتب البيانات
+        المحملة نسخة كاملة ويُحذف الملفان.
+        """
+        if os.path.exists(self.compacting_path):
+            self.save(data)
+
+    def append(self, root, paths):
+        """إضافة التعديلات إلى سجل التغييرات دون إعادة كتابة الملف"""
+        changes = resolve_changes(root, paths)
+        if not changes:
+            return
+        lines = ''.join(json.dumps(change, ensure_ascii=False) + '\n' for change in changes)
+
+        with self._lock:
+            if self._journal is None:
+                self._journal = open(self.journal_path, 'a', encoding='utf-8')
+            self._journal.write(lines)
+            self._journal.flush()
+            self.pending += len(changes)
+
+        if self.pending >= self.compact_threshold:
+            self.compact_async()
+
+    def save(self, data):
+        """كتابة نسخة كاملة من البيانات وتفريغ سجل التغييرات"""
+        self.wait()
+        with self._lock:
+            self._close_journal()
+            self._write_snapshot(data)
+            for path in (self.journal_path, self.compacting_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.pending = 0
+
+    def compact_async(self):
+        """دمج سجل التغييرات في الملف الأساسي في الخلفية"""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._close_journal()
+
+            # إذا فشل دمج سابق نعيد محاولة دمج ملفه ونترك السجل الحالي كما هو
+            if not os.path.exists(self.compacting_path):
+                if not os.path.exists(self.journal_path):
+                    return
+                os.replace(self.journal_path, self.compacting_path)
+                self.pending = 0
+
+            self._compactor = threading.Thread(target=self._compact, daemon=True)
+            self._compactor.start()
+
+    def wait(self):
+        """انتظار انتهاء الدمج الجاري في الخلفية"""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def close(self):
+        self.wait()
+        with self._lock:
+            self._close_journal()
+
+    def _compact(self):
+        try:
+            data = {}
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            for change in self._read_journal(self.compacting_path):
+                apply_change(data, change)
+            self._write_snapshot(data)
+            os.remove(self.compacting_path)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+
+    def _write_snapshot(self, data):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def _read_journal(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # سطر غير مكتمل بسبب توقف البرنامج أثناء الكتابة
+                    break
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+def date_ordinal(date_str):
+    """رقم اليوم لتاريخ بصيغة YYYY-MM-DD أو None إذا لم يكن تاريخاً"""
+    try:
+        return datetime.date.fromisoformat(date_str).toordinal()
+    except (TypeError, ValueError):
+        pass
+    # تواريخ مدخلة بدون أصفار مثل 2024-1-5
+    try:
+        return datetime.datetime.strptime(date_str, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def split_employee(employee):
+    """فصل الحقول الثابتة للموظف عن سجلاته المؤرخة"""
+    fields = {}
+    ledgers = {}
+    for key, value in employee.items():
+        if key in LEDGER_COLUMNS and isinstance(value, dict):
+            # نحتفظ بمكان السجل في الحقول حتى يعود بنفس الترتيب عند التحميل
+            fields[key] = {}
+            ledgers[key] = value
+        else:
+            fields[key] = value
+    return fields, ledgers
+
+
+class SqliteStore:
+    """قاعدة بيانات SQLite بجدول لكل نوع من السجلات مفتاحه الموظف والتاريخ"""
+
+    def __init__(self, path, read_only=False):
+        self.path = path
+        self.pending = 0
+        self._lock = threading.Lock()
+        if read_only:
+            # للقراءة فقط: لا إنشاء للملف أو الجداول ولا تغيير لوضع السجل
+            uri = 'file:' + pathname2url(os.path.abspath(path)) + '?mode=ro'
+            self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            return
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, password TEXT)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS employees ("
+                "grp TEXT NOT NULL, name TEXT NOT NULL, fields TEXT NOT NULL, "
+                "PRIMARY KEY (grp, name))")
+            for ledger, columns in LEDGER_COLUMNS.items():
+                value_columns = ', '.join(columns or ('value',))
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {ledger} ("
+                    f"grp TEXT NOT NULL, employee TEXT NOT NULL, date TEXT NOT NULL, "
+                    f"day INTEGER, {value_columns}, extra TEXT, "
+                    f"PRIMARY KEY (grp, employee, date))")
+                # فهارس التواريخ من الإصدارات السابقة: لا يستخدمها أي استعلام
+                self.conn.execute(f"DROP INDEX IF EXISTS {ledger}_employee_day")
+                self.conn.execute(f"DROP INDEX IF EXISTS {ledger}_day")
+
+    def load(self):
+        """تحميل جميع البيانات بنفس بنية ملف JSON"""
+        with self._lock:
+            data = {'employees': {}, 'other_employees': {}, 'users': {}}
+            found = False
+
+            for username, password in self.conn.execute(
+                    "SELECT username, password FROM users ORDER BY rowid"):
+                data['users'][username] = password
+                found = True
+
+            for grp, name, fields in self.conn.execute(
+                    "SELECT grp, name, fields FROM employees ORDER BY rowid"):
+                data[grp][name] = json.loads(fields)
+                found = True
+
+            for ledger, columns in LEDGER_COLUMNS.items():
+                value_columns = ', '.join(columns or ('value',))
+                for row in self.conn.execute(
+                        f"SELECT grp, employee, date, {value_columns}, extra FROM {ledger} ORDER BY rowid"):
+                    employee = data.get(row[0], {}).get(row[1])
+                    if employee is None:
+                        continue
+                    employee.setdefault(ledger, {})[row[2]] = self._row_value(columns, row[3:-1], row[-1])
+
+            if not found:
+                return None
+            if not data['users']:
+                del data['users']
+            return data
+
+    def append(self, root, paths):
+        """حفظ السجلات المعدلة فقط داخل معاملة واحدة"""
+        if not paths:
+            return
+        with self._lock, self.conn:
+            for path in paths:
+                self._apply_path(root, path)
+
+    def save(self, data):
+        """استبدال محتوى قاعدة البيانات بالكامل"""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM users")
+            self.conn.execute("DELETE FROM employees")
+            for ledger in LEDGER_COLUMNS:
+                self.conn.execute(f"DELETE FROM {ledger}")
+
+            self.conn.executemany(
+                "INSERT INTO users (username, password) VALUES (?, ?)",
+                data.get('users', {}).items())
+            for grp in GROUPS:
+                for name, employee in data.get(grp, {}).items():
+                    self._write_employee(grp, name, employee)
+
+    def recover(self, data):
+        pass
+
+    def wait(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _apply_path(self, root, path):
+        group = path[0]
+        if group == 'users':
+            users = root.get('users', {})
+            if len(path) == 1:
+                self.conn.execute("DELETE FROM users")
+                items = list(users.items())
+            else:
+                self.conn.execute("DELETE FROM users WHERE username = ?", (path[1],))
+                items = [(path[1], users[path[1]])] if path[1] in users else []
+            self.conn.executemany("INSERT INTO users (username, password) VALUES (?, ?)", items)
+            return
+        if group not in GROUPS:
+            return
+
+        if len(path) == 1:
+            self.conn.execute("DELETE FROM employees WHERE grp = ?", (group,))
+            for ledger in LEDGER_COLUMNS:
+                self.conn.execute(f"DELETE FROM {ledger} WHERE grp = ?", (group,))
+            for name, employee in root.get(group, {}).items():
+                self._write_employee(group, name, employee)
+            return
+
+        name = path[1]
+        employee = root.get(group, {}).get(name)
+        if len(path) == 2 or employee is None:
+            self._delete_employee(group, name, keep_row=employee is not None)
+            if employee is not None:
+                self._write_employee(group, name, employee)
+            return
+
+        field = path[2]
+        if len(path) == 3 or field not in LEDGER_COLUMNS:
+            self._write_fields(group, name, employee)
+            if field in LEDGER_COLUMNS:
+                self.conn.execute(f"DELETE FROM {field} WHERE grp = ? AND employee = ?", (group, name))
+                ledger = employee.get(field)
+                if isinstance(ledger, dict):
+                    self._insert_rows(field, group, name, ledger.items())
+            return
+
+        key = path[3]
+        ledger = employee.get(field)
+        if isinstance(ledger, dict) and key in ledger:
+            self._insert_rows(field, group, name, [(key, ledger[key])])
+        else:
+            self.conn.execute(f"DELETE FROM {field} WHERE grp = ? AND employee = ? AND date = ?",
+                              (group, name, key))
+
+    def _write_employee(self, group, name, employee):
+        fields, ledgers = split_employee(employee)
+        self.conn.execute(
+            "INSERT INTO employees (grp, name, fields) VALUES (?, ?, ?) "
+            "ON CONFLICT (grp, name) DO UPDATE SET fields = excluded.fields",
+            (group, name, json.dumps(fields, ensure_ascii=False)))
+        for ledger, records in ledgers.items():
+            self._insert_rows(ledger, group, name, records.items())
+
+    def _write_fields(self, group, name, employee):
+        fields, _ = split_employee(employee)
+        self.conn.execute(
+            "INSERT INTO employees (grp, name, fields) VALUES (?, ?, ?) "
+            "ON CONFLICT (grp, name) DO UPDATE SET fields = excluded.fields",
+            (group, name, json.dumps(fields, ensure_ascii=False)))
+
+    def _delete_employee(self, group, name, keep_row=False):
+        # keep_row يحافظ على ترتيب الموظف عند استبدال بياناته بالكامل
+        if not keep_row:
+            self.conn.execute("DELETE FROM employees WHERE grp = ? AND name = ?", (group, name))
+        for ledger in LEDGER_COLUMNS:
+            self.conn.execute(f"DELETE FROM {ledger} WHERE grp = ? AND employee = ?", (group, name))
+
+    def _insert_rows(self, ledger, group, name, items):
+        columns = LEDGER_COLUMNS[ledger]
+        value_columns = columns or ('value',)
+        placeholders = ', '.join('?' * (len(value_columns) + 5))
+        updates = ', '.join(f"{c} = excluded.{c}" for c in ('day',) + value_columns + ('extra',))
+        rows = []
+        for key, value in items:
+            day = None if ledger in UNDATED_LEDGERS else date_ordinal(key)
+            values, extra = self._value_row(columns, value)
+            rows.append((group, name, key, day) + values + (extra,))
+        self.conn.executemany(
+            f"INSERT INTO {ledger} (grp, employee, date, day, {', '.join(value_columns)}, extra) "
+            f"VALUES ({placeholders}) "
+            f"ON CONFLICT (grp, employee, date) DO UPDATE SET {updates}",
+            rows)
+
+    @staticmethod
+    def _value_row(columns, value):
+        if columns is None:
+            return (value,), None
+        if not isinstance(value, dict):
+            return (None,) * len(columns), json.dumps({'value': value}, ensure_ascii=False)
+        extra = {k: v for k, v in value.items() if k not in columns}
+        return (tuple(value.get(c) for c in columns),
+                json.dumps(extra, ensure_ascii=False) if extra else None)
+
+    @staticmethod
+    def _row_value(columns, values, extra):
+        if columns is None:
+            return values[0]
+        value = {c: v for c, v in zip(columns, values) if v is not None}
+        if extra:
+            extra = json.loads(extra)
+            if not value and list(extra) == ['value']:
+                return extra['value']
+            value.update(extra)
+        return value
+
+
+class BackgroundLoad:
+    """تحميل البيانات في خيط منفصل بينما تعرض الواجهة نافذة الدخول
+
+    prepare (اختيارية) تُستدعى بالبيانات المحملة في نفس الخيط لتجهيز ما
+    يُبنى منها مثل فهرس التواريخ، فلا يجوز أن تستخدم أي عنصر من الواجهة.
+    """
+
+    def __init__(self, store, prepare=None):
+        self.store = store
+        self.prepare = prepare
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            data = self.store.load()
+            self._result = self.prepare(data) if self.prepare is not None else data
+        except Exception as e:
+            self._error = e
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def result(self):
+        """انتظار انتهاء التحميل ثم إعادة نتيجته أو إطلاق الخطأ الذي حدث أثناءه"""
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class TaskCancelled(Exception):
+    """أوقف المستخدم المهمة من نافذة التقدم"""
+
+
+class BackgroundTask:
+    """تشغيل تقرير أو تصدير طويل في خيط منفصل مع تقدم وإمكانية الإلغاء
+
+    work(task, *args) تُستدعى في الخيط وتستدعي task.step(done, total, text)
+    بعد كل جزء من العمل، فتُطلق step الخطأ TaskCancelled إذا طلب المستخدم
+    الإلغاء. لا يجوز أن تستخدم work أي عنصر من الواجهة: الواجهة تقرأ
+    progress() دورياً ثم result() بعد done().
+    """
+
+    def __init__(self, work, *args):
+        self.work = work
+        self.args = args
+        self._progress = (0, 0, '')
+        self._cancel = threading.Event()
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._result = self.work(self, *self.args)
+        except Exception as e:
+            self._error = e
+
+    def step(self, done, total, text=''):
+        if self._cancel.is_set():
+            raise TaskCancelled()
+        self._progress = (done, total, text)
+
+    def progress(self):
+        """(المنجز، الإجمالي، وصف المرحلة الحالية)"""
+        return self._progress
+
+    def cancel(self):
+        self._cancel.set()
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def result(self):
+        """انتظار انتهاء المهمة ثم إعادة نتيجتها أو إطلاق الخطأ (أو TaskCancelled)"""
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def open_store(path, read_only=False):
+    """اختيار طريقة التخزين حسب امتداد ملف البيانات
+
+    read_only للقراءة أثناء عمل الواجهة على نفس الملف (مثل سطر الأوامر):
+    قاعدة SQLite تُفتح بدون أي كتابة، و JournalStore.load لا تكتب أصلاً.
+    """
+    if os.path.splitext(path)[1].lower() in ('.db', '.sqlite', '.sqlite3'):
+        return SqliteStore(path, read_only)
+    return JournalStore(path)
+
+
+def default_data_file(json_file="employee_data.json", db_file="employee_data.db"):
+    """قاعدة SQLite إذا تم نقل البيانات إليها، وإلا ملف JSON"""
+    return db_file if os.path.exists(db_file) else json_file
+
+
+def migrate_json_to_sqlite(json_path, db_path):
+    """نقل البيانات مرة واحدة من ملف JSON (مع سجل تغييراته) إلى SQLite"""
+    data = JournalStore(json_path).load()
+    if data is None:
+        raise FileNotFoundError(json_path)
+    store = SqliteStore(db_path)
+    try:
+        store.save(data)
+    finally:
+        store.close()
+    return data
+
+
+if __name__ == "__main__":
+    # python perfection_store.py employee_data.json employee_data.db
+    if len(sys.argv) != 3:
+        print("الاستخدام: python perfection_store.py employee_data.json employee_data.db")
+        sys.exit(1)
+    migrated = migrate_json_to_sqlite(sys.argv[1], sys.argv[2])
+    print(f"تم نقل {len(migrated.get('employees', {})) + len(migrated.get('other_employees', {}))} موظف إلى {sys.argv[2]}")
@@ -1,17 +1,374 @@
-import json
-import os
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import datetime
-import pandas as pd
-from tabulate import tabulate
+from bisect import bisect_left, bisect_right
 import hashlib
-from docx import Document
-from docx.shared import Pt, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.table import WD_TABLE_ALIGNMENT
-from docx.oxml.ns import nsdecls
-from docx.oxml import parse_xml
+from perfection_store import (GROUPS, BackgroundLoad, BackgroundTask, ChangeNotifier, TaskCancelled,
+                               date_ordinal, open_store, default_data_file)
+from perfection_payroll import (PayrollIndex, PayrollRun, SalaryCache, cached_salary,
+                                 parse_report_period, payroll_snapshot, snapshot_index)
+from perfection_export import write_attendance_xlsx, write_ledger_workbook, write_payroll_xlsx
+from perfection_payslips import write_word_payslips
+
+# السجلات المعروضة في كل جدول بترتيب ظهورها لكل موظف
+ATTENDANCE_LEDGERS = ('attendance',)
+BONUS_LEDGERS = ('performance_bonus', 'monthly_bonuses')
+ADVANCE_LEDGERS = ('advances',)
+# سجلات تُعرض ضمن صفوف سجل آخر
+LEDGER_ROWS = {'advance_due_dates': 'advances'}
+# مهلة تجهيز التبويب التالي بعد عرض تبويب (بالمللي ثانية)
+TAB_PREFETCH_DELAY = 200
+# الفترة بين تحديثات نافذة تقدم التقارير والتصدير (بالمللي ثانية)
+TASK_POLL_DELAY = 100
+# أقصى عدد من أخطاء اللصق يُعرض في رسالة واحدة
+PASTE_ERRORS_SHOWN = 10
+# أنواع أعمدة جدول الحضور اليومي (الحصص، البونص) وجدول المكافآت الجماعية (الحصص، السعر، البونص)
+ATTENDANCE_KINDS = (int, float)
+COLLECTIVE_BONUS_KINDS = (int, float, float)
+
+
+def normalize_name(name):
+    """الاسم بدون المسافات الزائدة وبحروف موحدة لمطابقة الأسماء الملصقة"""
+    return ' '.join(name.split()).casefold()
+
+
+def parse_pasted_rows(text, index, kinds):
+    """قراءة صفوف ملصقة من جدول حسابي: الاسم ثم قيمة لكل عمود
+    
+    index يربط normalize_name(الاسم) باسم الموظف، و kinds دالة تحويل لكل
+    عمود (int أو float). الخلايا مفصولة بـ Tab (أو بفاصلة إن لم يوجد Tab)
+    والخلية الفارغة تُبقي القيمة الحالية. يُتجاهل السطر الأول فقط إذا كان
+    صف عناوين: اسم غير معروف وكل خلايا القيم فيه نصوص وليست أرقاماً، فالخطأ
+    في اسم أول موظف يظهر كخطأ ولا يُحذف. تُفحص كل الصفوف مرة واحدة وتعيد
+    (الصفوف، الأخطاء) حيث الصفوف [(الاسم، [القيم...])].
+    """
+    rows = []
+    errors = []
+    seen = set()
+    first = True
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        cells = [cell.strip() for cell in line.split('\t' if '\t' in line else ',')]
+        values = cells[1:]
+        # الجداول الحسابية تضيف خلايا فارغة في نهاية السطر أحياناً
+        while values and not values[-1]:
+            values.pop()
+        
+        header, first = first, False
+        name = index.get(normalize_name(cells[0]))
+        if name is None:
+            if not (header and is_header_row(values, kinds)):
+                errors.append(f"السطر {number}: الموظف غير موجود ({cells[0]})")
+            continue
+        
+        if len(values) > len(kinds):
+            errors.append(f"السطر {number}: عدد الأعمدة أكثر من المتوقع للموظف {name}")
+            continue
+        if name in seen:
+            errors.append(f"السطر {number}: الموظف {name} مكرر")
+            continue
+        seen.add(name)
+        
+        try:
+            for value, kind in zip(values, kinds):
+                if value:
+                    kind(value)
+        except ValueError:
+            errors.append(f"السطر {number}: قيم غير صحيحة للموظف {name}")
+            continue
+        rows.append((name, values))
+    return rows, errors
+
+
+def convert_grid_rows(rows, kinds):
+    """تحويل قيم صفوف جدول الإدخال [(الاسم، القيم...)] بدوال kinds قبل حفظ أي منها
+    
+    الخلية الفارغة صفر. تعيد (الصفوف المحولة، None) أو ([]، اسم أول موظف
+    بقيمة غير صحيحة) حتى لا يُحفظ جزء من الجدول فقط.
+    """
+    converted = []
+    for name, *values in rows:
+        try:
+            converted.append((name, *(kind(value) if value else 0 for value, kind in zip(values, kinds))))
+        except ValueError:
+            return [], name
+    return converted, None
+
+
+def is_header_row(values, kinds):
+    """هل خلايا القيم عناوين أعمدة: موجودة ولا تُقرأ أي منها كرقم"""
+    filled = [(value, kind) for value, kind in zip(values, kinds) if value]
+    if not filled:
+        return False
+    for value, kind in filled:
+        try:
+            kind(value)
+        except ValueError:
+            continue
+        return False
+    return True
+
+
+class PagedTreeview:
+    """يعرض صفوف Treeview على دفعات ويحدّثها صفاً صفاً
+    
+    لكل صف مفتاح قابل للترتيب. fetch_keys(after, limit) تعيد المفاتيح التالية
+    بعد after بالترتيب، و row(key) تعيد (القيم، الوسوم) أو None إذا لم يعد
+    الصف موجوداً. تُدرج الصفحة الأولى فوراً وتُجلب التالية عند الاقتراب من
+    نهاية التمرير، ويُحدَّث أو يُضاف أو يُحذف صف واحد عند تعديله.
+    """
+    
+    def __init__(self, tree, scrollbar, row, page_size=200):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.row = row
+        self.page_size = page_size
+        self.fetch_keys = lambda after, limit: []
+        self.accept = None
+        self.keys = []
+        self.items = {}
+        self.cursor = None
+        self.exhausted = True
+        self.pending = False
+        self.tree.configure(yscrollcommand=self.on_scroll)
+    
+    def reset(self, fetch_keys, accept=None):
+        self.tree.delete(*self.tree.get_children())
+        self.fetch_keys = fetch_keys
+        self.accept = accept
+        self.keys = []
+        self.items = {}
+        self.cursor = None
+        self.exhausted = False
+        self.fetch()
+    
+    def fetch(self):
+        self.pending = False
+        keys = self.fetch_keys(self.cursor, self.page_size)
+        for key in keys:
+            row = self.row(key)
+            if row is not None:
+                self.items[key] = self.tree.insert("", "end", values=row[0], tags=row[1])
+                self.keys.append(key)
+        if keys:
+            self.cursor = keys[-1]
+        if len(keys) < self.page_size:
+            self.exhausted = True
+    
+    def refresh(self, key):
+        """تحديث صف واحد بعد تعديل بياناته أو إضافتها أو حذفها"""
+        row = self.row(key)
+        if row is not None and self.accept is not None and not self.accept(key):
+            row = None
+        item = self.items.get(key)
+        if item is not None:
+            if row is None:
+                self.tree.delete(item)
+                del self.items[key]
+                del self.keys[bisect_left(self.keys, key)]
+            else:
+                self.tree.item(item, values=row[0], tags=row[1])
+            return
+        # الصفوف بعد آخر صفحة محملة تظهر عند جلبها بالتمرير
+        if row is None or not (self.exhausted or key <= self.cursor):
+            return
+        i = bisect_left(self.keys, key)
+        self.items[key] = self.tree.insert("", i, values=row[0], tags=row[1])
+        self.keys.insert(i, key)
+        if self.cursor is None or key > self.cursor:
+            self.cursor = key
+    
+    def loaded_keys(self, prefix):
+        """المفاتيح المعروضة التي تبدأ بـ prefix"""
+        i = bisect_left(self.keys, prefix)
+        j = i
+        while j < len(self.keys) and self.keys[j][:len(prefix)] == prefix:
+            j += 1
+        return self.keys[i:j]
+    
+    def on_scroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        # جلب الصفحة التالية عند الوصول إلى آخر 10% من الصفوف المعروضة
+        if not self.exhausted and not self.pending and float(last) >= 0.9:
+            self.pending = True
+            self.tree.after_idle(self.fetch)
+
+
+class EntryGrid:
+    """جدول إدخال بأسلوب الجداول الحسابية يرسم الصفوف الظاهرة فقط
+    
+    labels أسماء الصفوف (للقراءة فقط)، و columns قائمة لكل عمود قابل للتعديل
+    فيها نص كل خلية. لا يوجد عنصر واجهة لكل صف: الصفوف الظاهرة تُرسم على
+    Canvas عند التمرير، وتُعدّل خلية واحدة في كل مرة بحقل إدخال واحد يُنقل
+    إليها. Enter/الأسهم للانتقال بين الصفوف و Tab بين الأعمدة.
+    """
+    
+    def __init__(self, parent, headers, labels, columns, row_height=28):
+        self.headers = headers
+        self.labels = labels
+        self.columns = columns
+        self.row_height = row_height
+        self.top = 0
+        self.editing = None
+        
+        self.frame = ttk.Frame(parent)
+        self.header = tk.Canvas(self.frame, height=row_height, bg='#f0f0f0', highlightthickness=0)
+        self.canvas = tk.Canvas(self.frame, bg='#ffffff', highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.yview)
+        self.header.grid(row=0, column=0, sticky='ew')
+        self.canvas.grid(row=1, column=0, sticky='nsew')
+        self.scrollbar.grid(row=1, column=1, sticky='ns')
+        self.frame.grid_rowconfigure(1, weight=1)
+        self.frame.grid_columnconfigure(0, weight=1)
+        
+        self.editor = ttk.Entry(self.canvas, font=('Arial', 11))
+        self.editor_item = self.canvas.create_window(0, 0, window=self.editor, anchor='nw', state='hidden')
+        
+        self.canvas.bind('<Configure>', lambda e: self.render())
+        self.canvas.bind('<Button-1>', self.on_click)
+        for widget in (self.canvas, self.editor):
+            widget.bind('<MouseWheel>', self.on_wheel)
+            widget.bind('<Button-4>', lambda e: self.scroll_to(self.top - 3))
+            widget.bind('<Button-5>', lambda e: self.scroll_to(self.top + 3))
+        self.editor.bind('<Return>', lambda e: self.move(1, 0))
+        self.editor.bind('<Down>', lambda e: self.move(1, 0))
+        self.editor.bind('<Up>', lambda e: self.move(-1, 0))
+        self.editor.bind('<Tab>', lambda e: self.move(0, 1))
+        self.editor.bind('<<PrevWindow>>', lambda e: self.move(0, -1))
+        self.editor.bind('<Escape>', lambda e: self.cancel_edit())
+    
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+    
+    def fill(self, rows):
+        """كتابة [(الاسم، [القيم...])] في صفوفها، والقيمة الفارغة لا تغيّر الخلية"""
+        self.commit_edit()
+        positions = {label: r for r, label in enumerate(self.labels)}
+        for label, values in rows:
+            r = positions[label]
+            for c, value in enumerate(values):
+                if value:
+                    self.columns[c][r] = value
+        self.render()
+    
+    def rows(self):
+        """(الاسم، قيم الأعمدة...) لكل صف بعد حفظ الخلية الجاري تعديلها"""
+        self.commit_edit()
+        return zip(self.labels, *self.columns)
+    
+    def page_size(self):
+        return max(1, self.canvas.winfo_height() // self.row_height)
+    
+    def column_width(self):
+        return max(1, self.canvas.winfo_width()) / (len(self.columns) + 1)
+    
+    def render(self):
+        width = self.column_width()
+        height = self.row_height
+        
+        self.header.delete('all')
+        for c, text in enumerate(self.headers):
+            self.header.create_text(c * width + width / 2, height / 2, text=text,
+                                    font=('Arial', 12, 'bold'))
+        
+        self.canvas.delete('cell')
+        page = self.page_size()
+        last = min(len(self.labels), self.top + page + 1)
+        for r in range(self.top, last):
+            y = (r - self.top) * height
+            for c in range(len(self.columns) + 1):
+                x = c * width
+                text = self.labels[r] if c == 0 else self.columns[c - 1][r]
+                self.canvas.create_rectangle(x, y, x + width, y + height, outline='#e0e0e0',
+                                             fill='#f7f7f7' if c == 0 else '#ffffff', tags='cell')
+                self.canvas.create_text(x + width / 2, y + height / 2, text=text,
+                                        font=('Arial', 11), tags='cell')
+        
+        total = len(self.labels)
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + page) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.place_editor()
+    
+    def place_editor(self):
+        if self.editing is None or not self.top <= self.editing[0] < self.top + self.page_size():
+            self.canvas.itemconfigure(self.editor_item, state='hidden')
+            return
+        r, c = self.editing
+        width = self.column_width()
+        self.canvas.coords(self.editor_item, (c + 1) * width, (r - self.top) * self.row_height)
+        self.canvas.itemconfigure(self.editor_item, state='normal',
+                                  width=width, height=self.row_height)
+    
+    def scroll_to(self, top):
+        top = max(0, min(top, len(self.labels) - self.page_size()))
+        if top != self.top:
+            self.top = top
+            self.render()
+        return 'break'
+    
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * len(self.labels)))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.page_size()
+            self.scroll_to(self.top + step)
+    
+    def on_wheel(self, event):
+        return self.scroll_to(self.top - 3 if event.delta > 0 else self.top + 3)
+    
+    def on_click(self, event):
+        row = self.top + int(event.y // self.row_height)
+        column = int(event.x // self.column_width()) - 1
+        if 0 <= column < len(self.columns) and row < len(self.labels):
+            self.edit(row, column)
+    
+    def edit(self, row, column):
+        self.commit_edit()
+        if row < self.top:
+            self.top = row
+        elif row >= self.top + self.page_size():
+            self.top = row - self.page_size() + 1
+        self.editing = (row, column)
+        self.editor.delete(0, tk.END)
+        self.editor.insert(0, self.columns[column][row])
+        self.editor.select_range(0, tk.END)
+        self.render()
+        self.editor.focus_set()
+    
+    def move(self, rows, columns):
+        if self.editing is None:
+            return 'break'
+        row, column = self.editing
+        column += columns
+        # Tab بعد آخر عمود ينتقل إلى أول عمود في الصف التالي والعكس
+        if column >= len(self.columns):
+            row, column = row + 1, 0
+        elif column < 0:
+            row, column = row - 1, len(self.columns) - 1
+        row += rows
+        if 0 <= row < len(self.labels):
+            self.edit(row, column)
+        return 'break'
+    
+    def commit_edit(self):
+        if self.editing is None:
+            return
+        row, column = self.editing
+        self.columns[column][row] = self.editor.get()
+        self.editing = None
+        self.render()
+    
+    def cancel_edit(self):
+        self.editing = None
+        self.render()
+        return 'break'
+
 
 class EnhancedEmployeeSystem:
     def __init__(self, root):
@@ -24,13 +381,20 @@ class EnhancedEmployeeSystem:
         self.employees = {}
         self.other_employees = {}
         self.users = {"admin": self.hash_password("admin123")}
+        self.payroll_index = PayrollIndex(self.employees, self.other_employees)
+        self.salary_cache = SalaryCache()
+        self.payroll_run = None
+        self.changes = ChangeNotifier()
+        self.attendance_filter = None
+        self.bonus_filter = None
         self.current_user = None
         self.current_month = datetime.datetime.now().month
         self.current_year = datetime.datetime.now().year
-        self.data_file = "employee_data.json"
+        self.data_file = default_data_file()
+        self.store = open_store(self.data_file)
         
-        # Load saved data
-        self.load_data()
+        # تحميل البيانات في الخلفية بينما تظهر نافذة الدخول
+        self.loader = BackgroundLoad(self.store, self.prepare_data)
         
         # Configure styles
         self.configure_styles()
@@ -59,30 +423,91 @@ class EnhancedEmployeeSystem:
     def hash_password(self, password):
         return hashlib.sha256(password.encode()).hexdigest()
     
-    def save_data(self):
-        """حفظ جميع البيانات في ملف JSON"""
-        data = {
+    def data_root(self):
+        return {
             'employees': self.employees,
             'other_employees': self.other_employees,
             'users': self.users
         }
+    
+    def save_data(self):
+        """حفظ جميع البيانات في ملف JSON"""
+        # الإغلاق قبل انتهاء التحميل يجب ألا يحفظ بيانات فارغة فوق الملف
+        self.wait_for_data()
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+            self.store.save(self.data_root())
         except Exception as e:
             messagebox.showerror("خطأ", f"فشل حفظ البيانات: {str(e)}")
+    
+    def commit_changes(self, *paths):
+        """حفظ التعديلات المحددة فقط في سجل التغييرات"""
+        for path in paths:
+            self.payroll_index.refresh(path)
+            self.salary_cache.refresh(path)
+        
+        try:
+            self.store.append(self.data_root(), paths)
+        except Exception as e:
+            messagebox.showerror("خطأ", f"فشل حفظ البيانات: {str(e)}")
+        
+        self.changes.publish(paths)
 
+    def prepare_data(self, data):
+        """فصل البيانات المحملة وبناء فهرسها (يعمل في خيط التحميل بدون أي واجهة)"""
+        data = data or {}
+        employees = data.get('employees', {})
+        other_employees = data.get('other_employees', {})
+        users = data.get('users', {"admin": self.hash_password("admin123")})
+        # تحويل التواريخ إلى أرقام أيام مرة واحدة بدلاً من strptime في كل تقرير
+        return employees, other_employees, users, PayrollIndex(employees, other_employees)
+    
     def load_data(self):
-        """تحميل البيانات من ملف JSON"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.employees = data.get('employees', {})
-                    self.other_employees = data.get('other_employees', {})
-                    self.users = data.get('users', {"admin": self.hash_password("admin123")})
-            except Exception as e:
-                messagebox.showerror("خطأ", f"فشل تحميل البيانات: {str(e)}")
+        """تحميل البيانات من ملف JSON وسجل التغييرات
+        
+        إذا بدأ التحميل في الخلفية تُنتظر نتيجته بدلاً من تحميل الملف مرة أخرى.
+        """
+        loader, self.loader = self.loader, None
+        try:
+            if loader is not None:
+                prepared = loader.result()
+            else:
+                prepared = self.prepare_data(self.store.load())
+        except Exception as e:
+            messagebox.showerror("خطأ", f"فشل تحميل البيانات: {str(e)}")
+            return
+        
+        self.employees, self.other_employees, self.users, self.payroll_index = prepared
+        
+        # إكمال دمج سابق لم ينتهِ (التحميل نفسه لا يكتب شيئاً)
+        try:
+            self.store.recover(self.data_root())
+        except Exception as e:
+            messagebox.showerror("خطأ", f"فشل حفظ البيانات: {str(e)}")
+        self.salary_cache.clear()
+        self.payroll_run = None
+    
+    def wait_for_data(self):
+        """تطبيق نتيجة التحميل في الخلفية، مع الانتظار إذا لم ينتهِ بعد"""
+        if self.loader is not None:
+            self.load_data()
+    
+    def ledger_items(self, group, name, ledger, from_date=None, to_date=None):
+        """سجلات مؤرخة في الفترة المحددة مرتبة حسب الموظف ثم التاريخ
+        
+        تعيد قائمة (الموظف، رقم اليوم، التاريخ، القيمة) باستخدام البحث الثنائي
+        في فهرس التواريخ. إذا كان name هو None تشمل النتيجة جميع موظفي
+        المجموعة مرتبين حسب الاسم.
+        """
+        lo = from_date.toordinal() if from_date else None
+        hi = to_date.toordinal() if to_date else None
+        source = getattr(self, group)
+        names = [name] if name is not None else sorted(source)
+        items = []
+        for emp_name in names:
+            records = source.get(emp_name, {}).get(ledger, {})
+            for ordinal, date in self.payroll_index.entries(group, emp_name, ledger, lo, hi):
+                items.append((emp_name, ordinal, date, records[date]))
+        return items
     
     def create_login_window(self):
         self.login_window = tk.Toplevel(self.root)
@@ -113,6 +538,9 @@ class EnhancedEmployeeSystem:
         username = self.username_entry.get()
         password = self.password_entry.get()
         
+        # حسابات المستخدمين جزء من ملف البيانات
+        self.wait_for_data()
+        
         if username in self.users and self.users[username] == self.hash_password(password):
             self.current_user = username
             self.login_window.destroy()
@@ -121,24 +549,49 @@ class EnhancedEmployeeSystem:
             messagebox.showerror("خطأ", "اسم المستخدم أو كلمة المرور غير صحيحة")
     
     def create_main_interface(self):
+        self.wait_for_data()
+        
         # Create notebook (tabs)
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill='both', expand=True)
         
-        # Create tabs
-        self.create_employee_tab()
-        self.create_attendance_tab()
-        self.create_bonus_tab()
-        self.create_advance_tab()
-        self.create_reports_tab()
-        
-        # Load initial data
-        self.update_employee_lists()
+        # التبويبات تُضاف فارغة، ويُنشأ محتواها وتُربط بياناتها عند أول عرض لها
+        # (الاسم، العنوان، دالة الإنشاء، دالة ربط البيانات)
+        self.tab_specs = [
+            ('employee', "إدارة الموظفين", self.create_employee_tab, self.bind_employee_tab),
+            ('attendance', "تسجيل الحضور", self.create_attendance_tab, self.reset_attendance_view),
+            ('bonus', "المكافآت والخصومات", self.create_bonus_tab, self.bind_bonus_tab),
+            ('advance', "السلف", self.create_advance_tab, self.bind_advance_tab),
+            ('reports', "التقارير", self.create_reports_tab, self.update_employee_choices),
+        ]
+        self.tab_frames = []
+        self.built_tabs = set()
+        for _, title, _, _ in self.tab_specs:
+            tab = ttk.Frame(self.notebook)
+            self.notebook.add(tab, text=title)
+            self.tab_frames.append(tab)
+        
+        self.changes.subscribe(self.apply_changes)
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        self.on_tab_changed()
     
-    def create_employee_tab(self):
-        tab = ttk.Frame(self.notebook)
-        self.notebook.add(tab, text="إدارة الموظفين")
-        
+    def on_tab_changed(self, event=None):
+        index = self.notebook.index(self.notebook.select())
+        self.build_tab(index)
+        # تجهيز التبويب التالي بعد ظهور الحالي لأنه الأرجح أن يُفتح بعده
+        if index + 1 < len(self.tab_specs):
+            self.root.after(TAB_PREFETCH_DELAY, self.build_tab, index + 1)
+    
+    def build_tab(self, index):
+        """إنشاء محتوى التبويب وربط بياناته مرة واحدة عند أول حاجة إليه"""
+        name, _, create, bind = self.tab_specs[index]
+        if name in self.built_tabs:
+            return
+        self.built_tabs.add(name)
+        create(self.tab_frames[index])
+        bind()
+    
+    def create_employee_tab(self, tab):
         # Regular Employees Frame
         reg_frame = ttk.LabelFrame(tab, text="موظفين بحصص", padding=10)
         reg_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
@@ -210,6 +663,7 @@ class EnhancedEmployeeSystem:
             self.employee_tree.column(col, width=120, anchor="center")
         
         self.employee_tree.pack(fill="both", expand=True)
+        self.employee_view = PagedTreeview(self.employee_tree, None, self.employee_row)
         
         # Configure grid weights
         tab.grid_columnconfigure(0, weight=1)
@@ -234,20 +688,18 @@ class EnhancedEmployeeSystem:
         if col_index == 3:  # Delete button column
             if messagebox.askyesno("تأكيد", f"هل أنت متأكد من حذف الموظف {name}؟"):
                 if emp_type == "بحصص":
+                    group = 'employees'
                     if name in self.employees:
                         del self.employees[name]
                 else:
+                    group = 'other_employees'
                     if name in self.other_employees:
                         del self.other_employees[name]
                 
-                self.update_employee_lists()
-                self.save_data()
+                self.commit_changes((group, name))
                 messagebox.showinfo("تم", f"تم حذف الموظف {name}")
 
-    def create_attendance_tab(self):
-        tab = ttk.Frame(self.notebook)
-        self.notebook.add(tab, text="تسجيل الحضور")
-        
+    def create_attendance_tab(self, tab):
         # Attendance Entry Frame
         entry_frame = ttk.LabelFrame(tab, text="تسجيل يومي", padding=10)
         entry_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
@@ -309,7 +761,10 @@ class EnhancedEmployeeSystem:
             self.attendance_tree.heading(col, text=col)
             self.attendance_tree.column(col, width=100, anchor="center")
         
+        attendance_scroll = ttk.Scrollbar(list_frame, orient="vertical", command=self.attendance_tree.yview)
+        attendance_scroll.pack(side="right", fill="y")
         self.attendance_tree.pack(fill="both", expand=True)
+        self.attendance_view = PagedTreeview(self.attendance_tree, attendance_scroll, self.attendance_row)
         
         # Configure grid weights
         tab.grid_columnconfigure(0, weight=1)
@@ -356,63 +811,19 @@ class EnhancedEmployeeSystem:
         daily_window.title(f"تسجيل حضور ليوم {date}")
         daily_window.geometry("800x600")
         
-        # Create a frame for the attendance entries
-        frame = ttk.Frame(daily_window)
-        frame.pack(fill='both', expand=True, padx=10, pady=10)
-        
-        # Create a canvas and scrollbar
-        canvas = tk.Canvas(frame)
-        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas)
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(
-                scrollregion=canvas.bbox("all")
-            )
-        )
-        
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        
-        # Add headers
-        headers_frame = ttk.Frame(scrollable_frame)
-        headers_frame.pack(fill='x', pady=5)
-        
-        ttk.Label(headers_frame, text="الموظف", font=('Arial', 12, 'bold')).pack(side='left', padx=10, expand=True)
-        ttk.Label(headers_frame, text="عدد الحصص", font=('Arial', 12, 'bold')).pack(side='left', padx=10, expand=True)
-        ttk.Label(headers_frame, text="البونص اليومي", font=('Arial', 12, 'bold')).pack(side='left', padx=10, expand=True)
-        
-        # Create entry widgets for each employee
-        self.daily_att_entries = {}
-        
-        for name in self.employees:
-            emp_frame = ttk.Frame(scrollable_frame)
-            emp_frame.pack(fill='x', pady=5)
-            
-            ttk.Label(emp_frame, text=name).pack(side='left', padx=10, expand=True)
-            
-            sessions_var = tk.StringVar(value="0")
-            bonus_var = tk.StringVar(value="0")
-            
+        # جدول واحد يرسم الصفوف الظاهرة فقط بدلاً من حقول إدخال لكل موظف
+        names = list(self.employees)
+        sessions = []
+        bonuses = []
+        for name in names:
             # إذا كان في وضع التعديل، نملأ البيانات الحالية
-            if edit_mode and 'attendance' in self.employees[name] and date in self.employees[name]['attendance']:
-                sessions_var.set(str(self.employees[name]['attendance'][date].get('sessions', 0)))
-                bonus_var.set(str(self.employees[name]['attendance'][date].get('daily_bonus', 0)))
-            
-            sessions_entry = ttk.Entry(emp_frame, textvariable=sessions_var)
-            sessions_entry.pack(side='left', padx=10, expand=True)
-            
-            bonus_entry = ttk.Entry(emp_frame, textvariable=bonus_var)
-            bonus_entry.pack(side='left', padx=10, expand=True)
-            
-            self.daily_att_entries[name] = {
-                'sessions': sessions_var,
-                'bonus': bonus_var
-            }
+            record = self.employees[name].get('attendance', {}).get(date) if edit_mode else None
+            sessions.append(str(record.get('sessions', 0)) if record is not None else "0")
+            bonuses.append(str(record.get('daily_bonus', 0)) if record is not None else "0")
+        
+        self.daily_att_grid = EntryGrid(daily_window, ("الموظف", "عدد الحصص", "البونص اليومي"),
+                                        names, [sessions, bonuses])
+        self.daily_att_grid.pack(fill='both', expand=True, padx=10, pady=10)
         
         # Add save button
         btn_frame = ttk.Frame(daily_window)
@@ -421,9 +832,42 @@ class EnhancedEmployeeSystem:
         ttk.Button(btn_frame, text="حفظ الحضور", command=lambda: self.save_daily_attendance(date, daily_window, edit_mode),
                   style='Accent.TButton').pack(side='left', padx=10)
         
+        ttk.Button(btn_frame, text="لصق من الحافظة",
+                  command=lambda: self.paste_into_grid(
+                      daily_window, self.daily_att_grid, ATTENDANCE_KINDS,
+                      lambda: self.save_daily_attendance(date, daily_window, edit_mode))).pack(side='left', padx=10)
+        
         ttk.Button(btn_frame, text="إلغاء", command=daily_window.destroy,
                   style='Delete.TButton').pack(side='left', padx=10)
     
+    def paste_into_grid(self, window, grid, kinds, save):
+        """لصق صفوف (الاسم، القيم...) منسوخة من جدول حسابي ثم حفظها مرة واحدة
+        
+        لا يُكتب أي صف إذا كان في أحدها خطأ، وتُعرض كل الأخطاء معاً.
+        """
+        try:
+            text = window.clipboard_get()
+        except tk.TclError:
+            messagebox.showerror("خطأ", "الحافظة فارغة")
+            return
+        
+        # أسماء صفوف الجدول نفسه: الموظف المضاف بعد فتح النافذة ليس فيه
+        index = {normalize_name(name): name for name in grid.labels}
+        rows, errors = parse_pasted_rows(text, index, kinds)
+        if errors:
+            shown = "\n".join(errors[:PASTE_ERRORS_SHOWN])
+            if len(errors) > PASTE_ERRORS_SHOWN:
+                shown += f"\n... و{len(errors) - PASTE_ERRORS_SHOWN} أخطاء أخرى"
+            messagebox.showerror("خطأ", f"لم يتم لصق أي صف:\n{shown}")
+            return
+        if not rows:
+            messagebox.showerror("خطأ", "لا توجد صفوف بأسماء موظفين في الحافظة")
+            return
+        
+        grid.fill(rows)
+        if messagebox.askyesno("تأكيد", f"تم لصق بيانات {len(rows)} موظف. هل تريد الحفظ الآن؟"):
+            save()
+    
     def save_daily_attendance(self, date, window, edit_mode=False):
         try:
             date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
@@ -431,22 +875,21 @@ class EnhancedEmployeeSystem:
             messagebox.showerror("خطأ", "صيغة التاريخ غير صحيحة")
             return
         
-        for name, entries in self.daily_att_entries.items():
-            sessions = entries['sessions'].get()
-            bonus = entries['bonus'].get()
-            
-            try:
-                sessions = int(sessions) if sessions else 0
-                bonus = float(bonus) if bonus else 0
-            except ValueError:
-                messagebox.showerror("خطأ", f"قيم غير صحيحة للموظف {name}")
-                return
-            
+        # كل الصفوف تُفحص قبل تعديل أي موظف
+        rows, invalid = convert_grid_rows(self.daily_att_grid.rows(), ATTENDANCE_KINDS)
+        if invalid is not None:
+            messagebox.showerror("خطأ", f"قيم غير صحيحة للموظف {invalid}")
+            return
+        
+        changed = []
+        
+        for name, sessions, bonus in rows:
             # إذا كان عدد الحصص صفر، لا نضيف السجل
             if sessions == 0:
                 # حذف السجل إذا كان موجودًا
                 if name in self.employees and 'attendance' in self.employees[name] and date in self.employees[name]['attendance']:
                     del self.employees[name]['attendance'][date]
+                    changed.append(('employees', name, 'attendance', date))
                 continue
             
             if name not in self.employees:
@@ -459,9 +902,9 @@ class EnhancedEmployeeSystem:
                 'sessions': sessions,
                 'daily_bonus': bonus
             }
+            changed.append(('employees', name, 'attendance', date))
         
-        self.save_data()
-        self.update_employee_lists()
+        self.commit_changes(*changed)
         message = "تم تعديل سجل الحضور" if edit_mode else "تم تسجيل حضور لليوم"
         messagebox.showinfo("تم", f"{message} {date}")
         window.destroy()
@@ -486,38 +929,43 @@ class EnhancedEmployeeSystem:
         month_end = datetime.datetime(year, month, 1) + datetime.timedelta(days=32)
         month_end = month_end.replace(day=1) - datetime.timedelta(days=1)
         
-        self.attendance_tree.delete(*self.attendance_tree.get_children())
-        
-        # ترتيب الموظفين حسب الاسم
-        sorted_employees = sorted(self.employees.items(), key=lambda x: x[0])
-        
-        for name, data in sorted_employees:
-            # ترتيب سجلات الحضور حسب التاريخ
-            sorted_attendance = sorted(data.get('attendance', {}).items(), key=lambda x: x[0])
-            
-            for date, record in sorted_attendance:
-                date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
-                
-                # Apply month filter
-                if date_obj < month_start or date_obj > month_end:
-                    continue
-                
-                day_name = ["الاثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت", "الأحد"][date_obj.weekday()]
-                
-                self.attendance_tree.insert("", "end", values=(
-                    name,
-                    date,
-                    day_name,
-                    record.get('sessions', 0),
-                    f"{record.get('daily_bonus', 0):.2f}",
-                    "تعديل",
-                    "حذف"
-                ), tags=('editable',))
+        self.attendance_filter = (month_start.toordinal(), month_end.toordinal())
+        self.reset_attendance_view()
+    
+    def reset_attendance_view(self):
+        lo, hi = self.attendance_filter or (None, None)
+        self.attendance_view.reset(
+            lambda after, limit: self.payroll_index.ledger_keys(
+                ('employees',), ATTENDANCE_LEDGERS, after, limit, lo, hi),
+            None if self.attendance_filter is None else lambda key: lo <= key[3] <= hi)
+    
+    def ledger_record(self, key, ledgers):
+        """سجل مفتاح الجدول (المجموعة، الموظف، السجل، رقم اليوم، التاريخ) أو None"""
+        group, name, ledger, _, date = key
+        records = getattr(self, GROUPS[group]).get(name, {}).get(ledgers[ledger], {})
+        return records.get(date)
+    
+    def attendance_row(self, key):
+        record = self.ledger_record(key, ATTENDANCE_LEDGERS)
+        if record is None:
+            return None
+        _, name, _, ordinal, date = key
+        day_name = ["الاثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت", "الأحد"][datetime.date.fromordinal(ordinal).weekday()]
+        return (
+            name,
+            date,
+            day_name,
+            record.get('sessions', 0),
+            f"{record.get('daily_bonus', 0):.2f}",
+            "تعديل",
+            "حذف"
+        ), ('editable',)
     
     def reset_attendance_filter(self):
         self.filter_month.current(self.current_month - 1)
         self.filter_year.current(datetime.datetime.now().year - 2020)
-        self.update_employee_lists()
+        self.attendance_filter = None
+        self.reset_attendance_view()
     
     def handle_attendance_tree_click(self, event):
         region = self.attendance_tree.identify("region", event.x, event.y)
@@ -535,14 +983,10 @@ class EnhancedEmployeeSystem:
             if name in self.employees and date in self.employees[name].get('attendance', {}):
                 if messagebox.askyesno("تأكيد", f"هل أنت متأكد من حذف تسجيل حضور {name} بتاريخ {date}؟"):
                     del self.employees[name]['attendance'][date]
-                    self.update_employee_lists()
-                    self.save_data()
+                    self.commit_changes(('employees', name, 'attendance', date))
                     messagebox.showinfo("تم", "تم حذف تسجيل الحضور")
 
-    def create_bonus_tab(self):
-        tab = ttk.Frame(self.notebook)
-        self.notebook.add(tab, text="المكافآت والخصومات")
-        
+    def create_bonus_tab(self, tab):
         # Monthly Bonus Frame
         bonus_frame = ttk.LabelFrame(tab, text="تسجيل مكافآت الأداء", padding=10)
         bonus_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
@@ -582,6 +1026,9 @@ class EnhancedEmployeeSystem:
         ttk.Button(btn_frame, text="عرض سجل المكافآت", command=self.show_bonus_history,
                   style='Accent.TButton').pack(side='left', padx=5)
         
+        ttk.Button(btn_frame, text="عرض كل المكافآت", command=self.reset_bonus_filter,
+                  style='Accent.TButton').pack(side='left', padx=5)
+        
         ttk.Button(btn_frame, text="تسجيل جماعي", command=self.open_collective_bonus_window,
                   style='Accent.TButton').pack(side='left', padx=5)
         
@@ -631,6 +1078,7 @@ class EnhancedEmployeeSystem:
             self.bonus_tree.column(col, width=100, anchor="center")
         
         self.bonus_tree.pack(fill="both", expand=True)
+        self.bonus_view = PagedTreeview(self.bonus_tree, None, self.bonus_row)
         
         # Configure grid weights
         tab.grid_columnconfigure(0, weight=1)
@@ -658,64 +1106,13 @@ class EnhancedEmployeeSystem:
         collective_window.title(f"تسجيل مكافآت جماعية ليوم {date}")
         collective_window.geometry("800x600")
         
-        # Create a frame for the bonus entries
-        frame = ttk.Frame(collective_window)
-        frame.pack(fill='both', expand=True, padx=10, pady=10)
-        
-        # Create a canvas and scrollbar
-        canvas = tk.Canvas(frame)
-        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas)
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(
-                scrollregion=canvas.bbox("all")
-            )
-        )
-        
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        
-        # Add headers
-        headers_frame = ttk.Frame(scrollable_frame)
-        headers_frame.pack(fill='x', pady=5)
-        
-        ttk.Label(headers_frame, text="الموظف", font=('Arial', 12, 'bold')).pack(side='left', padx=10, expand=True)
-        ttk.Label(headers_frame, text="حصص الأداء", font=('Arial', 12, 'bold')).pack(side='left', padx=10, expand=True)
-        ttk.Label(headers_frame, text="سعر الحصة", font=('Arial', 12, 'bold')).pack(side='left', padx=10, expand=True)
-        ttk.Label(headers_frame, text="البونص الشهري", font=('Arial', 12, 'bold')).pack(side='left', padx=10, expand=True)
-        
-        # Create entry widgets for each employee
-        self.collective_bonus_entries = {}
-        
-        for name in self.employees:
-            emp_frame = ttk.Frame(scrollable_frame)
-            emp_frame.pack(fill='x', pady=5)
-            
-            ttk.Label(emp_frame, text=name).pack(side='left', padx=10, expand=True)
-            
-            sessions_var = tk.StringVar(value="0")
-            rate_var = tk.StringVar(value=str(self.employees[name].get('current_rate', 0)))
-            bonus_var = tk.StringVar(value="0")
-            
-            sessions_entry = ttk.Entry(emp_frame, textvariable=sessions_var)
-            sessions_entry.pack(side='left', padx=10, expand=True)
-            
-            rate_entry = ttk.Entry(emp_frame, textvariable=rate_var)
-            rate_entry.pack(side='left', padx=10, expand=True)
-            
-            bonus_entry = ttk.Entry(emp_frame, textvariable=bonus_var)
-            bonus_entry.pack(side='left', padx=10, expand=True)
-            
-            self.collective_bonus_entries[name] = {
-                'sessions': sessions_var,
-                'rate': rate_var,
-                'bonus': bonus_var
-            }
+        # جدول واحد يرسم الصفوف الظاهرة فقط بدلاً من حقول إدخال لكل موظف
+        names = list(self.employees)
+        rates = [str(self.employees[name].get('current_rate', 0)) for name in names]
+        self.collective_bonus_grid = EntryGrid(
+            collective_window, ("الموظف", "حصص الأداء", "سعر الحصة", "البونص الشهري"),
+            names, [["0"] * len(names), rates, ["0"] * len(names)])
+        self.collective_bonus_grid.pack(fill='both', expand=True, padx=10, pady=10)
         
         # Add save button
         btn_frame = ttk.Frame(collective_window)
@@ -724,6 +1121,11 @@ class EnhancedEmployeeSystem:
         ttk.Button(btn_frame, text="حفظ المكافآت", command=lambda: self.save_collective_bonus(date, collective_window),
                   style='Accent.TButton').pack(side='left', padx=10)
         
+        ttk.Button(btn_frame, text="لصق من الحافظة",
+                  command=lambda: self.paste_into_grid(
+                      collective_window, self.collective_bonus_grid, COLLECTIVE_BONUS_KINDS,
+                      lambda: self.save_collective_bonus(date, collective_window))).pack(side='left', padx=10)
+        
         ttk.Button(btn_frame, text="إلغاء", command=collective_window.destroy,
                   style='Delete.TButton').pack(side='left', padx=10)
     
@@ -734,19 +1136,15 @@ class EnhancedEmployeeSystem:
             messagebox.showerror("خطأ", "صيغة التاريخ غير صحيحة")
             return
         
-        for name, entries in self.collective_bonus_entries.items():
-            sessions = entries['sessions'].get()
-            rate = entries['rate'].get()
-            bonus = entries['bonus'].get()
-            
-            try:
-                sessions = int(sessions) if sessions else 0
-                rate = float(rate) if rate else 0
-                bonus = float(bonus) if bonus else 0
-            except ValueError:
-                messagebox.showerror("خطأ", f"قيم غير صحيحة للموظف {name}")
-                return
-            
+        # كل الصفوف تُفحص قبل تعديل أي موظف
+        rows, invalid = convert_grid_rows(self.collective_bonus_grid.rows(), COLLECTIVE_BONUS_KINDS)
+        if invalid is not None:
+            messagebox.showerror("خطأ", f"قيم غير صحيحة للموظف {invalid}")
+            return
+        
+        changed = []
+        
+        for name, sessions, rate, bonus in rows:
             if name not in self.employees:
                 continue
             
@@ -763,6 +1161,7 @@ class EnhancedEmployeeSystem:
                     'amount': performance_bonus_amount,
                     'rate': rate
                 }
+                changed.append(('employees', name, 'performance_bonus', date))
             
             # حفظ البونص الشهري إذا كان هناك قيمة
             if bonus > 0:
@@ -771,6 +1170,7 @@ class EnhancedEmployeeSystem:
                 
                 # نستخدم التاريخ كمعرف للبونص الشهري
                 self.employees[name]['monthly_bonuses'][date] = bonus
+                changed.append(('employees', name, 'monthly_bonuses', date))
             
             # حفظ سعر الحصة إذا كان مختلفًا عن السعر الحالي
             if rate > 0 and rate != self.employees[name].get('current_rate', 0):
@@ -780,9 +1180,10 @@ class EnhancedEmployeeSystem:
                 # نستخدم التاريخ كمعرف لسعر الحصة
                 self.employees[name]['monthly_rates'][date] = rate
                 self.employees[name]['current_rate'] = rate
+                changed.append(('employees', name, 'monthly_rates', date))
+                changed.append(('employees', name, 'current_rate'))
         
-        self.save_data()
-        self.update_employee_lists()
+        self.commit_changes(*changed)
         messagebox.showinfo("تم", f"تم تسجيل المكافآت الجماعية لليوم {date}")
         window.destroy()
     
@@ -804,14 +1205,12 @@ class EnhancedEmployeeSystem:
                 if bonus_type == "بونص الأداء" and date in self.employees[name].get('performance_bonus', {}):
                     if messagebox.askyesno("تأكيد", f"هل أنت متأكد من حذف مكافأة الأداء لـ {name} بتاريخ {date}؟"):
                         del self.employees[name]['performance_bonus'][date]
-                        self.update_employee_lists()
-                        self.save_data()
+                        self.commit_changes(('employees', name, 'performance_bonus', date))
                         messagebox.showinfo("تم", "تم حذف المكافأة")
                 elif bonus_type == "البونص الشهري" and date in self.employees[name].get('monthly_bonuses', {}):
                     if messagebox.askyesno("تأكيد", f"هل أنت متأكد من حذف البونص الشهري لـ {name} بتاريخ {date}؟"):
                         del self.employees[name]['monthly_bonuses'][date]
-                        self.update_employee_lists()
-                        self.save_data()
+                        self.commit_changes(('employees', name, 'monthly_bonuses', date))
                         messagebox.showinfo("تم", "تم حذف المكافأة")
     
     def save_bonus(self):
@@ -851,6 +1250,8 @@ class EnhancedEmployeeSystem:
         if 'monthly_bonuses' not in self.employees[name]:
             self.employees[name]['monthly_bonuses'] = {}
         
+        changed = []
+        
         # حفظ بونص الأداء
         if performance_bonus_sessions > 0:
             self.employees[name]['performance_bonus'][date] = {
@@ -858,20 +1259,23 @@ class EnhancedEmployeeSystem:
                 'amount': performance_bonus_amount,
                 'rate': current_month_rate
             }
+            changed.append(('employees', name, 'performance_bonus', date))
         
         # حفظ البونص الشهري
         if monthly_bonus > 0:
             self.employees[name]['monthly_bonuses'][date] = monthly_bonus
+            changed.append(('employees', name, 'monthly_bonuses', date))
         
         # حفظ سعر الحصة إذا كان مختلفًا عن السعر الحالي
         if current_month_rate > 0 and current_month_rate != self.employees[name].get('current_rate', 0):
             self.employees[name]['monthly_rates'][date] = current_month_rate
             self.employees[name]['current_rate'] = current_month_rate
+            changed.append(('employees', name, 'monthly_rates', date))
+            changed.append(('employees', name, 'current_rate'))
         
-        self.save_data()
+        self.commit_changes(*changed)
         messagebox.showinfo("تم", f"تم حفظ المكافآت لـ {name}\nبونص الأداء: {performance_bonus_amount:.2f} (عدد الحصص: {performance_bonus_sessions})\nالبونص الشهري: {monthly_bonus:.2f}")
         self.clear_bonus_fields()
-        self.update_employee_lists()
     
     def delete_bonus(self):
         name = self.bonus_employee.get()
@@ -892,10 +1296,10 @@ class EnhancedEmployeeSystem:
             if 'monthly_bonuses' in self.employees[name] and date in self.employees[name]['monthly_bonuses']:
                 del self.employees[name]['monthly_bonuses'][date]
             
-            self.save_data()
+            self.commit_changes(('employees', name, 'performance_bonus', date),
+                                ('employees', name, 'monthly_bonuses', date))
             messagebox.showinfo("تم", "تم حذف المكافآت")
             self.clear_bonus_fields()
-            self.update_employee_lists()
     
     def show_bonus_history(self):
         name = self.bonus_employee.get()
@@ -914,38 +1318,20 @@ class EnhancedEmployeeSystem:
             messagebox.showinfo("السجل", "لا يوجد سجل مكافآت لهذا الموظف")
             return
         
-        # Update bonus tree
-        self.bonus_tree.delete(*self.bonus_tree.get_children())
-        
-        # Add performance bonuses
-        for date in sorted(bonus_history.keys()):
-            sessions = bonus_history[date].get('sessions', 0)
-            rate = bonus_history[date].get('rate', 0)
-            amount = bonus_history[date].get('amount', 0)
-            
-            self.bonus_tree.insert("", "end", values=(
-                name,
-                date,
-                "بونص الأداء",
-                f"{sessions} حصة × {rate:.2f}",
-                f"{amount:.2f}",
-                "تعديل",
-                "حذف"
-            ))
-        
-        # Add monthly bonuses
-        for date in sorted(monthly_bonuses.keys()):
-            bonus = monthly_bonuses[date]
-            if bonus > 0:
-                self.bonus_tree.insert("", "end", values=(
-                    name,
-                    date,
-                    "البونص الشهري",
-                    "-",
-                    f"{bonus:.2f}",
-                    "تعديل",
-                    "حذف"
-                ))
+        # الجدول نفسه يعرض مكافآت الموظف وحده ويبقى يُحدَّث عند التعديل
+        self.bonus_filter = name
+        self.reset_bonus_view()
+    
+    def reset_bonus_filter(self):
+        self.bonus_filter = None
+        self.reset_bonus_view()
+    
+    def reset_bonus_view(self):
+        names = None if self.bonus_filter is None else (self.bonus_filter,)
+        self.bonus_view.reset(
+            lambda after, limit: self.payroll_index.ledger_keys(
+                ('employees',), BONUS_LEDGERS, after, limit, names=names),
+            None if names is None else lambda key: key[1] in names)
     
     def save_deduction(self):
         name = self.ded_employee.get()
@@ -965,6 +1351,7 @@ class EnhancedEmployeeSystem:
             return
         
         if name in self.employees:
+            group = 'employees'
             if 'deductions' not in self.employees[name]:
                 self.employees[name]['deductions'] = {}
             
@@ -973,6 +1360,7 @@ class EnhancedEmployeeSystem:
                 'reason': reason
             }
         elif name in self.other_employees:
+            group = 'other_employees'
             if 'deductions' not in self.other_employees[name]:
                 self.other_employees[name]['deductions'] = {}
             
@@ -984,7 +1372,7 @@ class EnhancedEmployeeSystem:
             messagebox.showerror("خطأ", "الموظف غير موجود")
             return
         
-        self.save_data()
+        self.commit_changes((group, name, 'deductions', date))
         messagebox.showinfo("تم", f"تم حفظ الخصم لـ {name} بتاريخ {date}")
         self.clear_deduction_fields()
     
@@ -999,13 +1387,13 @@ class EnhancedEmployeeSystem:
         if name in self.employees and date in self.employees[name].get('deductions', {}):
             if messagebox.askyesno("تأكيد", f"هل أنت متأكد من حذف خصم {name} بتاريخ {date}؟"):
                 del self.employees[name]['deductions'][date]
-                self.save_data()
+                self.commit_changes(('employees', name, 'deductions', date))
                 messagebox.showinfo("تم", "تم حذف الخصم")
                 self.clear_deduction_fields()
         elif name in self.other_employees and date in self.other_employees[name].get('deductions', {}):
             if messagebox.askyesno("تأكيد", f"هل أنت متأكد من حذف خصم {name} بتاريخ {date}؟"):
                 del self.other_employees[name]['deductions'][date]
-                self.save_data()
+                self.commit_changes(('other_employees', name, 'deductions', date))
                 messagebox.showinfo("تم", "تم حذف الخصم")
                 self.clear_deduction_fields()
         else:
@@ -1057,9 +1445,10 @@ class EnhancedEmployeeSystem:
             if messagebox.askyesno("تأكيد", f"هل تريد حذف خصم بتاريخ {selected_date}؟"):
                 if name in self.employees and selected_date in self.employees[name].get('deductions', {}):
                     del self.employees[name]['deductions'][selected_date]
+                    self.commit_changes(('employees', name, 'deductions', selected_date))
                 elif name in self.other_employees and selected_date in self.other_employees[name].get('deductions', {}):
                     del self.other_employees[name]['deductions'][selected_date]
-                self.save_data()
+                    self.commit_changes(('other_employees', name, 'deductions', selected_date))
                 messagebox.showinfo("تم", "تم حذف الخصم")
                 history_window.destroy()
         
@@ -1084,10 +1473,7 @@ class EnhancedEmployeeSystem:
         self.ded_amount.insert(0, "0")
         self.ded_reason.delete(0, tk.END)
 
-    def create_advance_tab(self):
-        tab = ttk.Frame(self.notebook)
-        self.notebook.add(tab, text="السلف")
-        
+    def create_advance_tab(self, tab):
         # Advance Entry Frame
         entry_frame = ttk.LabelFrame(tab, text="تسجيل سلفة", padding=10)
         entry_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
@@ -1136,6 +1522,7 @@ class EnhancedEmployeeSystem:
             self.advance_tree.column(col, width=100, anchor="center")
         
         self.advance_tree.pack(fill="both", expand=True)
+        self.advance_view = PagedTreeview(self.advance_tree, None, self.advance_row)
         
         # Configure grid weights
         tab.grid_columnconfigure(0, weight=1)
@@ -1162,16 +1549,16 @@ class EnhancedEmployeeSystem:
                     del self.employees[name]['advances'][date]
                     if 'advance_due_dates' in self.employees[name]:
                         del self.employees[name]['advance_due_dates'][date]
-                    self.update_employee_lists()
-                    self.save_data()
+                    self.commit_changes(('employees', name, 'advances', date),
+                                        ('employees', name, 'advance_due_dates', date))
                     messagebox.showinfo("تم", "تم حذف السلفة")
             elif name in self.other_employees and date in self.other_employees[name].get('advances', {}):
                 if messagebox.askyesno("تأكيد", f"هل أنت متأكد من حذف سلفة {name} بتاريخ {date}؟"):
                     del self.other_employees[name]['advances'][date]
                     if 'advance_due_dates' in self.other_employees[name]:
                         del self.other_employees[name]['advance_due_dates'][date]
-                    self.update_employee_lists()
-                    self.save_data()
+                    self.commit_changes(('other_employees', name, 'advances', date),
+                                        ('other_employees', name, 'advance_due_dates', date))
                     messagebox.showinfo("تم", "تم حذف السلفة")
     
     def save_advance(self):
@@ -1195,6 +1582,7 @@ class EnhancedEmployeeSystem:
             return
         
         if name in self.employees:
+            group = 'employees'
             if 'advances' not in self.employees[name]:
                 self.employees[name]['advances'] = {}
             if 'advance_due_dates' not in self.employees[name]:
@@ -1206,6 +1594,7 @@ class EnhancedEmployeeSystem:
                 'year': due_year
             }
         elif name in self.other_employees:
+            group = 'other_employees'
             if 'advances' not in self.other_employees[name]:
                 self.other_employees[name]['advances'] = {}
             if 'advance_due_dates' not in self.other_employees[name]:
@@ -1220,8 +1609,8 @@ class EnhancedEmployeeSystem:
             messagebox.showerror("خطأ", "الموظف غير موجود")
             return
         
-        self.update_employee_lists()
-        self.save_data()
+        self.commit_changes((group, name, 'advances', date),
+                            (group, name, 'advance_due_dates', date))
         messagebox.showinfo("تم", f"تم تسجيل سلفة لـ {name} بتاريخ {date}")
         self.clear_advance_fields()
     
@@ -1238,8 +1627,8 @@ class EnhancedEmployeeSystem:
                 del self.employees[name]['advances'][date]
                 if 'advance_due_dates' in self.employees[name]:
                     del self.employees[name]['advance_due_dates'][date]
-                self.update_employee_lists()
-                self.save_data()
+                self.commit_changes(('employees', name, 'advances', date),
+                                    ('employees', name, 'advance_due_dates', date))
                 messagebox.showinfo("تم", "تم حذف السلفة")
                 self.clear_advance_fields()
         elif name in self.other_employees and date in self.other_employees[name].get('advances', {}):
@@ -1247,8 +1636,8 @@ class EnhancedEmployeeSystem:
                 del self.other_employees[name]['advances'][date]
                 if 'advance_due_dates' in self.other_employees[name]:
                     del self.other_employees[name]['advance_due_dates'][date]
-                self.update_employee_lists()
-                self.save_data()
+                self.commit_changes(('other_employees', name, 'advances', date),
+                                    ('other_employees', name, 'advance_due_dates', date))
                 messagebox.showinfo("تم", "تم حذف السلفة")
                 self.clear_advance_fields()
         else:
@@ -1257,10 +1646,7 @@ class EnhancedEmployeeSystem:
     def clear_advance_fields(self):
         self.adv_amount.delete(0, tk.END)
 
-    def create_reports_tab(self):
-        tab = ttk.Frame(self.notebook)
-        self.notebook.add(tab, text="التقارير")
-        
+    def create_reports_tab(self, tab):
         # Report Controls Frame
         controls_frame = ttk.LabelFrame(tab, text="إعداد التقرير", padding=10)
         controls_frame.grid(row=0, column=0, padx=10, pady=10, sticky="ew")
@@ -1308,8 +1694,12 @@ class EnhancedEmployeeSystem:
                   style='Accent.TButton').pack(side='left', padx=5)
         ttk.Button(btn_frame, text="تصدير لإكسل", command=self.export_to_excel,
                   style='Accent.TButton').pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="تصدير السجل الكامل", command=self.export_ledger_workbook,
+                  style='Accent.TButton').pack(side='left', padx=5)
         ttk.Button(btn_frame, text="تصدير لوورد", command=self.export_to_word,
                   style='Export.TButton').pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="كشوف رواتب الجميع", command=self.export_payslips_word,
+                  style='Export.TButton').pack(side='left', padx=5)
         
         # Report Display Frame
         display_frame = ttk.LabelFrame(tab, text="تقرير الرواتب", padding=10)
@@ -1350,252 +1740,106 @@ class EnhancedEmployeeSystem:
         self.report_to_date.delete(0, tk.END)
     
     def calculate_salary_for_period(self, name, from_date=None, to_date=None):
-        if name in self.employees:
-            employee = self.employees[name]
-            total_sessions = 0
-            total_daily_bonus = 0
-            base_rate = employee.get('current_rate', 0)
-            
-            # حساب الحضور في الفترة المحددة
-            for date, record in employee.get('attendance', {}).items():
-                date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
-                if from_date and date_obj < from_date:
-                    continue
-                if to_date and date_obj > to_date:
-                    continue
-                
-                total_sessions += record.get('sessions', 0)
-                total_daily_bonus += record.get('daily_bonus', 0)
-            
-            # حساب المكافآت والخصومات في الفترة المحددة
-            performance_bonus = 0
-            performance_sessions = 0
-            monthly_bonus = 0
-            deduction = 0
-            advance_amount = 0
-            
-            # حساب بونص الأداء في الفترة المحددة
-            for date, bonus_data in employee.get('performance_bonus', {}).items():
-                date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
-                if from_date and date_obj < from_date:
-                    continue
-                if to_date and date_obj > to_date:
-                    continue
-                
-                performance_sessions += bonus_data.get('sessions', 0)
-                performance_bonus += bonus_data.get('amount', 0)
-            
-            # حساب البونص الشهري في الفترة المحددة
-            for date, bonus in employee.get('monthly_bonuses', {}).items():
-                date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
-                if from_date and date_obj < from_date:
-                    continue
-                if to_date and date_obj > to_date:
-                    continue
-                
-                monthly_bonus += bonus
-            
-            # حساب الخصومات في الفترة المحددة
-            for date, ded_data in employee.get('deductions', {}).items():
-                date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
-                if from_date and date_obj < from_date:
-                    continue
-                if to_date and date_obj > to_date:
-                    continue
-                
-                deduction += ded_data.get('amount', 0)
-            
-            # حساب السلف في الفترة المحددة
-            for date, amount in employee.get('advances', {}).items():
-                date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
-                if from_date and date_obj < from_date:
-                    continue
-                if to_date and date_obj > to_date:
-                    continue
-                
-                due_date = employee.get('advance_due_dates', {}).get(date, {})
-                due_month = due_date.get('month', 0)
-                due_year = due_date.get('year', 0)
-                
-                if due_month and due_year:
-                    due_date_obj = datetime.datetime(due_year, due_month, 1)
-                    if from_date and due_date_obj < from_date:
-                        continue
-                    if to_date and due_date_obj > to_date:
-                        continue
-                
-                advance_amount += amount
-            
-            # حساب سعر الحصة (آخر سعر تم تحديده في الفترة)
-            current_rate = base_rate
-            for date, rate in sorted(employee.get('monthly_rates', {}).items(), reverse=True):
-                date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
-                if from_date and date_obj < from_date:
-                    continue
-                if to_date and date_obj > to_date:
-                    continue
-                
-                current_rate = rate
-                break
-            
-            # حساب راتب الحصص (عدد الحصص × سعر الحصة)
-            sessions_salary = total_sessions * current_rate
-            
-            salary = sessions_salary + performance_bonus + total_daily_bonus + monthly_bonus - deduction - advance_amount
-            
-            return {
-                'name': name,
-                'type': 'بحصص',
-                'base_rate': base_rate,
-                'current_rate': current_rate,
-                'sessions': total_sessions,
-                'sessions_salary': sessions_salary,
-                'performance_sessions': performance_sessions,
-                'performance_bonus': performance_bonus,
-                'daily_bonus': total_daily_bonus,
-                'monthly_bonus': monthly_bonus,
-                'deduction': deduction,
-                'advance': advance_amount,
-                'salary': salary,
-                'from_date': from_date.strftime('%Y-%m-%d') if from_date else '',
-                'to_date': to_date.strftime('%Y-%m-%d') if to_date else ''
-            }
-        elif name in self.other_employees:
-            employee = self.other_employees[name]
-            base_salary = employee.get('monthly_salary', 0)
-            monthly_salary = 0
-            monthly_bonus = 0
-            deduction = 0
-            advance_amount = 0
-            
-            # حساب الرواتب الشهرية في الفترة المحددة
-            for month_year, salary in employee.get('monthly_salaries', {}).items():
-                month, year = map(int, month_year.split('_'))
-                month_start = datetime.datetime(year, month, 1)
-                month_end = datetime.datetime(year, month, 1) + datetime.timedelta(days=32)
-                month_end = month_end.replace(day=1) - datetime.timedelta(days=1)
-                
-                if from_date and month_end < from_date:
-                    continue
-                if to_date and month_start > to_date:
-                    continue
-                
-                monthly_salary += salary
-            
-            # إذا لم يكن هناك رواتب محددة، نستخدم الراتب الأساسي
-            if monthly_salary == 0 and base_salary > 0:
-                # حساب عدد الأشهر في الفترة
-                if from_date and to_date:
-                    months = (to_date.year - from_date.year) * 12 + (to_date.month - from_date.month) + 1
-                    monthly_salary = base_salary * months
-            
-            # حساب البونص الشهري في الفترة المحددة
-            for date, bonus in employee.get('monthly_bonuses', {}).items():
-                date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
-                if from_date and date_obj < from_date:
-                    continue
-                if to_date and date_obj > to_date:
-                    continue
-                
-                monthly_bonus += bonus
-            
-            # حساب الخصومات في الفترة المحددة
-            for date, ded_data in employee.get('deductions', {}).items():
-                date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
-                if from_date and date_obj < from_date:
-                    continue
-                if to_date and date_obj > to_date:
-                    continue
-                
-                deduction += ded_data.get('amount', 0)
-            
-            # حساب السلف في الفترة المحددة
-            for date, amount in employee.get('advances', {}).items():
-                date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
-                if from_date and date_obj < from_date:
-                    continue
-                if to_date and date_obj > to_date:
-                    continue
-                
-                due_date = employee.get('advance_due_dates', {}).get(date, {})
-                due_month = due_date.get('month', 0)
-                due_year = due_date.get('year', 0)
-                
-                if due_month and due_year:
-                    due_date_obj = datetime.datetime(due_year, due_month, 1)
-                    if from_date and due_date_obj < from_date:
-                        continue
-                    if to_date and due_date_obj > to_date:
-                        continue
-                
-                advance_amount += amount
-            
-            salary = monthly_salary + monthly_bonus - deduction - advance_amount
-            
-            return {
-                'name': name,
-                'type': 'راتب ثابت',
-                'base_salary': base_salary,
-                'monthly_salary': monthly_salary,
-                'monthly_bonus': monthly_bonus,
-                'deduction': deduction,
-                'advance': advance_amount,
-                'salary': salary,
-                'from_date': from_date.strftime('%Y-%m-%d') if from_date else '',
-                'to_date': to_date.strftime('%Y-%m-%d') if to_date else ''
-            }
-        else:
+        return cached_salary(self.salary_cache, self.payroll_index, name, from_date, to_date)
+    
+    def get_report_period(self):
+        """فترة التقرير من حقول تبويب التقارير، أو None بعد عرض رسالة الخطأ"""
+        try:
+            return parse_report_period(self.report_from_date.get(), self.report_to_date.get(),
+                                       self.report_month.get(), self.report_year.get())
+        except ValueError as e:
+            messagebox.showerror("خطأ", str(e))
             return None
     
-    def generate_report(self):
-        from_date_str = self.report_from_date.get()
-        to_date_str = self.report_to_date.get()
-        
-        from_date = None
-        to_date = None
-        
-        if not from_date_str and not to_date_str:
-            # إذا لم يتم تحديد تاريخ، نستخدم الشهر المحدد فقط
-            month = int(self.report_month.get())
-            year = int(self.report_year.get())
-            from_date = datetime.datetime(year, month, 1)
-            to_date = datetime.datetime(year, month, 1) + datetime.timedelta(days=32)
-            to_date = to_date.replace(day=1) - datetime.timedelta(days=1)
-        else:
-            if from_date_str:
-                try:
-                    from_date = datetime.datetime.strptime(from_date_str, "%Y-%m-%d")
-                except ValueError:
-                    messagebox.showerror("خطأ", "صيغة تاريخ البداية غير صحيحة")
-                    return
+    def run_in_background(self, title, work, on_done, error_text="فشلت العملية"):
+        """تشغيل work(task) في خيط منفصل مع نافذة تقدم وزر إلغاء
+        
+        الواجهة تبقى تعمل أثناء ذلك، و on_done(result) تُستدعى في خيط الواجهة
+        بعد انتهاء العمل. عند الإلغاء تُغلق النافذة بدون أي رسالة.
+        """
+        task = BackgroundTask(work)
+        
+        window = tk.Toplevel(self.root)
+        window.title(title)
+        window.geometry("420x140")
+        window.transient(self.root)
+        
+        label = ttk.Label(window, text="جاري التحضير...", font=('Arial', 12))
+        label.pack(pady=10)
+        bar = ttk.Progressbar(window, length=380, mode='determinate')
+        bar.pack(pady=5)
+        ttk.Button(window, text="إلغاء", command=task.cancel,
+                  style='Delete.TButton').pack(pady=5)
+        window.protocol("WM_DELETE_WINDOW", task.cancel)
+        
+        def poll():
+            if not task.done():
+                done, total, text = task.progress()
+                if total:
+                    bar.configure(maximum=total, value=done)
+                if text:
+                    label.configure(text=text)
+                self.root.after(TASK_POLL_DELAY, poll)
+                return
             
-            if to_date_str:
-                try:
-                    to_date = datetime.datetime.strptime(to_date_str, "%Y-%m-%d")
-                except ValueError:
-                    messagebox.showerror("خطأ", "صيغة تاريخ النهاية غير صحيحة")
-                    return
-        
-        if from_date and to_date and from_date > to_date:
-            messagebox.showerror("خطأ", "تاريخ البداية يجب أن يكون قبل تاريخ النهاية")
-            return
-        
-        reports = []
-        total_salaries = 0
-        
-        # Regular employees
-        for name in self.employees:
-            report = self.calculate_salary_for_period(name, from_date, to_date)
-            if report:
-                reports.append(report)
-                total_salaries += report['salary']
-        
-        # Other employees
-        for name in self.other_employees:
-            report = self.calculate_salary_for_period(name, from_date, to_date)
-            if report:
-                reports.append(report)
-                total_salaries += report['salary']
+            window.destroy()
+            try:
+                result = task.result()
+            except TaskCancelled:
+                return
+            except Exception as e:
+                messagebox.showerror("خطأ", f"{error_text}: {str(e)}")
+                return
+            on_done(result)
+        
+        poll()
+    
+    def run_payroll_task(self, title, period, work, on_done, *args, error_text="فشلت العملية"):
+        """work(task, run, *args) في الخلفية بعد حساب رواتب الفترة
+        
+        تُستخدم نتيجة الحساب السابقة إذا كانت ما زالت صالحة، وإلا تُحسب في
+        الخيط نفسه من نسخة من البيانات فيمكن الاستمرار في التعديل أثناء العمل.
+        """
+        run = self.payroll_run
+        snapshot = None
+        if run is None or not run.matches(self.payroll_index, *period):
+            run = None
+            snapshot = payroll_snapshot(self.payroll_index, *period)
+        
+        def job(task):
+            current = run
+            if current is None:
+                task.step(0, 0, "جاري حساب الرواتب...")
+                current = PayrollRun(snapshot_index(snapshot), *period)
+            return current, work(task, current, *args)
+        
+        def finish(result):
+            current, value = result
+            if current.matches(self.payroll_index, *period):
+                self.payroll_run = current
+            on_done(value)
+        
+        self.run_in_background(title, job, finish, error_text)
+    
+    def generate_report(self):
+        period = self.get_report_period()
+        if period is None:
+            return
+        month_text = f"{self.report_month.get()}/{self.report_year.get()}"
+        self.run_payroll_task("عرض التقرير", period, self.payroll_report_text, self.show_report, month_text)
+    
+    def show_report(self, report_text):
+        self.report_text.delete(1.0, "end")
+        self.report_text.insert("end", report_text)
+    
+    def payroll_report_text(self, task, run, month_text):
+        """نص تقرير الرواتب (يعمل في خيط التقرير فلا يستخدم أي عنصر من الواجهة)"""
+        from tabulate import tabulate
+        
+        from_date, to_date = run.from_date, run.to_date
+        
+        reports = run.reports
+        total_salaries = run.total_salaries
         
         # Generate report text
         report_text = "\n" + "="*120 + "\n"
@@ -1604,7 +1848,7 @@ class EnhancedEmployeeSystem:
         if from_date and to_date:
             report_text += " " * 45 + f"للفترة من {from_date.strftime('%Y-%m-%d')} إلى {to_date.strftime('%Y-%m-%d')}\n"
         else:
-            report_text += " " * 45 + f"لشهر {self.report_month.get()}/{self.report_year.get()}\n"
+            report_text += " " * 45 + f"لشهر {month_text}\n"
         
         report_text += "="*120 + "\n\n"
         
@@ -1616,7 +1860,8 @@ class EnhancedEmployeeSystem:
                   "البونص اليومي", "البونص الشهري", "الخصومات", "السلف", "صافي الراتب"]
         data = []
         
-        for emp in reports:
+        for i, emp in enumerate(reports):
+            task.step(i, len(reports), "جاري تجهيز تقرير الرواتب...")
             if emp['type'] == 'بحصص':
                 data.append([
                     emp['name'],
@@ -1666,9 +1911,7 @@ class EnhancedEmployeeSystem:
         report_text += " " * 40 + f"إجمالي رواتب جميع الموظفين: {total_salaries:.2f}\n"
         report_text += "="*120 + "\n"
         
-        # Display report
-        self.report_text.delete(1.0, "end")
-        self.report_text.insert("end", report_text)
+        return report_text
     
     def generate_employee_report(self):
         name = self.report_employee.get()
@@ -1676,38 +1919,12 @@ class EnhancedEmployeeSystem:
             messagebox.showerror("خطأ", "الرجاء تحديد الموظف")
             return
         
-        from_date_str = self.report_from_date.get()
-        to_date_str = self.report_to_date.get()
-        
-        from_date = None
-        to_date = None
-        
-        if not from_date_str and not to_date_str:
-            # إذا لم يتم تحديد تاريخ، نستخدم الشهر المحدد فقط
-            month = int(self.report_month.get())
-            year = int(self.report_year.get())
-            from_date = datetime.datetime(year, month, 1)
-            to_date = datetime.datetime(year, month, 1) + datetime.timedelta(days=32)
-            to_date = to_date.replace(day=1) - datetime.timedelta(days=1)
-        else:
-            if from_date_str:
-                try:
-                    from_date = datetime.datetime.strptime(from_date_str, "%Y-%m-%d")
-                except ValueError:
-                    messagebox.showerror("خطأ", "صيغة تاريخ البداية غير صحيحة")
-                    return
-            
-            if to_date_str:
-                try:
-                    to_date = datetime.datetime.strptime(to_date_str, "%Y-%m-%d")
-                except ValueError:
-                    messagebox.showerror("خطأ", "صيغة تاريخ النهاية غير صحيحة")
-                    return
-        
-        if from_date and to_date and from_date > to_date:
-            messagebox.showerror("خطأ", "تاريخ البداية يجب أن يكون قبل تاريخ النهاية")
+        period = self.get_report_period()
+        if period is None:
             return
+        from_date, to_date = period
         
+        # موظف واحد: من ذاكرة النتائج بدلاً من حساب رواتب الجميع
         report = self.calculate_salary_for_period(name, from_date, to_date)
         
         if not report:
@@ -1753,6 +1970,8 @@ class EnhancedEmployeeSystem:
         self.report_text.insert("end", report_text)
     
     def generate_attendance_report(self):
+        from tabulate import tabulate
+        
         name = self.report_employee.get()
         if not name:
             messagebox.showerror("خطأ", "الرجاء تحديد الموظف")
@@ -1762,52 +1981,19 @@ class EnhancedEmployeeSystem:
             messagebox.showerror("خطأ", "هذا الموظف ليس من الموظفين بحصص")
             return
         
-        from_date_str = self.report_from_date.get()
-        to_date_str = self.report_to_date.get()
-        
-        from_date = None
-        to_date = None
-        
-        if not from_date_str and not to_date_str:
-            # إذا لم يتم تحديد تاريخ، نستخدم الشهر المحدد فقط
-            month = int(self.report_month.get())
-            year = int(self.report_year.get())
-            from_date = datetime.datetime(year, month, 1)
-            to_date = datetime.datetime(year, month, 1) + datetime.timedelta(days=32)
-            to_date = to_date.replace(day=1) - datetime.timedelta(days=1)
-        else:
-            if from_date_str:
-                try:
-                    from_date = datetime.datetime.strptime(from_date_str, "%Y-%m-%d")
-                except ValueError:
-                    messagebox.showerror("خطأ", "صيغة تاريخ البداية غير صحيحة")
-                    return
-            
-            if to_date_str:
-                try:
-                    to_date = datetime.datetime.strptime(to_date_str, "%Y-%m-%d")
-                except ValueError:
-                    messagebox.showerror("خطأ", "صيغة تاريخ النهاية غير صحيحة")
-                    return
-        
-        if from_date and to_date and from_date > to_date:
-            messagebox.showerror("خطأ", "تاريخ البداية يجب أن يكون قبل تاريخ النهاية")
+        period = self.get_report_period()
+        if period is None:
             return
+        from_date, to_date = period
         
+        # السجلات في الفترة فقط ومرتبة من الأقدم إلى الأحدث
         attendance_records = []
-        for date, record in self.employees[name].get('attendance', {}).items():
-            date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
-            
-            # Apply date range filter if specified
-            if from_date and date_obj < from_date:
-                continue
-            if to_date and date_obj > to_date:
-                continue
-            
+        for _, ordinal, date, record in self.ledger_items('employees', name, 'attendance', from_date, to_date):
+            date_obj = datetime.date.fromordinal(ordinal)
             day_name = ["الاثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت", "الأحد"][date_obj.weekday()]
             
             attendance_records.append({
-                'date': date,
+                'date': date_obj,
                 'day': day_name,
                 'sessions': record.get('sessions', 0),
                 'daily_bonus': record.get('daily_bonus', 0)
@@ -1817,12 +2003,6 @@ class EnhancedEmployeeSystem:
             messagebox.showinfo("السجل", "لا يوجد سجل حضور لهذا الموظف في الفترة المحددة")
             return
         
-        # ترتيب التواريخ من الأقدم إلى الأحدث
-        attendance_records.sort(key=lambda x: x['date'])
-        
-        # إنشاء DataFrame للتصدير
-        df = pd.DataFrame(attendance_records)
-        
         # عرض التقرير في النافذة
         report_text = f"\nتقرير حضور الموظف {name}\n"
         
@@ -1832,7 +2012,9 @@ class EnhancedEmployeeSystem:
             report_text += f"لشهر {self.report_month.get()}/{self.report_year.get()}\n"
         
         report_text += "-"*80 + "\n"
-        report_text += tabulate(df, headers=['التاريخ', 'اليوم', 'الحصص', 'البونص اليومي'], tablefmt="pretty")
+        rows = [(record['date'].strftime('%Y-%m-%d'), record['day'], record['sessions'], record['daily_bonus'])
+                for record in attendance_records]
+        report_text += tabulate(rows, headers=['التاريخ', 'اليوم', 'الحصص', 'البونص اليومي'], tablefmt="pretty")
         
         # Calculate totals
         total_sessions = sum(record['sessions'] for record in attendance_records)
@@ -1854,113 +2036,15 @@ class EnhancedEmployeeSystem:
         
         if file_path:
             try:
-                df.to_excel(file_path, index=False)
+                write_attendance_xlsx(file_path, attendance_records)
                 messagebox.showinfo("تم", f"تم تصدير تقرير الحضور إلى {file_path}")
             except Exception as e:
                 messagebox.showerror("خطأ", f"فشل التصدير: {str(e)}")
     
     def export_to_excel(self):
-        from_date_str = self.report_from_date.get()
-        to_date_str = self.report_to_date.get()
-        
-        from_date = None
-        to_date = None
-        
-        if not from_date_str and not to_date_str:
-            # إذا لم يتم تحديد تاريخ، نستخدم الشهر المحدد فقط
-            month = int(self.report_month.get())
-            year = int(self.report_year.get())
-            from_date = datetime.datetime(year, month, 1)
-            to_date = datetime.datetime(year, month, 1) + datetime.timedelta(days=32)
-            to_date = to_date.replace(day=1) - datetime.timedelta(days=1)
-        else:
-            if from_date_str:
-                try:
-                    from_date = datetime.datetime.strptime(from_date_str, "%Y-%m-%d")
-                except ValueError:
-                    messagebox.showerror("خطأ", "صيغة تاريخ البداية غير صحيحة")
-                    return
-            
-            if to_date_str:
-                try:
-                    to_date = datetime.datetime.strptime(to_date_str, "%Y-%m-%d")
-                except ValueError:
-                    messagebox.showerror("خطأ", "صيغة تاريخ النهاية غير صحيحة")
-                    return
-        
-        if from_date and to_date and from_date > to_date:
-            messagebox.showerror("خطأ", "تاريخ البداية يجب أن يكون قبل تاريخ النهاية")
-            return
-        
-        reports = []
-        total_salaries = 0
-        
-        # Regular employees
-        for name in self.employees:
-            report = self.calculate_salary_for_period(name, from_date, to_date)
-            if report:
-                reports.append(report)
-                total_salaries += report['salary']
-        
-        # Other employees
-        for name in self.other_employees:
-            report = self.calculate_salary_for_period(name, from_date, to_date)
-            if report:
-                reports.append(report)
-                total_salaries += report['salary']
-        
-        # Prepare data for Excel
-        data = []
-        
-        for emp in reports:
-            if emp['type'] == 'بحصص':
-                data.append({
-                    'الاسم': emp['name'],
-                    'النوع': 'بحصص',
-                    'سعر الحصة الأساسي': f"{emp['base_rate']:.2f}",
-                    'سعر الحصة الحالي': f"{emp['current_rate']:.2f}",
-                    'الحصص العادية': emp['sessions'],
-                    'راتب الحصص': f"{emp['sessions_salary']:.2f}",
-                    'حصص الأداء': emp['performance_sessions'],
-                    'بونص الأداء': f"{emp['performance_bonus']:.2f}",
-                    'البونص اليومي': f"{emp['daily_bonus']:.2f}",
-                    'البونص الشهري': f"{emp['monthly_bonus']:.2f}",
-                    'الخصومات': f"{emp['deduction']:.2f}",
-                    'السلف': f"{emp['advance']:.2f}",
-                    'صافي الراتب': f"{emp['salary']:.2f}"
-                })
-            else:
-                data.append({
-                    'الاسم': emp['name'],
-                    'النوع': 'راتب ثابت',
-                    'الراتب الأساسي': f"{emp['base_salary']:.2f}",
-                    'الراتب الشهري': f"{emp['monthly_salary']:.2f}",
-                    'البونص الشهري': f"{emp['monthly_bonus']:.2f}",
-                    'الخصومات': f"{emp['deduction']:.2f}",
-                    'السلف': f"{emp['advance']:.2f}",
-                    'صافي الراتب': f"{emp['salary']:.2f}"
-                })
-        
-        # Add total row
-        data.append({
-            'الاسم': 'الإجمالي',
-            'النوع': '',
-            'سعر الحصة الأساسي': '',
-            'سعر الحصة الحالي': '',
-            'الحصص العادية': '',
-            'راتب الحصص': '',
-            'حصص الأداء': '',
-            'بونص الأداء': '',
-            'البونص اليومي': '',
-            'البونص الشهري': '',
-            'الراتب الأساسي': '',
-            'الراتب الشهري': '',
-            'الخصومات': '',
-            'السلف': '',
-            'صافي الراتب': f"{total_salaries:.2f}"
-        })
-        
-        df = pd.DataFrame(data)
+        period = self.get_report_period()
+        if period is None:
+            return
         
         # Ask for save location
         file_path = filedialog.asksaveasfilename(
@@ -1970,142 +2054,62 @@ class EnhancedEmployeeSystem:
         )
         
         if file_path:
-            try:
-                df.to_excel(file_path, index=False)
-                messagebox.showinfo("تم", f"تم تصدير التقرير إلى {file_path}")
-            except Exception as e:
-                messagebox.showerror("خطأ", f"فشل التصدير: {str(e)}")
+            self.run_payroll_task(
+                "تصدير لإكسل", period, self.write_payroll_excel,
+                lambda path: messagebox.showinfo("تم", f"تم تصدير التقرير إلى {path}"),
+                file_path, error_text="فشل التصدير")
     
-    def export_to_word(self):
-        name = self.report_employee.get()
-        if not name:
-            messagebox.showerror("خطأ", "الرجاء تحديد الموظف")
+    def write_payroll_excel(self, task, run, file_path):
+        """كتابة تقرير الرواتب في ملف إكسل بقيم رقمية (يعمل في خيط التصدير)"""
+        write_payroll_xlsx(file_path, run, task.step)
+        return file_path
+    
+    def export_ledger_workbook(self):
+        """ملف إكسل واحد بسجلات الفترة لجميع الموظفين بدلاً من تصدير كل موظف وحده"""
+        period = self.get_report_period()
+        if period is None:
             return
         
-        from_date_str = self.report_from_date.get()
-        to_date_str = self.report_to_date.get()
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
+            title="حفظ السجل الكامل كملف إكسل"
+        )
+        if not file_path:
+            return
         
-        from_date = None
-        to_date = None
+        # الأوراق تُكتب من الفهرس نفسه الذي حُسبت منه الرواتب
+        snapshot = payroll_snapshot(self.payroll_index, *period)
         
-        if not from_date_str and not to_date_str:
-            # إذا لم يتم تحديد تاريخ، نستخدم الشهر المحدد فقط
-            month = int(self.report_month.get())
-            year = int(self.report_year.get())
-            from_date = datetime.datetime(year, month, 1)
-            to_date = datetime.datetime(year, month, 1) + datetime.timedelta(days=32)
-            to_date = to_date.replace(day=1) - datetime.timedelta(days=1)
-        else:
-            if from_date_str:
-                try:
-                    from_date = datetime.datetime.strptime(from_date_str, "%Y-%m-%d")
-                except ValueError:
-                    messagebox.showerror("خطأ", "صيغة تاريخ البداية غير صحيحة")
-                    return
-            
-            if to_date_str:
-                try:
-                    to_date = datetime.datetime.strptime(to_date_str, "%Y-%m-%d")
-                except ValueError:
-                    messagebox.showerror("خطأ", "صيغة تاريخ النهاية غير صحيحة")
-                    return
+        def job(task):
+            index = snapshot_index(snapshot)
+            task.step(0, 0, "جاري حساب الرواتب...")
+            run = PayrollRun(index, *period)
+            write_ledger_workbook(file_path, index, run, task.step)
+            return run
+        
+        def finish(run):
+            if run.matches(self.payroll_index, *period):
+                self.payroll_run = run
+            messagebox.showinfo("تم", f"تم تصدير السجل الكامل إلى {file_path}")
         
-        if from_date and to_date and from_date > to_date:
-            messagebox.showerror("خطأ", "تاريخ البداية يجب أن يكون قبل تاريخ النهاية")
+        self.run_in_background("تصدير السجل الكامل", job, finish, "فشل التصدير")
+    
+    def export_to_word(self):
+        name = self.report_employee.get()
+        if not name:
+            messagebox.showerror("خطأ", "الرجاء تحديد الموظف")
             return
         
-        report = self.calculate_salary_for_period(name, from_date, to_date)
+        period = self.get_report_period()
+        if period is None:
+            return
         
+        report = self.calculate_salary_for_period(name, *period)
         if not report:
             messagebox.showerror("خطأ", "لا يوجد بيانات لهذا الموظف")
             return
-        
-        # Create a new Word document
-        doc = Document()
-        
-        # Add title
-        title = doc.add_heading('تقرير الموظف', level=1)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Add subtitle
-        subtitle_text = f"الموظف: {report['name']}"
-        if from_date and to_date:
-            subtitle_text += f" - الفترة من {from_date.strftime('%Y-%m-%d')} إلى {to_date.strftime('%Y-%m-%d')}"
-        else:
-            subtitle_text += f" - لشهر {self.report_month.get()}/{self.report_year.get()}"
-        
-        subtitle = doc.add_heading(subtitle_text, level=2)
-        subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Add a table for the report
-        table = doc.add_table(rows=1, cols=2)
-        table.style = 'Table Grid'
-        table.alignment = WD_TABLE_ALIGNMENT.CENTER
-        
-        # Set table width to 100% of page
-        table.autofit = False
-        table.allow_autofit = False
-        table.width = Inches(6)
-        
-        # Add header row
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'القيمة'
-        hdr_cells[1].text = 'البند'
-        
-        # Add shading to header
-        shading_elm = parse_xml(r'<w:shd {} w:fill="D9D9D9"/>'.format(nsdecls('w')))
-        hdr_cells[0]._tc.get_or_add_tcPr().append(shading_elm)
-        hdr_cells[1]._tc.get_or_add_tcPr().append(shading_elm)
-        
-        # Add employee details to the table
-        def add_row(label, value):
-            row_cells = table.add_row().cells
-            row_cells[0].text = str(value)
-            row_cells[1].text = label
-            # Set cell width
-            row_cells[0].width = Inches(4)
-            row_cells[1].width = Inches(2)
-        
-        add_row('الاسم', report['name'])
-        add_row('النوع', report['type'])
-        
-        if report['type'] == 'بحصص':
-            add_row('سعر الحصة الأساسي', f"{report['base_rate']:.2f}")
-            add_row('سعر الحصة الحالي', f"{report['current_rate']:.2f}")
-            add_row('عدد الحصص العادية', report['sessions'])
-            add_row('راتب الحصص', f"{report['sessions_salary']:.2f}")
-            add_row('عدد حصص الأداء', report['performance_sessions'])
-            add_row('بونص الأداء', f"{report['performance_bonus']:.2f}")
-            add_row('إجمالي البونص اليومي', f"{report['daily_bonus']:.2f}")
-            add_row('البونص الشهري', f"{report['monthly_bonus']:.2f}")
-        else:
-            add_row('الراتب الأساسي', f"{report['base_salary']:.2f}")
-            add_row('الراتب الشهري', f"{report['monthly_salary']:.2f}")
-            add_row('البونص الشهري', f"{report['monthly_bonus']:.2f}")
-        
-        add_row('الخصومات', f"{report['deduction']:.2f}")
-        add_row('السلف المستحقة', f"{report['advance']:.2f}")
-        
-        # Add total salary row with bold font and different background color
-        total_row = table.add_row().cells
-        total_row[0].text = f"{report['salary']:.2f}"
-        total_row[1].text = 'صافي الراتب'
-        
-        # Apply bold font
-        for cell in total_row:
-            for paragraph in cell.paragraphs:
-                for run in paragraph.runs:
-                    run.bold = True
-        
-        # Apply background color
-        shading_elm = parse_xml(r'<w:shd {} w:fill="B4C6E7"/>'.format(nsdecls('w')))
-        total_row[0]._tc.get_or_add_tcPr().append(shading_elm)
-        total_row[1]._tc.get_or_add_tcPr().append(shading_elm)
-        
-        # Add date and signature
-        doc.add_paragraph("\n")
-        doc.add_paragraph(f"تاريخ التقرير: {datetime.date.today().strftime('%Y-%m-%d')}")
-        doc.add_paragraph("توقيع المدير: ________________")
+        month_text = f"{self.report_month.get()}/{self.report_year.get()}"
         
         # Save the document
         file_path = filedialog.asksaveasfilename(
@@ -2115,124 +2119,158 @@ class EnhancedEmployeeSystem:
         )
         
         if file_path:
-            try:
-                doc.save(file_path)
-                messagebox.showinfo("تم", f"تم تصدير التقرير إلى {file_path}")
-            except Exception as e:
-                messagebox.showerror("خطأ", f"فشل التصدير: {str(e)}")
-
+            self.run_in_background(
+                "تصدير لوورد",
+                lambda task: self.write_employee_word(task, report, month_text, file_path),
+                lambda path: messagebox.showinfo("تم", f"تم تصدير التقرير إلى {path}"),
+                "فشل التصدير")
+    
+    def write_employee_word(self, task, report, month_text, file_path):
+        """كتابة تقرير موظف واحد في ملف وورد (يعمل في خيط التصدير)"""
+        write_word_payslips(file_path, [report], month_text, task.step)
+        return file_path
+    
+    def export_payslips_word(self):
+        """كشوف رواتب جميع الموظفين للفترة في ملف وورد واحد أو ملف مضغوط"""
+        period = self.get_report_period()
+        if period is None:
+            return
+        month_text = f"{self.report_month.get()}/{self.report_year.get()}"
+        
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".docx",
+            filetypes=[("Word files", "*.docx"), ("Zip files (ملف لكل موظف)", "*.zip"), ("All files", "*.*")],
+            title="حفظ كشوف الرواتب"
+        )
+        
+        if file_path:
+            self.run_payroll_task(
+                "كشوف الرواتب", period,
+                lambda task, run: write_word_payslips(file_path, run.reports, month_text, task.step),
+                lambda _: messagebox.showinfo("تم", f"تم تصدير كشوف الرواتب إلى {file_path}"),
+                error_text="فشل التصدير")
+    
     def update_employee_lists(self):
-        # Update comboboxes
+        """إعادة بناء القوائم والجداول كلها (عند التحميل أو تغيير مجموعة كاملة)
+        
+        التبويبات التي لم تُنشأ بعد تُربط ببياناتها عند أول عرض لها.
+        """
+        for name, _, _, bind in self.tab_specs:
+            if name in self.built_tabs:
+                bind()
+    
+    def bind_employee_tab(self):
+        self.employee_view.reset(self.employee_keys)
+    
+    def bind_bonus_tab(self):
+        self.update_employee_choices()
+        self.reset_bonus_view()
+    
+    def bind_advance_tab(self):
+        self.update_employee_choices()
+        self.advance_view.reset(
+            lambda after, limit: self.payroll_index.ledger_keys(GROUPS, ADVANCE_LEDGERS, after, limit))
+    
+    def update_employee_choices(self):
         all_employees = list(self.employees.keys()) + list(self.other_employees.keys())
-        self.bonus_employee['values'] = list(self.employees.keys())
-        self.ded_employee['values'] = all_employees
-        self.report_employee['values'] = all_employees
-        self.adv_employee['values'] = all_employees
-        
-        # Update employee treeview
-        self.employee_tree.delete(*self.employee_tree.get_children())
-        
-        for name, data in self.employees.items():
-            self.employee_tree.insert("", "end", values=(
-                name,
-                "بحصص",
-                f"{data.get('current_rate', 0):.2f}",
-                "حذف"
-            ), tags=('editable',))
-        
-        for name, data in self.other_employees.items():
-            self.employee_tree.insert("", "end", values=(
-                name,
-                "راتب ثابت",
-                f"{data.get('monthly_salary', 0):.2f}",
-                "حذف"
-            ), tags=('editable',))
-        
-        # Update attendance treeview with day names
-        self.attendance_tree.delete(*self.attendance_tree.get_children())
-        
-        # ترتيب الموظفين حسب الاسم
-        sorted_employees = sorted(self.employees.items(), key=lambda x: x[0])
-        
-        for name, data in sorted_employees:
-            # ترتيب سجلات الحضور حسب التاريخ
-            sorted_attendance = sorted(data.get('attendance', {}).items(), key=lambda x: x[0])
-            
-            for date, record in sorted_attendance:
-                date_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
-                day_name = ["الاثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت", "الأحد"][date_obj.weekday()]
-                
-                self.attendance_tree.insert("", "end", values=(
-                    name,
-                    date,
-                    day_name,
-                    record.get('sessions', 0),
-                    f"{record.get('daily_bonus', 0):.2f}",
-                    "تعديل",
-                    "حذف"
-                ), tags=('editable',))
-        
-        # Update bonus treeview
-        self.bonus_tree.delete(*self.bonus_tree.get_children())
-        
-        for name, data in self.employees.items():
-            # Add performance bonuses
-            for date, bonus_data in data.get('performance_bonus', {}).items():
-                sessions = bonus_data.get('sessions', 0)
-                rate = bonus_data.get('rate', 0)
-                amount = bonus_data.get('amount', 0)
-                
-                self.bonus_tree.insert("", "end", values=(
-                    name,
-                    date,
-                    "بونص الأداء",
-                    f"{sessions} حصة × {rate:.2f}",
-                    f"{amount:.2f}",
-                    "تعديل",
-                    "حذف"
-                ))
-            
-            # Add monthly bonuses
-            for date, bonus in data.get('monthly_bonuses', {}).items():
-                if bonus > 0:
-                    self.bonus_tree.insert("", "end", values=(
-                        name,
-                        date,
-                        "البونص الشهري",
-                        "-",
-                        f"{bonus:.2f}",
-                        "تعديل",
-                        "حذف"
-                    ))
-        
-        # Update advance treeview
-        self.advance_tree.delete(*self.advance_tree.get_children())
-        
-        for name, data in self.employees.items():
-            for date, amount in data.get('advances', {}).items():
-                due_month = data.get('advance_due_dates', {}).get(date, {}).get('month', '')
-                due_year = data.get('advance_due_dates', {}).get(date, {}).get('year', '')
-                self.advance_tree.insert("", "end", values=(
-                    name,
-                    date,
-                    f"{amount:.2f}",
-                    due_month,
-                    due_year,
-                    "حذف"
-                ), tags=('editable',))
-        
-        for name, data in self.other_employees.items():
-            for date, amount in data.get('advances', {}).items():
-                due_month = data.get('advance_due_dates', {}).get(date, {}).get('month', '')
-                due_year = data.get('advance_due_dates', {}).get(date, {}).get('year', '')
-                self.advance_tree.insert("", "end", values=(
-                    name,
-                    date,
-                    f"{amount:.2f}",
-                    due_month,
-                    due_year,
-                    "حذف"
-                ), tags=('editable',))
+        if 'bonus' in self.built_tabs:
+            self.bonus_employee['values'] = list(self.employees.keys())
+            self.ded_employee['values'] = all_employees
+        if 'advance' in self.built_tabs:
+            self.adv_employee['values'] = all_employees
+        if 'reports' in self.built_tabs:
+            self.report_employee['values'] = all_employees
+    
+    def apply_changes(self, paths):
+        """تحديث الصفوف المتأثرة فقط بمسارات البيانات المعدلة"""
+        for path in paths:
+            if path[0] not in GROUPS:
+                continue
+            if len(path) == 1:
+                self.update_employee_lists()
+                return
+            group = GROUPS.index(path[0])
+            name = path[1]
+            if len(path) == 2:
+                self.update_employee_choices()
+                self.employee_view.refresh((group, name))
+                for view, ledgers in self.ledger_views(path[0]):
+                    self.refresh_employee_rows(view, ledgers, group, name)
+            elif len(path) == 3:
+                self.employee_view.refresh((group, name))
+                for view, ledgers in self.ledger_views(path[0]):
+                    if LEDGER_ROWS.get(path[2], path[2]) in ledgers:
+                        self.refresh_employee_rows(view, ledgers, group, name)
+            else:
+                ledger, date = LEDGER_ROWS.get(path[2], path[2]), path[3]
+                for view, ledgers in self.ledger_views(path[0]):
+                    if ledger in ledgers:
+                        ordinal = date_ordinal(date)
+                        if ordinal is not None:
+                            view.refresh((group, name, ledgers.index(ledger), ordinal, date))
+    
+    def ledger_views(self, group):
+        """الجداول المؤرخة المنشأة التي تعرض سجلات المجموعة مع أنواع سجلاتها"""
+        if group == 'employees':
+            views = (('attendance', ATTENDANCE_LEDGERS),
+                     ('bonus', BONUS_LEDGERS),
+                     ('advance', ADVANCE_LEDGERS))
+        else:
+            views = (('advance', ADVANCE_LEDGERS),)
+        return tuple((getattr(self, tab + '_view'), ledgers)
+                     for tab, ledgers in views if tab in self.built_tabs)
+    
+    def refresh_employee_rows(self, view, ledgers, group, name):
+        """مزامنة صفوف موظف واحد في جدول بعد إضافته أو حذفه أو استبدال سجلاته"""
+        keys = set(view.loaded_keys((group, name)))
+        for l, ledger in enumerate(ledgers):
+            for ordinal, date in self.payroll_index.entries(GROUPS[group], name, ledger):
+                keys.add((group, name, l, ordinal, date))
+        for key in sorted(keys):
+            view.refresh(key)
+    
+    def employee_keys(self, after, limit):
+        keys = [(g, name) for g, group in enumerate(GROUPS) for name in sorted(getattr(self, group))]
+        start = 0 if after is None else bisect_right(keys, after)
+        return keys[start:start + limit]
+    
+    def employee_row(self, key):
+        group, name = key
+        data = getattr(self, GROUPS[group]).get(name)
+        if data is None:
+            return None
+        if group == 0:
+            return (name, "بحصص", f"{data.get('current_rate', 0):.2f}", "حذف"), ('editable',)
+        return (name, "راتب ثابت", f"{data.get('monthly_salary', 0):.2f}", "حذف"), ('editable',)
+    
+    def bonus_row(self, key):
+        record = self.ledger_record(key, BONUS_LEDGERS)
+        if record is None:
+            return None
+        _, name, ledger, _, date = key
+        if ledger == 0:
+            sessions = record.get('sessions', 0)
+            rate = record.get('rate', 0)
+            amount = record.get('amount', 0)
+            return (name, date, "بونص الأداء", f"{sessions} حصة × {rate:.2f}", f"{amount:.2f}", "تعديل", "حذف"), ()
+        if record > 0:
+            return (name, date, "البونص الشهري", "-", f"{record:.2f}", "تعديل", "حذف"), ()
+        return None
+    
+    def advance_row(self, key):
+        amount = self.ledger_record(key, ADVANCE_LEDGERS)
+        if amount is None:
+            return None
+        group, name, _, _, date = key
+        due = getattr(self, GROUPS[group])[name].get('advance_due_dates', {}).get(date, {})
+        return (
+            name,
+            date,
+            f"{amount:.2f}",
+            due.get('month', ''),
+            due.get('year', ''),
+            "حذف"
+        ), ('editable',)
     
     def save_regular_employee(self):
         name = self.reg_name.get()
@@ -2263,8 +2301,7 @@ class EnhancedEmployeeSystem:
             'monthly_rates': {}
         }
         
-        self.update_employee_lists()
-        self.save_data()
+        self.commit_changes(('employees', name))
         messagebox.showinfo("تم", f"تم حفظ بيانات الموظف {name}")
         self.clear_regular_employee_fields()
     
@@ -2281,8 +2318,7 @@ class EnhancedEmployeeSystem:
         
         if messagebox.askyesno("تأكيد", f"هل أنت متأكد من حذف الموظف {name}؟"):
             del self.employees[name]
-            self.update_employee_lists()
-            self.save_data()
+            self.commit_changes(('employees', name))
             messagebox.showinfo("تم", f"تم حذف الموظف {name}")
             self.clear_regular_employee_fields()
     
@@ -2317,8 +2353,7 @@ class EnhancedEmployeeSystem:
             'advance_due_dates': {}
         }
         
-        self.update_employee_lists()
-        self.save_data()
+        self.commit_changes(('other_employees', name))
         messagebox.showinfo("تم", f"تم حفظ بيانات الموظف {name}")
         self.clear_other_employee_fields()
     
@@ -2351,7 +2386,7 @@ class EnhancedEmployeeSystem:
         
         self.other_employees[name]['monthly_salaries'][month_year] = monthly_salary
         
-        self.save_data()
+        self.commit_changes(('other_employees', name, 'monthly_salaries', month_year))
         messagebox.showinfo("تم", f"تم تحديث الراتب الشهري لـ {name} لشهر {month}/{year}")
         self.clear_other_employee_fields()
     
@@ -2368,8 +2403,7 @@ class EnhancedEmployeeSystem:
         
         if messagebox.askyesno("تأكيد", f"هل أنت متأكد من حذف الموظف {name}؟"):
             del self.other_employees[name]
-            self.update_employee_lists()
-            self.save_data()
+            self.commit_changes(('other_employees', name))
             messagebox.showinfo("تم", f"تم حذف الموظف {name}")
             self.clear_other_employee_fields()
     
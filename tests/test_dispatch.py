@@ -0,0 +1,214 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import perfection_cli
+from perfection_dispatch import (FAILED, PENDING, SENDING, SENT, DispatchQueue, OutboxTransport,
+                                 dispatch_path, payslip_messages, whatsapp_url)
+
+REPORT = {'name': 'أحمد', 'net_salary': 1500.0}
+
+
+class TextSlipQueue(DispatchQueue):
+    """طابور يكتب الكشف ملفاً نصياً بدلاً من PDF حتى لا تحتاج الاختبارات fpdf2 والخطوط"""
+
+    def render(self, slips, message):
+        os.makedirs(self.attachments, exist_ok=True)
+        path = os.path.join(self.attachments, f"{message['id']}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(message['report'], f, ensure_ascii=False)
+        return path
+
+
+class FlakyTransport(OutboxTransport):
+    """تفشل أول failures محاولات ثم ترسل إلى المجلد"""
+
+    def __init__(self, directory, failures):
+        super().__init__(directory)
+        self.failures = failures
+        self.calls = 0
+
+    def send(self, message, attachment):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OSError(f"محاولة فاشلة {self.calls}")
+        super().send(message, attachment)
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+class DispatchQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'dispatch_queue.db')
+        self.outbox = os.path.join(self.tmp.name, 'outbox')
+        self.queues = []
+
+    def tearDown(self):
+        for queue in self.queues:
+            queue.close()
+        self.tmp.cleanup()
+
+    def open(self, transport=None, **options):
+        options.setdefault('rate_per_minute', 0)
+        queue = TextSlipQueue(self.path, transport or OutboxTransport(self.outbox), **options)
+        self.queues.append(queue)
+        return queue
+
+    def status(self, queue, message_id):
+        return {message['id']: message for message in queue.messages()}[message_id]
+
+    def test_claim_takes_oldest_due_message_once(self):
+        queue = self.open()
+        first, second = queue.enqueue([('أحمد', '0790000001', '1/2024', REPORT),
+                                       ('سعيد', '0790000002', '1/2024', REPORT)])
+
+        message = queue.claim()
+        self.assertEqual(message['id'], first)
+        self.assertEqual(message['attempts'], 1)
+        self.assertEqual(message['report'], REPORT)
+        self.assertEqual(self.status(queue, first)['status'], SENDING)
+        self.assertEqual(queue.claim()['id'], second)
+        self.assertIsNone(queue.claim())
+
+    def test_retry_backoff_then_failed(self):
+        queue = self.open(max_attempts=3, retry_delay=10)
+        message_id, = queue.enqueue([('أحمد', '0790000001', '1/2024', REPORT)])
+
+        for attempt, delay in ((1, 10), (2, 20)):
+            message = queue.claim()
+            self.assertEqual(message['attempts'], attempt)
+            before = time.time()
+            queue.finish(message, error=OSError('timeout'))
+            with queue.conn:
+                status, next_attempt = queue.conn.execute(
+                    "SELECT status, next_attempt FROM messages WHERE id = ?", (message_id,)).fetchone()
+            self.assertEqual(status, PENDING)
+            self.assertAlmostEqual(next_attempt - before, delay, delta=1)
+            # ليست مستحقة قبل انتهاء فترة الانتظار
+            self.assertIsNone(queue.claim())
+            with queue.conn:
+                queue.conn.execute("UPDATE messages SET next_attempt = 0 WHERE id = ?", (message_id,))
+
+        queue.finish(queue.claim(), error=OSError('timeout'))
+        failed = self.status(queue, message_id)
+        self.assertEqual(failed['status'], FAILED)
+        self.assertEqual(failed['attempts'], 3)
+        self.assertEqual(failed['last_error'], 'timeout')
+        self.assertIsNone(queue.claim())
+
+        self.assertEqual(queue.retry_failed(), 1)
+        self.assertEqual(queue.claim()['attempts'], 1)
+
+    def test_reopen_requeues_interrupted_messages(self):
+        queue = self.open()
+        message_id, = queue.enqueue([('أحمد', '0790000001', '1/2024', REPORT)])
+        queue.claim()
+        queue.close()
+
+        reopened = self.open()
+        self.assertEqual(self.status(reopened, message_id)['status'], PENDING)
+        self.assertEqual(reopened.claim()['id'], message_id)
+
+    def test_workers_send_through_outbox(self):
+        queue = self.open(workers=2)
+        ids = queue.enqueue([(f'موظف {i}', f'07900000{i:02d}', '1/2024', dict(REPORT, name=f'موظف {i}'))
+                             for i in range(5)])
+        queue.start()
+        self.assertTrue(wait_until(lambda: queue.counts()[SENT] == len(ids)))
+
+        sent = sorted(name for name in os.listdir(self.outbox) if name.endswith('.json'))
+        self.assertEqual(len(sent), len(ids))
+        with open(os.path.join(self.outbox, sent[0]), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['period'], '1/2024')
+
+    def test_workers_retry_until_failed(self):
+        transport = FlakyTransport(self.outbox, failures=2)
+        queue = self.open(transport, workers=1, max_attempts=2, retry_delay=0)
+        message_id, = queue.enqueue([('أحمد', '0790000001', '1/2024', REPORT)])
+        queue.start()
+        self.assertTrue(wait_until(lambda: queue.counts()[FAILED] == 1))
+
+        failed = self.status(queue, message_id)
+        self.assertEqual(transport.calls, 2)
+        self.assertEqual(failed['last_error'], 'محاولة فاشلة 2')
+        self.assertFalse(os.path.exists(self.outbox))
+
+    @mock.patch('perfection_dispatch.POLL_INTERVAL', 0.01)
+    def test_join_waits_for_retries(self):
+        transport = FlakyTransport(self.outbox, failures=1)
+        queue = self.open(transport, workers=1, retry_delay=0.05)
+        queue.enqueue([('أحمد', '0790000001', '1/2024', REPORT), ('سعيد', '0790000002', '1/2024', REPORT)])
+        queue.start()
+        counts = queue.join(timeout=10)
+        self.assertEqual((counts[SENT], counts[PENDING], counts[SENDING]), (2, 0, 0))
+        self.assertEqual(transport.calls, 3)
+
+    def test_finish_after_close_is_ignored(self):
+        queue = self.open()
+        queue.enqueue([('أحمد', '0790000001', '1/2024', REPORT)])
+        message = queue.claim()
+        queue.close()
+        self.queues.remove(queue)
+
+        queue.finish(message)
+        self.assertIsNone(queue.claim())
+
+
+class PayslipMessagesTest(unittest.TestCase):
+    def test_one_message_per_employee_with_phone(self):
+        reports = [{'name': 'أحمد'}, {'name': 'سعيد'}, {'name': 'أحمد', 'extra': True}]
+        messages, missing = payslip_messages(reports, {'أحمد': '0790000001'}, '3/2024')
+        self.assertEqual(messages, [('أحمد', '0790000001', '3/2024', {'name': 'أحمد'})])
+        self.assertEqual(missing, ['سعيد'])
+
+    def test_cli_enqueues_the_period(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, 'employee_data.json')
+            with open(data_file, 'w', encoding='utf-8') as f:
+                json.dump({'employees': {}, 'other_employees': {
+                    'أحمد': {'monthly_salary': 300, 'phone': '0790000001'},
+                    'سعيد': {'monthly_salary': 200},
+                }}, f, ensure_ascii=False)
+
+            with mock.patch('sys.stderr'):
+                code = perfection_cli.main(['--data', data_file, '--month', '2', '--year', '2024',
+                                            '-o', os.path.join(tmp, 'payroll.csv'), '--dispatch'])
+            self.assertEqual(code, 0)
+
+            queue = DispatchQueue(dispatch_path(data_file), OutboxTransport(tmp))
+            try:
+                messages = queue.messages()
+                self.assertEqual([(m['name'], m['phone'], m['period'], m['status']) for m in messages],
+                                 [('أحمد', '0790000001', '2/2024', PENDING)])
+                self.assertEqual(queue.claim()['report']['salary'], 300)
+            finally:
+                queue.close()
+
+
+class WhatsAppUrlTest(unittest.TestCase):
+    def test_values_are_encoded(self):
+        url = whatsapp_url('+962 79-000-0001', 'كشف & "1".pdf')
+        self.assertTrue(url.startswith('whatsapp://send?phone=%2B962790000001&text='))
+        self.assertNotIn(' ', url)
+        self.assertNotIn('"', url)
+        self.assertEqual(url.count('&'), 2)
+
+    def test_invalid_phone_is_rejected(self):
+        for phone in ('079" & calc', '07a9', '+', '0+79'):
+            with self.assertRaises(ValueError):
+                whatsapp_url(phone, 'slip.pdf')
+
+
+if __name__ == '__main__':
+    unittest.main()
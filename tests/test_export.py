@@ -0,0 +1,94 @@
+import datetime
+import os
+import tempfile
+import unittest
+import zipfile
+import xml.etree.ElementTree as ET
+
+from perfection_payroll import PayrollIndex, PayrollRun
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+else:
+    from perfection_export import write_attendance_xlsx, write_payroll_xlsx
+
+NS = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+# تنسيقات إكسل المدمجة المستخدمة (الباقي معرّف في styles.xml)
+BUILTIN_FORMATS = {0: 'General', 1: '0'}
+
+
+def read_sheet(path, number=1):
+    """خلايا الورقة {المرجع: (النوع، القيمة، تنسيق العرض)} حيث النوع 'n' أو 'str'"""
+    with zipfile.ZipFile(path) as archive:
+        styles = ET.fromstring(archive.read('xl/styles.xml'))
+        sheet = ET.fromstring(archive.read(f'xl/worksheets/sheet{number}.xml'))
+    formats = dict(BUILTIN_FORMATS)
+    for fmt in styles.iterfind('m:numFmts/m:numFmt', NS):
+        formats[int(fmt.get('numFmtId'))] = fmt.get('formatCode')
+    xfs = [formats[int(xf.get('numFmtId'))] for xf in styles.iterfind('m:cellXfs/m:xf', NS)]
+
+    cells = {}
+    for cell in sheet.iterfind('m:sheetData/m:row/m:c', NS):
+        number_format = xfs[int(cell.get('s', 0))]
+        if cell.get('t') == 'inlineStr':
+            cells[cell.get('r')] = ('str', cell.find('m:is/m:t', NS).text, number_format)
+        else:
+            cells[cell.get('r')] = ('n', float(cell.find('m:v', NS).text), number_format)
+    return cells
+
+
+@unittest.skipUnless(xlsxwriter, "xlsxwriter غير مثبتة")
+class ExportCellsTest(unittest.TestCase):
+    """الأرقام والتواريخ تُكتب قيماً حقيقية بتنسيق عرض وليست نصوصاً"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_payroll_cells(self):
+        index = PayrollIndex({
+            "أحمد": {'current_rate': 50, 'attendance': {'2024-03-05': {'sessions': 3, 'daily_bonus': 2.5}}},
+        }, {
+            "سارة": {'monthly_salary': 1000},
+        })
+        run = PayrollRun(index, datetime.datetime(2024, 3, 1), datetime.datetime(2024, 3, 31))
+        write_payroll_xlsx(self.path('payroll.xlsx'), run)
+        cells = read_sheet(self.path('payroll.xlsx'))
+
+        self.assertEqual(cells['A1'][:2], ('str', 'الاسم'))
+        self.assertEqual(cells['A2'][:2], ('str', "أحمد"))
+        self.assertEqual(cells['C2'], ('n', 50, '#,##0.00'))       # سعر الحصة الأساسي
+        self.assertEqual(cells['E2'], ('n', 3, '0'))               # الحصص العادية
+        self.assertEqual(cells['O2'], ('n', 152.5, '#,##0.00'))    # صافي الراتب
+        self.assertEqual(cells['K3'], ('n', 1000, '#,##0.00'))     # الراتب الشهري
+        self.assertNotIn('C3', cells)                              # لا يوجد سعر حصة للراتب الثابت
+        self.assertEqual(cells['A4'][:2], ('str', 'الإجمالي'))
+        self.assertEqual(cells['O4'], ('n', 1152.5, '#,##0.00'))
+
+    def test_attendance_dates(self):
+        records = [{'date': datetime.date(2024, 3, 5), 'day': 'الثلاثاء', 'sessions': 3, 'daily_bonus': 0}]
+        write_attendance_xlsx(self.path('attendance.xlsx'), records)
+        cells = read_sheet(self.path('attendance.xlsx'))
+
+        serial = (datetime.date(2024, 3, 5) - datetime.date(1899, 12, 30)).days
+        self.assertEqual(cells['A2'], ('n', serial, 'yyyy-mm-dd'))
+        self.assertEqual(cells['B2'][:2], ('str', 'الثلاثاء'))
+        self.assertEqual(cells['C2'], ('n', 3, '0'))
+        self.assertEqual(cells['D2'], ('n', 0, '#,##0.00'))
+
+    def test_failed_export_leaves_no_file(self):
+        def step(done, total, text=''):
+            raise RuntimeError("توقف")
+
+        with self.assertRaises(RuntimeError):
+            write_attendance_xlsx(self.path('partial.xlsx'), [{'date': datetime.date(2024, 1, 1)}], step)
+        self.assertFalse(os.path.exists(self.path('partial.xlsx')))
+
+
+if __name__ == '__main__':
+    unittest.main()
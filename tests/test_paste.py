@@ -0,0 +1,112 @@
+import copy
+import unittest
+from unittest import mock
+
+from perfection_v3 import (ATTENDANCE_KINDS, COLLECTIVE_BONUS_KINDS, EnhancedEmployeeSystem,
+                           convert_grid_rows, normalize_name, parse_pasted_rows)
+
+KINDS = (int, float)
+
+
+class PasteRowsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = {normalize_name(name): name for name in ("أحمد علي", "سارة")}
+
+    def test_header_row_is_skipped(self):
+        rows, errors = parse_pasted_rows("الاسم\tالحصص\tالبونص\nأحمد  علي\t3\t2.5\n", self.index, KINDS)
+        self.assertEqual(rows, [("أحمد علي", ['3', '2.5'])])
+        self.assertEqual(errors, [])
+
+    def test_unknown_first_name_is_an_error(self):
+        rows, errors = parse_pasted_rows("احمد\t3\t5\nسارة\t2\t0", self.index, KINDS)
+        self.assertEqual(rows, [("سارة", ['2', '0'])])
+        self.assertEqual(len(errors), 1)
+        self.assertIn("السطر 1", errors[0])
+
+    def test_comma_cells_duplicates_and_bad_values(self):
+        rows, errors = parse_pasted_rows("سارة,1,\nسارة,2,0\nأحمد علي,x,1\nأحمد علي,1,2,3",
+                                         self.index, KINDS)
+        self.assertEqual(rows, [("سارة", ['1'])])
+        self.assertEqual([error.split(':')[0] for error in errors],
+                         ["السطر 2", "السطر 3", "السطر 4"])
+
+
+class StubGrid:
+    """جدول إدخال بصفوف ثابتة بدلاً من عناصر Tk"""
+
+    def __init__(self, rows):
+        self.labels = [row[0] for row in rows]
+        self._rows = rows
+
+    def rows(self):
+        return iter(self._rows)
+
+
+class SaveGridTest(unittest.TestCase):
+    """صف صحيح ثم صف بقيمة غير صحيحة: لا يُعدل أي موظف"""
+
+    def setUp(self):
+        self.app = EnhancedEmployeeSystem.__new__(EnhancedEmployeeSystem)
+        self.app.employees = {
+            "أحمد علي": {'current_rate': 5, 'attendance': {'2024-01-02': {'sessions': 2, 'daily_bonus': 0}}},
+            "سارة": {'current_rate': 5},
+        }
+        self.before = copy.deepcopy(self.app.employees)
+        self.app.commit_changes = mock.Mock()
+        self.window = mock.Mock()
+
+    def paste(self, text, kinds):
+        """صفوف الجدول بعد لصق text فيه (الخلية غير الملصقة فارغة)"""
+        index = {normalize_name(name): name for name in self.app.employees}
+        rows, errors = parse_pasted_rows(text, index, kinds)
+        self.assertEqual(errors, [])
+        return [(name, *values, *[''] * (len(kinds) - len(values))) for name, values in rows]
+
+    def test_convert_stops_at_first_bad_row(self):
+        self.assertEqual(convert_grid_rows([("سارة", '3', '')], KINDS), ([("سارة", 3, 0)], None))
+        self.assertEqual(convert_grid_rows([("سارة", '3', ''), ("أحمد علي", '2.5', '')], KINDS),
+                         ([], "أحمد علي"))
+
+    @mock.patch('perfection_v3.messagebox')
+    def test_attendance_bad_row_changes_nothing(self, messagebox):
+        # الصف الأول يحذف حضور أحمد (صفر حصص)، والثاني يُعدل يدوياً بعد اللصق إلى قيمة خاطئة
+        rows = self.paste("أحمد علي\t0\t0\nسارة\t3\t1", ATTENDANCE_KINDS)
+        rows[1] = ("سارة", 'ثلاث', '1')
+        self.app.daily_att_grid = StubGrid(rows)
+
+        self.app.save_daily_attendance('2024-01-02', self.window)
+
+        self.assertEqual(self.app.employees, self.before)
+        self.app.commit_changes.assert_not_called()
+        messagebox.showerror.assert_called_once()
+        self.window.destroy.assert_not_called()
+
+    @mock.patch('perfection_v3.messagebox')
+    def test_collective_bonus_bad_row_changes_nothing(self, messagebox):
+        rows = self.paste("أحمد علي\t2\t7\t10\nسارة\t1\t5\t0", COLLECTIVE_BONUS_KINDS)
+        rows[1] = ("سارة", '1', '5', 'x')
+        self.app.collective_bonus_grid = StubGrid(rows)
+
+        self.app.save_collective_bonus('2024-01-02', self.window)
+
+        self.assertEqual(self.app.employees, self.before)
+        self.app.commit_changes.assert_not_called()
+        messagebox.showerror.assert_called_once()
+
+    @mock.patch('perfection_v3.messagebox')
+    def test_attendance_saves_all_rows_once(self, messagebox):
+        self.app.daily_att_grid = StubGrid(self.paste("أحمد علي\t0\t0\nسارة\t3\t1.5", ATTENDANCE_KINDS))
+
+        self.app.save_daily_attendance('2024-01-02', self.window)
+
+        self.assertNotIn('2024-01-02', self.app.employees["أحمد علي"]['attendance'])
+        self.assertEqual(self.app.employees["سارة"]['attendance']['2024-01-02'],
+                         {'sessions': 3, 'daily_bonus': 1.5})
+        self.app.commit_changes.assert_called_once_with(
+            ('employees', "أحمد علي", 'attendance', '2024-01-02'),
+            ('employees', "سارة", 'attendance', '2024-01-02'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import datetime
+import random
+import unittest
+
+from perfection_payroll import (PayrollIndex, calculate_roster, calculate_roster_parallel,
+                                calculate_salary, payroll_slice, payroll_snapshot, period_bounds,
+                                snapshot_index)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def random_roster(seed, employees=30, days=800):
+    """بيانات عشوائية بكل أنواع السجلات (القيم الكسرية نصفية حتى يكون الجمع دقيقاً)"""
+    rng = random.Random(seed)
+    start = datetime.date(2023, 1, 1)
+
+    def dates(count):
+        return sorted({(start + datetime.timedelta(days=rng.randrange(days))).isoformat()
+                       for _ in range(count)})
+
+    regular = {}
+    for i in range(employees):
+        advances = {date: rng.randrange(50, 500) for date in dates(4)}
+        regular[f"موظف {i}"] = {
+            'current_rate': rng.choice([40, 50, 62.5]),
+            'attendance': {date: {'sessions': rng.randrange(6), 'daily_bonus': rng.choice([0, 5, 7.5])}
+                           for date in dates(120)},
+            'performance_bonus': {date: {'sessions': 2, 'amount': rng.randrange(100), 'rate': 50}
+                                  for date in dates(10)},
+            'monthly_bonuses': {date: rng.randrange(300) for date in dates(5)},
+            'deductions': {date: {'amount': rng.randrange(80), 'reason': 'تأخير'} for date in dates(8)},
+            'advances': advances,
+            'advance_due_dates': {date: {'month': rng.randrange(1, 13), 'year': rng.choice([2023, 2024, 2025])}
+                                  for date in advances if rng.random() < 0.7},
+            'monthly_rates': {date: rng.choice([45, 55, 60]) for date in dates(3)},
+        }
+
+    fixed = {}
+    for i in range(employees // 2):
+        employee = {
+            'monthly_salary': rng.choice([0, 1000, 2500]),
+            'monthly_bonuses': {date: rng.randrange(200) for date in dates(4)},
+            'deductions': {date: {'amount': rng.randrange(60), 'reason': 'غياب'} for date in dates(4)},
+            'advances': {date: rng.randrange(100, 400) for date in dates(2)},
+        }
+        if rng.random() < 0.5:
+            employee['monthly_salaries'] = {f"{rng.randrange(1, 13)}_{rng.choice([2023, 2024])}": 1500
+                                            for _ in range(3)}
+        fixed[f"ثابت {i}"] = employee
+    return regular, fixed
+
+
+PERIODS = [
+    (None, None),
+    (datetime.datetime(2024, 3, 1), datetime.datetime(2024, 3, 31)),
+    (datetime.datetime(2023, 2, 15), datetime.datetime(2024, 5, 10)),
+    (datetime.datetime(2024, 1, 1), None),
+    (None, datetime.datetime(2023, 6, 30)),
+]
+
+
+@unittest.skipUnless(numpy, "NumPy غير مثبتة")
+class RosterParityTest(unittest.TestCase):
+    """الحساب الجماعي بـ NumPy يطابق calculate_salary موظفاً بموظف"""
+
+    def assertMatches(self, index, from_date, to_date):
+        expected = [calculate_salary(index, name, from_date, to_date)
+                    for name in list(index.employees) + list(index.other_employees)]
+        self.assertEqual(calculate_roster(index, from_date, to_date), expected)
+
+    def test_periods(self):
+        for seed in range(3):
+            index = PayrollIndex(*random_roster(seed))
+            for from_date, to_date in PERIODS:
+                with self.subTest(seed=seed, from_date=from_date, to_date=to_date):
+                    self.assertMatches(index, from_date, to_date)
+
+    def test_after_edits(self):
+        employees, other_employees = random_roster(7)
+        index = PayrollIndex(employees, other_employees)
+        from_date, to_date = PERIODS[1]
+        self.assertMatches(index, from_date, to_date)
+
+        employees["موظف 0"]['attendance']['2024-03-05'] = {'sessions': 9, 'daily_bonus': 2.5}
+        index.refresh(('employees', "موظف 0", 'attendance', '2024-03-05'))
+        employees["موظف 1"]['monthly_rates']['2024-03-20'] = 70
+        index.refresh(('employees', "موظف 1", 'monthly_rates', '2024-03-20'))
+        del other_employees["ثابت 0"]
+        index.refresh(('other_employees', "ثابت 0"))
+        self.assertMatches(index, from_date, to_date)
+
+    def test_empty_roster(self):
+        self.assertEqual(calculate_roster(PayrollIndex({}, {}), *PERIODS[1]), [])
+
+
+class PayrollSliceTest(unittest.TestCase):
+    """العمليات المتوازية تستلم سجلات الفترة فقط وتعطي نفس النتائج"""
+
+    def test_slice_keeps_only_period(self):
+        index = PayrollIndex(*random_roster(3))
+        from_date, to_date = PERIODS[1]
+        lo, hi = period_bounds(from_date, to_date)
+        for group in ('employees', 'other_employees'):
+            for name in index.source(group):
+                compact = payroll_slice(index, group, name, lo, hi)
+                for ledger in ('attendance', 'performance_bonus', 'monthly_bonuses',
+                               'deductions', 'advances', 'monthly_rates'):
+                    for date in compact.get(ledger, {}):
+                        self.assertTrue(from_date.date().isoformat() <= date <= to_date.date().isoformat())
+                self.assertLessEqual(set(compact.get('advance_due_dates', {})),
+                                     set(compact.get('advances', {})))
+
+    def test_parallel_matches_salary(self):
+        index = PayrollIndex(*random_roster(4))
+        names = list(index.employees) + list(index.other_employees)
+        for from_date, to_date in PERIODS:
+            with self.subTest(from_date=from_date, to_date=to_date):
+                expected = [calculate_salary(index, name, from_date, to_date) for name in names]
+                self.assertEqual(calculate_roster_parallel(index, from_date, to_date, workers=1,
+                                                           chunk_size=7), expected)
+
+    def test_snapshot_of_period(self):
+        index = PayrollIndex(*random_roster(5))
+        names = list(index.employees) + list(index.other_employees)
+        for from_date, to_date in PERIODS:
+            with self.subTest(from_date=from_date, to_date=to_date):
+                copy = snapshot_index(payroll_snapshot(index, from_date, to_date))
+                self.assertEqual(copy.version, index.version)
+                self.assertEqual([calculate_salary(copy, name, from_date, to_date) for name in names],
+                                 [calculate_salary(index, name, from_date, to_date) for name in names])
+
+
+class LedgerKeysTest(unittest.TestCase):
+    """صفحات مفاتيح الجداول المؤرخة، لكل الموظفين أو لموظفين محددين"""
+
+    LEDGERS = ('performance_bonus', 'monthly_bonuses')
+
+    def pages(self, index, limit, **options):
+        keys, after = [], None
+        while True:
+            page = index.ledger_keys(('employees',), self.LEDGERS, after, limit, **options)
+            keys += page
+            if len(page) < limit:
+                return keys
+            after = page[-1]
+
+    def test_names_restricts_and_pages(self):
+        index = PayrollIndex(*random_roster(6))
+        every = index.ledger_keys(('employees',), self.LEDGERS)
+        self.assertEqual(self.pages(index, 7), every)
+
+        name = sorted(index.employees)[3]
+        only = self.pages(index, 5, names=(name, 'غير موجود'))
+        self.assertTrue(only)
+        self.assertEqual(only, [key for key in every if key[1] == name])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from perfection_payslips import slip_filenames, write_pdf_payslips
+
+try:
+    import fpdf
+except ImportError:
+    fpdf = None
+
+# خطوط DejaVu: بجانب البرنامج أو من خطوط النظام
+FONT_DIRS = ('.', '/usr/share/fonts/truetype/dejavu')
+FONT_DIR = next((d for d in FONT_DIRS if os.path.exists(os.path.join(d, 'DejaVuSans.ttf'))), None)
+
+
+def fixed_report(name, salary):
+    return {'name': name, 'type': 'راتب ثابت', 'base_salary': salary, 'monthly_salary': salary,
+            'monthly_bonus': 0.0, 'deduction': 0.0, 'advance': 0.0, 'salary': salary,
+            'from_date': '2024-01-01', 'to_date': '2024-01-31'}
+
+
+class SlipFilenamesTest(unittest.TestCase):
+    def test_unsafe_and_duplicate_names(self):
+        reports = [{'name': 'أحمد/علي'}, {'name': 'سارة'}, {'name': 'أحمد?علي'}, {'name': ' '}]
+        self.assertEqual(slip_filenames(reports), ['أحمد_علي', 'سارة', 'أحمد_علي_3', 'employee'])
+
+
+@unittest.skipIf(fpdf is None or FONT_DIR is None, "fpdf2 أو خطوط DejaVu غير متوفرة")
+class PdfPayslipsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.reports = [fixed_report(f'موظف {i}', 100.0 + i) for i in range(5)]
+        self.reports.append(fixed_report('موظف 0', 50.0))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_directory_has_one_file_per_employee(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                output = os.path.join(self.tmp.name, f'out{workers}')
+                with unittest.mock.patch('perfection_payslips.PDF_CHUNK_SIZE', 2):
+                    count, _ = write_pdf_payslips(output, self.reports, '1/2024', font_dir=FONT_DIR,
+                                                  workers=workers)
+                self.assertEqual(count, len(self.reports))
+                expected = sorted(f'{name}.pdf' for name in slip_filenames(self.reports))
+                self.assertEqual(sorted(os.listdir(output)), expected)
+                for name in expected:
+                    with open(os.path.join(output, name), 'rb') as f:
+                        data = f.read()
+                    self.assertTrue(data.startswith(b'%PDF'))
+                    self.assertEqual(data.count(b'/Type /Page\n') + data.count(b'/Type /Page>'), 1)
+
+    def test_single_file_has_a_page_per_employee(self):
+        output = os.path.join(self.tmp.name, 'all.pdf')
+        count, _ = write_pdf_payslips(output, self.reports, '1/2024', font_dir=FONT_DIR)
+        self.assertEqual(count, len(self.reports))
+        self.assertEqual(os.listdir(self.tmp.name), ['all.pdf'])
+
+
+if __name__ == '__main__':
+    unittest.main()
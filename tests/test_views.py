@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+
+from perfection_payroll import PayrollIndex
+from perfection_v3 import EnhancedEmployeeSystem, PagedTreeview
+
+
+class StubTree:
+    """Treeview في الذاكرة: العنصر غير الموجود يطلق خطأ مثل TclError"""
+
+    def __init__(self):
+        self.rows = {}
+        self.order = []
+        self.count = 0
+
+    def configure(self, **options):
+        pass
+
+    def get_children(self):
+        return list(self.order)
+
+    def insert(self, parent, index, values, tags=()):
+        self.count += 1
+        item = f'I{self.count}'
+        self.rows[item] = values
+        self.order.insert(len(self.order) if index == 'end' else index, item)
+        return item
+
+    def item(self, item, values=None, tags=None):
+        self.rows[item] = values
+
+    def delete(self, *items):
+        for item in items:
+            del self.rows[item]
+            self.order.remove(item)
+
+    def names(self):
+        return [self.rows[item][0] for item in self.order]
+
+
+class BonusHistoryTest(unittest.TestCase):
+    """سجل مكافآت موظف يُعرض عبر bonus_view فتبقى تحديثات الجدول صحيحة"""
+
+    def setUp(self):
+        app = EnhancedEmployeeSystem.__new__(EnhancedEmployeeSystem)
+        app.employees = {
+            'أحمد': {'performance_bonus': {'2024-01-02': {'sessions': 2, 'rate': 5, 'amount': 10}},
+                     'monthly_bonuses': {'2024-01-05': 20}},
+            'سارة': {'monthly_bonuses': {'2024-01-03': 15}},
+        }
+        app.other_employees = {}
+        app.payroll_index = PayrollIndex(app.employees, app.other_employees)
+        app.built_tabs = {'bonus'}
+        app.bonus_filter = None
+        app.bonus_tree = StubTree()
+        app.bonus_view = PagedTreeview(app.bonus_tree, None, app.bonus_row)
+        app.bonus_employee = mock.Mock()
+        app.bonus_employee.get.return_value = 'أحمد'
+        app.reset_bonus_view()
+        self.app = app
+
+    def edit(self, name, ledger, date, value):
+        records = self.app.employees[name].setdefault(ledger, {})
+        if value is None:
+            del records[date]
+        else:
+            records[date] = value
+        path = ('employees', name, ledger, date)
+        self.app.payroll_index.refresh(path)
+        self.app.apply_changes([path])
+
+    def test_history_then_edits(self):
+        self.assertEqual(self.app.bonus_tree.names(), ['أحمد', 'أحمد', 'سارة'])
+        self.app.show_bonus_history()
+        self.assertEqual(self.app.bonus_tree.names(), ['أحمد', 'أحمد'])
+
+        # مكافأة موظف آخر لا تظهر في السجل، وحذف مكافأة معروضة يحذف صفها
+        self.edit('سارة', 'monthly_bonuses', '2024-01-04', 30)
+        self.edit('أحمد', 'monthly_bonuses', '2024-01-05', None)
+        self.edit('أحمد', 'monthly_bonuses', '2024-01-01', 5)
+        self.assertEqual(self.app.bonus_tree.names(), ['أحمد', 'أحمد'])
+        self.assertEqual(len(self.app.bonus_view.items), 2)
+
+        self.app.reset_bonus_filter()
+        self.assertEqual(self.app.bonus_tree.names(), ['أحمد', 'أحمد', 'سارة', 'سارة'])
+
+
+if __name__ == '__main__':
+    unittest.main()